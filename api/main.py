@@ -1,11 +1,29 @@
-from fastapi import FastAPI, HTTPException
+import json
+import os
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi import Path as Path_
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from uuid import uuid4
 
+from core.pair_cache import PairScoreCache
+from core.peaks import read_peaks
+from core.score import pair_score
+from core.spectrogram import read_meta, read_tile
+from schemas.models import Analysis
+
+DATA_ROOT = Path(os.getenv("MASHER_DATA_ROOT", "data"))
+STEMS_ROOT = Path(os.getenv("MASHER_STEMS_ROOT", "/data/stems"))
+ANALYSIS_ROOT = Path(os.getenv("MASHER_ANALYSIS_ROOT", "/data/analysis"))
+STEM_NAMES = {"drums", "bass", "other", "vocals"}
+# Optional SQLite file that keeps pair scores across restarts
+PAIR_CACHE_DB = os.getenv("MASHER_PAIR_CACHE_DB")
+
 app = FastAPI(title="Masher API")
 app.state.tracks = {}
 app.state.pairs = {}
+app.state.pair_scores = PairScoreCache(path=PAIR_CACHE_DB)
 
 class TrackCreate(BaseModel):
   url: str = Field(..., example="https://example.com/foo.mp3")
@@ -47,6 +65,39 @@ def create_pair(payload: PairCreate) -> Pair:
   pairs[pid] = pair
   return pair
 
+class ScoreWeights(BaseModel):
+  key: float = 1.0
+  tempo: float = 1.0
+  sections: float = 1.0
+  vocals: float = 1.0
+  energy: float = 1.0
+
+class PairScore(BaseModel):
+  pair_id: str
+  score: float
+  factors: Dict[str, float]
+
+def _load_analysis(track_id: str) -> Analysis:
+  path = ANALYSIS_ROOT / track_id / "Analysis.json"
+  if not path.exists():
+    raise HTTPException(status_code=404, detail="analysis_not_found")
+  with open(path) as f:
+    return Analysis(**json.load(f)["analysis"])
+
+@app.post('/pairs/{pair_id}/score', response_model=PairScore)
+def score_pair(pair_id: str, weights: Optional[ScoreWeights] = None) -> PairScore:
+  """Mashability of the pair's analysed tracks, served from the pair score cache when known."""
+  if pair_id not in app.state.pairs:
+    raise HTTPException(status_code=404, detail="pair_not_found")
+  pair = app.state.pairs[pair_id]
+  weights = (weights or ScoreWeights()).model_dump()
+  if not sum(weights.values()):
+    raise HTTPException(status_code=422, detail="zero_weights")
+  score, factors = pair_score(
+    _load_analysis(pair.a), _load_analysis(pair.b), cache=app.state.pair_scores, weights=weights
+  )
+  return PairScore(pair_id=pair_id, score=score, factors=factors)
+
 @app.post('/analyze/{track_id}')
 def analyze(track_id: str) -> Dict[str, str]:
   if track_id not in app.state.tracks:
@@ -65,6 +116,85 @@ def render(pair_id: str) -> Dict[str, str]:
     raise HTTPException(status_code=404, detail="pair_not_found")
   return {"status": "ok", "pair_id": pair_id}
 
+def _peaks_window(path: Path, start: int, end: Optional[int], width: int) -> Dict[str, Any]:
+  if not path.exists():
+    raise HTTPException(status_code=404, detail="peaks_not_found")
+  return read_peaks(path, start, end, width)
+
+@app.get('/renders/{pair_id}/peaks')
+def render_peaks(
+  pair_id: str,
+  start: int = Query(0, ge=0),
+  end: Optional[int] = Query(None, ge=0),
+  width: int = Query(2048, ge=1, le=65536),
+) -> Dict[str, Any]:
+  """Waveform peaks of the draft for the visible sample window."""
+  if pair_id not in app.state.pairs:
+    raise HTTPException(status_code=404, detail="pair_not_found")
+  return _peaks_window(DATA_ROOT / "renders" / pair_id / "draft.peaks", start, end, width)
+
+@app.get('/tracks/{track_id}/stems/{stem}/peaks')
+def stem_peaks(
+  track_id: str,
+  stem: str,
+  start: int = Query(0, ge=0),
+  end: Optional[int] = Query(None, ge=0),
+  width: int = Query(2048, ge=1, le=65536),
+) -> Dict[str, Any]:
+  """Waveform peaks of a separated stem for the visible sample window."""
+  if track_id not in app.state.tracks:
+    raise HTTPException(status_code=404, detail="track_not_found")
+  if stem not in STEM_NAMES:
+    raise HTTPException(status_code=404, detail="stem_not_found")
+  return _peaks_window(STEMS_ROOT / track_id / f"{stem}.peaks", start, end, width)
+
+def _spectrogram_meta(tile_dir: Path) -> Dict[str, Any]:
+  try:
+    return read_meta(tile_dir)
+  except FileNotFoundError:
+    raise HTTPException(status_code=404, detail="spectrogram_not_found")
+
+def _spectrogram_tile(tile_dir: Path, level: int, x: int, y: int) -> Response:
+  try:
+    data = read_tile(tile_dir, level, x, y)
+  except FileNotFoundError:
+    raise HTTPException(status_code=404, detail="tile_not_found")
+  return Response(content=data, media_type="application/octet-stream")
+
+def _render_tiles(pair_id: str) -> Path:
+  if pair_id not in app.state.pairs:
+    raise HTTPException(status_code=404, detail="pair_not_found")
+  return DATA_ROOT / "renders" / pair_id / "draft.spec"
+
+def _track_tiles(track_id: str) -> Path:
+  if track_id not in app.state.tracks:
+    raise HTTPException(status_code=404, detail="track_not_found")
+  return ANALYSIS_ROOT / track_id / "spectrogram"
+
+@app.get('/renders/{pair_id}/spectrogram')
+def render_spectrogram(pair_id: str) -> Dict[str, Any]:
+  """Tile layout of the draft spectrogram."""
+  return _spectrogram_meta(_render_tiles(pair_id))
+
+@app.get('/renders/{pair_id}/spectrogram/{level}/{x}/{y}')
+def render_spectrogram_tile(
+  pair_id: str, level: int = Path_(..., ge=0), x: int = Path_(..., ge=0), y: int = Path_(..., ge=0)
+) -> Response:
+  """Raw uint8 dB tile of the draft: tile_bins rows of tile_frames columns."""
+  return _spectrogram_tile(_render_tiles(pair_id), level, x, y)
+
+@app.get('/tracks/{track_id}/spectrogram')
+def track_spectrogram(track_id: str) -> Dict[str, Any]:
+  """Tile layout of the spectrogram produced during analysis."""
+  return _spectrogram_meta(_track_tiles(track_id))
+
+@app.get('/tracks/{track_id}/spectrogram/{level}/{x}/{y}')
+def track_spectrogram_tile(
+  track_id: str, level: int = Path_(..., ge=0), x: int = Path_(..., ge=0), y: int = Path_(..., ge=0)
+) -> Response:
+  """Raw uint8 dB tile of the analysed track."""
+  return _spectrogram_tile(_track_tiles(track_id), level, x, y)
+
 class PatchOps(BaseModel):
   ops: List[dict]
 
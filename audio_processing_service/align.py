@@ -1,5 +1,21 @@
 import numpy as np
 
+# Max semitones a track may be shifted, by what it contributes to the mix
+VOCAL_LIMIT = 3
+MUSIC_LIMIT = 7
+
+# Vocals show shifting artifacts first, so their semitones cost more
+VOCAL_WEIGHT = 2.0
+MUSIC_WEIGHT = 1.0
+
+# Extra cost, in semitones, of landing a track on a Camelot neighbour of
+# the target (one step round the wheel) instead of the target or its relative
+NEIGHBOUR_COST = 1.0
+
+PITCHES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+_ENHARMONIC = {"Db": "C#", "D#": "Eb", "Gb": "F#", "G#": "Ab", "A#": "Bb", "Cb": "B", "B#": "C", "E#": "F", "Fb": "E"}
+
+
 def get_camelot_distance(key1, key2):
     """Calculates distance on the Camelot wheel."""
     # This is a simplified representation. A real one would use a map.
@@ -9,26 +25,126 @@ def get_camelot_distance(key1, key2):
     diff = abs(num1 - num2)
     return min(diff, 12 - diff)
 
-def choose_target_key(keys):
+
+def key_index(key, scale=None):
+    """
+    Index 0-23 of a key: pitch class, plus 12 for minor. Accepts names
+    ("C", "F# minor", "Am"), Camelot codes ("8A") or an analysis dict with
+    "key" and "scale" fields.
+    """
+    if isinstance(key, dict):
+        key, scale = key['key'], key.get('scale', scale)
+    key = key.strip()
+    if key[:-1].isdigit() and key[-1] in "AB":
+        number = int(key[:-1]) % 12
+        minor = key[-1] == "A"
+        # Camelot numbers step by fifths from 8B = C major and 8A = A minor
+        pc = (7 * (number - 8) + (9 if minor else 0)) % 12
+        return pc + 12 * minor
+    parts = key.split()
+    name = parts[0]
+    if len(parts) > 1:
+        scale = parts[1]
+    elif len(name) > 1 and name.endswith("m"):
+        name, scale = name[:-1], "minor"
+    name = name[0].upper() + name[1:]
+    pc = PITCHES.index(_ENHARMONIC.get(name, name))
+    return pc + 12 * (str(scale).lower() == "minor")
+
+
+def key_name(index):
+    return f"{PITCHES[index % 12]} {'minor' if index >= 12 else 'major'}"
+
+
+def _camelot_numbers():
+    pc = np.arange(24) % 12
+    minor = np.arange(24) >= 12
+    return np.where(minor, 5 + 7 * pc, 8 + 7 * pc) % 12
+
+
+def _shift_tables(limit):
+    """
+    cost[target, key] and shift[target, key]: the cheapest shift within
+    +-limit that lands a track in `key` on the target, its relative key or a
+    Camelot neighbour of either. Shifts keep the mode, so a track lands on the
+    family member that shares it. Unreachable pairs cost inf.
+    """
+    number = _camelot_numbers()
+    pc = np.arange(24) % 12
+    mode = np.arange(24) >= 12
+    step = (number[None, :] - number[:, None]) % 12
+    steps = np.minimum(step, 12 - step)  # steps[target, landing]
+    extra = np.where(steps == 0, 0.0, np.where(steps == 1, NEIGHBOUR_COST, np.inf))
+    # shift[landing, key]: semitones from key to landing, in -6..5
+    shift = (pc[:, None] - pc[None, :] + 6) % 12 - 6
+    same_mode = mode[:, None] == mode[None, :]
+    move = np.where(same_mode & (np.abs(shift) <= limit), np.abs(shift), np.inf)
+    # cost3[target, landing, key]
+    cost3 = extra[:, :, None] + move[None, :, :]
+    best = cost3.argmin(axis=1)
+    cost = np.take_along_axis(cost3, best[:, None, :], 1)[:, 0, :]
+    return cost, shift[best, np.arange(24)[None, :]]
+
+
+_TABLES = {}
+
+
+def shift_tables(limit):
+    if limit not in _TABLES:
+        _TABLES[limit] = _shift_tables(limit)
+    return _TABLES[limit]
+
+
+def optimize_target_key(keys, vocal=None, weights=None, vocal_limit=VOCAL_LIMIT, music_limit=MUSIC_LIMIT):
+    """
+    Searches all 24 target keys at once for the one that minimises the total
+    weighted shift cost of every track, then the number of shifted tracks.
+    `vocal` flags tracks whose vocals are used; they get vocal_limit and
+    VOCAL_WEIGHT. Returns (target index, per-track shifts, total cost).
+    """
+    idx = np.array([key_index(k) for k in keys], dtype=int)
+    vocal = np.zeros(len(idx), bool) if vocal is None else np.asarray(vocal, bool)
+    if weights is None:
+        weights = np.where(vocal, VOCAL_WEIGHT, MUSIC_WEIGHT)
+    weights = np.asarray(weights, float)
+    vocal_cost, vocal_shift = shift_tables(vocal_limit)
+    music_cost, music_shift = shift_tables(music_limit)
+    # (24 targets, N tracks)
+    cost = np.where(vocal, vocal_cost[:, idx], music_cost[:, idx])
+    shift = np.where(vocal, vocal_shift[:, idx], music_shift[:, idx])
+    total = (cost * weights).sum(axis=1)
+    moved = (shift != 0).sum(axis=1)
+    target = int(np.lexsort((moved, total))[0])
+    return target, shift[target], float(total[target])
+
+
+def choose_target_key(keys, vocal=None, weights=None):
     """Chooses a target key that minimizes total pitch shifting."""
-    # This is a placeholder. A real implementation would be more sophisticated.
-    return keys[0]
+    target, _, _ = optimize_target_key(keys, vocal, weights)
+    return key_name(target)
+
 
-def plan_shifts(per_track_keys, target_key):
+def plan_shifts(per_track_keys, target_key=None, vocal_tracks=(), weights=None):
     """
-    Calculates the pitch shift in semitones needed for each track to match the target key.
-    This is a simplified example. A real implementation would use a more robust
-    key representation and distance metric.
+    Calculates the pitch shift in semitones for each track. With no
+    target_key the best one is chosen by optimize_target_key; otherwise
+    tracks are moved onto the given key's Camelot family. Vocal tracks stay
+    within vocal_limit, the rest within music_limit.
     """
-    shifts = {}
-    for track_id, key in per_track_keys.items():
-        # This logic is highly simplified.
-        # It assumes the key name itself tells us the distance.
-        # e.g., C -> D is 2 semitones.
-        # This would need a proper note-to-midi mapping.
-        shifts[track_id] = 0 # Placeholder
+    track_ids = list(per_track_keys)
+    vocal = [tid in vocal_tracks for tid in track_ids]
+    track_weights = None if weights is None else [weights.get(tid, MUSIC_WEIGHT) for tid in track_ids]
+    keys = [per_track_keys[tid] for tid in track_ids]
+    if target_key is None:
+        _, shifts, _ = optimize_target_key(keys, vocal, track_weights)
+    else:
+        target = key_index(target_key)
+        shifts = [
+            shift_tables(VOCAL_LIMIT if v else MUSIC_LIMIT)[1][target, key_index(k)] for k, v in zip(keys, vocal)
+        ]
+    shifts = {tid: int(s) for tid, s in zip(track_ids, shifts)}
 
-    vocal_limit = 3 # Max semitones to shift vocals
-    music_limit = 7 # Max semitones to shift instrumentals
+    vocal_limit = VOCAL_LIMIT # Max semitones to shift vocals
+    music_limit = MUSIC_LIMIT # Max semitones to shift instrumentals
 
     return shifts, vocal_limit, music_limit
@@ -2,7 +2,14 @@ import numpy as np
 import soundfile as sf
 import librosa
 import io
-import pyrubberband as rb
+import struct
+
+from core.stretch import get_engine
+from core.tempo import stretch_to_grid
+from core.mastering import TARGET_LUFS, master
+
+# Renders call the Rubber Band CLI with its default options
+_engine = get_engine("rubberband", rbargs={})
 
 def load_wav(path_or_bytes, sr=44100):
     """Loads a WAV file from a path or bytes buffer."""
@@ -20,38 +27,48 @@ def save_wav(path, y, sr):
     """Saves a NumPy array as a WAV file."""
     sf.write(path, y.T, sr)
 
+def wav_stream_header(sr, channels=2):
+    """
+    Returns a 16-bit PCM WAV header for a stream of unknown length.
+    The RIFF and data sizes are set to 0xFFFFFFFF, which browsers and most
+    decoders treat as "read until the stream ends".
+    """
+    block_align = channels * 2
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sr, sr * block_align, block_align, 16)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+def to_pcm16(y):
+    """Converts a (channels, samples) float block to interleaved 16-bit PCM bytes."""
+    pcm = np.clip(y, -1.0, 1.0) * 32767
+    return pcm.T.astype("<i2").tobytes()
+
+def time_stretch(y, sr, rate):
+    """High-quality time stretching with Rubber Band via core.stretch (librosa fallback without the CLI)."""
+    return _engine.time_stretch(y, sr, rate)
+
 def pitch_shift_semitones(y, sr, semitones, preserve_formants=True):
-    """High-quality pitch shifting using pyrubberband."""
-    # Rubberband's formant preservation is generally good for vocals
-    return rb.pitch_shift(y, sr, semitones)
+    """High-quality pitch shifting with Rubber Band via core.stretch (librosa fallback without the CLI)."""
+    return _engine.pitch_shift(y, sr, semitones)
 
 def stretch_to_grid_piecewise(y, sr, beats, target_beats):
-    """High-quality time stretching to align two beat grids."""
-    # This is a complex operation. A simplified version:
-    original_duration = librosa.frames_to_time(len(y), sr=sr)
-    target_duration = target_beats[-1]
-    rate = original_duration / target_duration
-    return rb.time_stretch(y, sr, rate)
+    """
+    Warps audio so every source beat (seconds) lands on its target beat, in
+    one time-map pass (see core.tempo.stretch_to_grid). Without Rubber Band's
+    timemap mode the in-process phase vocoder does the warp.
+    """
+    return stretch_to_grid(y, sr, np.asarray(beats) * 1000, np.asarray(target_beats) * 1000)
 
 def apply_gain_db(y, gain_db):
     """Applies gain to audio data in dB."""
     return y * (10 ** (gain_db / 20.0))
 
-def apply_replay_gain(y, sr):
-    """Applies ReplayGain-style loudness normalization."""
-    # This is a simplified version. A real implementation would use a proper
-    # EBU R128 loudness measurement.
-    target_lufs = -14.0
-
-    # Use librosa's RMS as a proxy for loudness
-    rms = librosa.feature.rms(y=y)
-    avg_rms = np.mean(rms)
-    if avg_rms == 0: return y
-
-    # Convert RMS to dB
-    avg_db = 20 * np.log10(avg_rms)
-
-    # Calculate gain needed to reach target LUFS (approximated)
-    gain_db = target_lufs - avg_db
-
-    return apply_gain_db(y, gain_db)
+def apply_replay_gain(y, sr, target_lufs=TARGET_LUFS):
+    """
+    Normalizes to target_lufs by BS.1770 integrated loudness, then runs the
+    true-peak limiter so the gain cannot push the mix into clipping (see
+    core.mastering.master).
+    """
+    return master(y, sr, target_lufs)
@@ -0,0 +1,297 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+from scipy import fft as sfft
+from scipy.signal import butter, lfilter, sosfilt
+
+from audio_ops import load_wav
+
+# Default block length for running a chain over a whole buffer
+BLOCK_SIZE = 4096
+
+# Cutoff updates within a block for filter sweeps, to avoid zipper noise
+SWEEP_STEP = 256
+
+# Partition length of the convolution reverb; one FFT of twice this size per
+# partition of input
+PARTITION = 4096
+
+# Synthetic impulse responses, name -> RT60 in seconds. Any other IR name is
+# treated as a path to an audio file.
+IR_PRESETS = {"room": 0.8, "plate": 1.6, "hall": 2.5}
+
+_FILTER_RE = re.compile(r"^(high|low)-pass(?:-filter)?-(\d+(?:\.\d+)?)(k?)hz$")
+
+
+class SosFilter:
+    """
+    Butterworth IIR filter run with scipy's sosfilt. The filter state is kept
+    between blocks, so a signal can be processed block by block seamlessly.
+    """
+
+    def __init__(self, kind, cutoff_hz, sr, channels=2, order=4):
+        self.kind = kind
+        self.sr = sr
+        self.order = order
+        self.sos = self._design(cutoff_hz)
+        self.zi = np.zeros((self.sos.shape[0], channels, 2), dtype=np.float32)
+
+    def _design(self, cutoff_hz):
+        cutoff_hz = float(np.clip(cutoff_hz, 10.0, 0.49 * self.sr))
+        return butter(self.order, cutoff_hz, btype=self.kind, fs=self.sr, output='sos').astype(np.float32)
+
+    def process(self, block):
+        block[:], self.zi = sosfilt(self.sos, block, axis=-1, zi=self.zi)
+        return block
+
+
+class FilterSweep(SosFilter):
+    """
+    Filter whose cutoff glides exponentially from start_hz to end_hz over
+    duration_sec, then holds. The cutoff is recomputed every SWEEP_STEP samples
+    while the filter state carries over. `position` is the sample offset of the
+    first block relative to the start of the sweep.
+    """
+
+    def __init__(self, kind, start_hz, end_hz, duration_sec, sr, channels=2, order=2, position=0):
+        super().__init__(kind, start_hz, sr, channels=channels, order=order)
+        self.start_hz = start_hz
+        self.end_hz = end_hz
+        self.duration = max(int(duration_sec * sr), 1)
+        self.position = position
+
+    def cutoff_at(self, position):
+        t = min(max(position / self.duration, 0.0), 1.0)
+        return self.start_hz * (self.end_hz / self.start_hz) ** t
+
+    def process(self, block):
+        for i in range(0, block.shape[-1], SWEEP_STEP):
+            self.sos = self._design(self.cutoff_at(self.position + i + SWEEP_STEP // 2))
+            sub = block[..., i:i + SWEEP_STEP]
+            sub[:], self.zi = sosfilt(self.sos, sub, axis=-1, zi=self.zi)
+        self.position += block.shape[-1]
+        return block
+
+
+class SidechainDucker:
+    """
+    Envelope-follower sidechain compressor. The trigger level is a one-pole
+    smoothed mean square (attack), the static gain curve is applied in dB and
+    the resulting gain is smoothed again (release). Both smoothers are linear
+    filters run with lfilter, so whole blocks are processed without Python
+    loops and their state carries between blocks.
+    """
+
+    needs_trigger = True
+
+    def __init__(self, sr, threshold_db=-30.0, ratio=4.0, attack_ms=10.0, release_ms=150.0):
+        self.threshold_db = threshold_db
+        self.ratio = ratio
+        self.a_attack = np.exp(-1.0 / (sr * attack_ms / 1000.0))
+        self.a_release = np.exp(-1.0 / (sr * release_ms / 1000.0))
+        self.level_zi = np.zeros(1)
+        self.gain_zi = np.array([self.a_release])  # starts at unity gain
+
+    def gain(self, trigger):
+        """Returns the per-sample linear gain for a trigger block."""
+        power = np.square(trigger).mean(axis=0) if trigger.ndim > 1 else np.square(trigger)
+        level, self.level_zi = lfilter([1 - self.a_attack], [1, -self.a_attack], power, zi=self.level_zi)
+        level_db = 10 * np.log10(np.maximum(level, 1e-12))
+        gain_db = -np.maximum(level_db - self.threshold_db, 0.0) * (1 - 1 / self.ratio)
+        target = 10 ** (gain_db / 20)
+        gain, self.gain_zi = lfilter([1 - self.a_release], [1, -self.a_release], target, zi=self.gain_zi)
+        return gain.astype(np.float32)
+
+    def process(self, block, trigger):
+        block *= self.gain(trigger)
+        return block
+
+
+def synthetic_ir(rt60, sr, channels=2, seed=0):
+    """Exponentially decaying, decorrelated noise tail normalised to unit energy per channel."""
+    n = max(int(rt60 * sr), 1)
+    noise = np.random.default_rng(seed).standard_normal((channels, n))
+    # -60 dB after rt60 seconds
+    ir = noise * np.exp(-6.9 * np.arange(n) / n)
+    ir /= np.sqrt(np.square(ir).sum(axis=-1, keepdims=True))
+    return ir.astype(np.float32)
+
+
+@lru_cache(maxsize=16)
+def ir_spectra(ir, sr, partition=PARTITION):
+    """
+    Returns the partitioned IR spectra, shaped (channels, partitions,
+    partition + 1), for a preset name or IR file at sample rate sr. Cached
+    per (ir, sr, partition) so every layer and block reuses the same FFTs.
+    """
+    if ir in IR_PRESETS:
+        h = synthetic_ir(IR_PRESETS[ir], sr)
+    else:
+        h, _ = load_wav(ir, sr=sr)
+    n_parts = -(-h.shape[-1] // partition)
+    parts = np.zeros((h.shape[0], n_parts * partition), dtype=np.float32)
+    parts[:, :h.shape[-1]] = h
+    padded = np.zeros((h.shape[0], n_parts, 2 * partition), dtype=np.float32)
+    padded[:, :, :partition] = parts.reshape(h.shape[0], n_parts, partition)
+    spectra = sfft.rfft(padded, axis=-1)
+    spectra.flags.writeable = False
+    return spectra
+
+
+class ConvolutionReverb:
+    """
+    Uniformly partitioned overlap-add convolution with an impulse response.
+    Past input partitions are kept as spectra in a frequency-domain delay
+    line, so each partition of input costs one forward and one inverse FFT
+    plus a multiply-add across the IR partitions. Blocks of any length are
+    processed without added latency; a partition that is still filling is
+    convolved with the first IR partition as it grows.
+    """
+
+    def __init__(self, sr, ir="hall", wet=0.3, dry=1.0, channels=2, partition=PARTITION):
+        self.H = ir_spectra(ir, sr, partition)
+        self.P = partition
+        self.wet = wet
+        self.dry = dry
+        self.fdl = np.zeros((channels, self.H.shape[1] - 1, partition + 1), dtype=self.H.dtype)
+        self.frame = np.zeros((channels, partition), dtype=np.float32)
+        self.overlap = np.zeros((channels, partition), dtype=np.float32)
+        self.fill = 0
+        self.past = None
+
+    def _past(self):
+        # Contribution of all completed partitions to the current one, plus
+        # the overlap-add tail of the previous partition.
+        spec = np.einsum('ckb,ckb->cb', self.fdl, self.H[:, 1:])
+        past = sfft.irfft(spec, n=2 * self.P, axis=-1)
+        past[:, :self.P] += self.overlap
+        return past
+
+    def process(self, block):
+        i = 0
+        while i < block.shape[-1]:
+            m = min(self.P - self.fill, block.shape[-1] - i)
+            self.frame[:, self.fill:self.fill + m] = block[:, i:i + m]
+            if self.past is None:
+                self.past = self._past()
+            X = sfft.rfft(self.frame, n=2 * self.P, axis=-1)
+            cur = sfft.irfft(X * self.H[:, 0], n=2 * self.P, axis=-1)
+            wet = self.past[:, self.fill:self.fill + m] + cur[:, self.fill:self.fill + m]
+            block[:, i:i + m] = self.dry * block[:, i:i + m] + self.wet * wet
+            self.fill += m
+            i += m
+            if self.fill == self.P:
+                self.overlap = self.past[:, self.P:] + cur[:, self.P:]
+                if self.fdl.shape[1]:
+                    self.fdl[:, 1:] = self.fdl[:, :-1]
+                    self.fdl[:, 0] = X
+                self.frame[:] = 0
+                self.fill = 0
+                self.past = None
+        return block
+
+
+class FeedbackDelay:
+    """
+    Feedback delay line: d[n] = x[n - D] + feedback * d[n - D], mixed back in
+    as wet * d. The ring buffer is read and written up to D samples at a time,
+    since no sample within that span depends on another.
+    """
+
+    def __init__(self, sr, delay_sec=0.375, feedback=0.4, wet=0.35, channels=2):
+        self.D = max(int(delay_sec * sr), 1)
+        self.feedback = float(np.clip(feedback, 0.0, 0.95))
+        self.wet = wet
+        self.buffer = np.zeros((channels, self.D), dtype=np.float32)
+        self.pos = 0
+
+    def process(self, block):
+        i = 0
+        while i < block.shape[-1]:
+            m = min(self.D - self.pos, block.shape[-1] - i)
+            x = block[:, i:i + m]
+            delayed = self.buffer[:, self.pos:self.pos + m].copy()
+            self.buffer[:, self.pos:self.pos + m] = x + self.feedback * delayed
+            x += self.wet * delayed
+            self.pos = (self.pos + m) % self.D
+            i += m
+        return block
+
+
+class FxChain:
+    """Ordered list of block processors applied in place to float32 blocks."""
+
+    def __init__(self, processors=None):
+        self.processors = list(processors or [])
+
+    def __bool__(self):
+        return bool(self.processors)
+
+    def process(self, block, trigger=None):
+        for proc in self.processors:
+            if getattr(proc, 'needs_trigger', False):
+                if trigger is not None:
+                    proc.process(block, trigger)
+            else:
+                proc.process(block)
+        return block
+
+    def process_buffer(self, y, trigger=None, block_size=BLOCK_SIZE):
+        """Runs the chain over a whole buffer block by block, in place."""
+        for i in range(0, y.shape[-1], block_size):
+            self.process(y[..., i:i + block_size], None if trigger is None else trigger[..., i:i + block_size])
+        return y
+
+
+def _effect_spec(effect):
+    """Normalises a plan effect (string or dict) to (type, params)."""
+    if isinstance(effect, dict):
+        params = dict(effect)
+        return str(params.pop('type', '')).lower(), params
+    name = str(effect).lower().replace('_', '-')
+    match = _FILTER_RE.match(name)
+    if match:
+        cutoff = float(match.group(2)) * (1000 if match.group(3) else 1)
+        return f"{match.group(1)}-pass-filter", {"cutoff_hz": cutoff}
+    return name, {}
+
+
+def build_chain(effects, sr, channels=2, position=0):
+    """
+    Builds an FxChain from masterplan layer effects such as
+    "high-pass-filter-800hz", "low-pass-2khz", "filter-sweep", "reverb",
+    "delay" or {"type": "reverb", "ir": "plate", "wet": 0.2}.
+    Sidechain ducking needs the other layers and is handled by the mixer (see
+    build_sidechain); unknown effects are skipped.
+    """
+    processors = []
+    for effect in effects or []:
+        kind, params = _effect_spec(effect)
+        if kind in ("high-pass-filter", "low-pass-filter"):
+            btype = 'highpass' if kind.startswith('high') else 'lowpass'
+            processors.append(SosFilter(btype, params.get('cutoff_hz', 800.0), sr, channels=channels))
+        elif kind == "filter-sweep":
+            processors.append(FilterSweep(
+                params.get('filter', 'lowpass'),
+                params.get('start_hz', 200.0),
+                params.get('end_hz', 16000.0),
+                params.get('duration_sec', 8.0),
+                sr,
+                channels=channels,
+                position=position,
+            ))
+        elif kind == "reverb":
+            processors.append(ConvolutionReverb(sr, channels=channels, **params))
+        elif kind == "delay":
+            processors.append(FeedbackDelay(sr, channels=channels, **params))
+    return FxChain(processors)
+
+
+def build_sidechain(effects, sr):
+    """Returns a SidechainDucker if the layer asks for sidechain ducking, else None."""
+    for effect in effects or []:
+        kind, params = _effect_spec(effect)
+        if kind.startswith('sidechain'):
+            return SidechainDucker(sr, **params)
+    return None
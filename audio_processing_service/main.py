@@ -1,7 +1,8 @@
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from prometheus_client import make_asgi_app
 from pydantic import BaseModel
 from typing import List, Dict
 import traceback
@@ -18,13 +19,18 @@ import asyncio
 import json
 import requests
 
-# Add current directory to Python path
-sys.path.append(os.path.dirname(__file__))
+# Add current directory to Python path, and the repository root for the
+# shared core package
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import helper modules
-from audio_ops import load_wav, save_wav, pitch_shift_semitones, stretch_to_grid_piecewise, apply_gain_db, apply_replay_gain
-from transitions import s_curve_xfade
+from audio_ops import load_wav, save_wav, pitch_shift_semitones, stretch_to_grid_piecewise, apply_gain_db, apply_replay_gain, wav_stream_header, to_pcm16
+from transitions import s_curve_xfade, StreamingXfade
 from align import plan_shifts
+from core.mastering import StreamingMaster
+from render_pool import get_executor, is_warped, render_layer, render_source, mix_block, mix_section, section_chains, section_sidechains
+from render_cache import CacheWriter, lookup, render_key, store
 
 # --- Pydantic Models ---
 class Masterplan(BaseModel):
@@ -57,6 +63,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics (render cache hits and misses, stretch speed)
+app.mount("/metrics", make_asgi_app())
+
 # --- Supabase & API Clients ---
 # SUPABASE_URL = os.environ.get("SUPABASE_URL")
 # SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
@@ -71,9 +80,33 @@ app.add_middleware(
 #     return response.json()
 
 # --- Audio Processing Logic ---
+# Length of the PCM blocks streamed by /execute-masterplan/stream. Short blocks
+# keep time-to-first-audio low; the pool renders later blocks in parallel.
+STREAM_BLOCK_SEC = float(os.environ.get("STREAM_BLOCK_SEC", 1.0))
+
+def resolve_tracks(songs: List[Dict]):
+    """Maps song ids to their stems on disk; decoding happens inside the workers."""
+    tracks_data = {}
+    for song in songs:
+        song_id = song['song_id']
+        audio_path = song.get('storage_path')
+        if not audio_path or not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file for {song_id} not found at {audio_path}")
+        tracks_data[song_id] = {"stems": {"mix": audio_path}, "analysis": song.get('analysis', {})}
+    return tracks_data
+
+def layer_audio_path(tracks_data: Dict, layer: Dict):
+    song_id = layer['songId']
+    stem_name = layer.get('stem', 'mix')
+    audio_path = tracks_data.get(song_id, {}).get('stems', {}).get(stem_name)
+    if audio_path is None:
+        raise ValueError(f"Stem {stem_name} not found for {song_id}")
+    return audio_path
+
 async def render_mashup_streamer(plan: Dict, songs: List[Dict], job_id: str):
     sr = 44100
-    total_steps = len(songs) + len(plan.get('timeline', [])) + 2
+    timeline = plan.get('timeline', [])
+    total_steps = sum(len(section.get('layers', [])) for section in timeline) + 2
     current_step = 0
 
     def progress_update(message, step_increment=1):
@@ -83,69 +116,67 @@ async def render_mashup_streamer(plan: Dict, songs: List[Dict], job_id: str):
         return f"data: {json.dumps({'progress': progress, 'message': message})}\n\n"
 
     try:
-        # 1. Load audio for all songs
-        tracks_data = {}
-        for song in songs:
-            song_id = song['song_id']
-            yield progress_update(f"Loading audio for {song_id}...", 1)
-
-            audio_path = song.get('storage_path')
-            if not audio_path or not os.path.exists(audio_path):
-                raise FileNotFoundError(f"Audio file for {song_id} not found at {audio_path}")
-
-            y, _ = load_wav(audio_path, sr=sr)
-            tracks_data[song_id] = {"stems": {"mix": y}, "analysis": song.get('analysis', {})}
-            await asyncio.sleep(0.1)
-
-        # 2. Render each section
-        master_track = np.array([], dtype=np.float32)
-        for i, section in enumerate(plan.get('timeline', [])):
-            yield progress_update(f"Rendering section {i+1}: {section.get('description', '')}", 1)
+        # 1. Resolve audio for all songs
+        tracks_data = resolve_tracks(songs)
+        storage_path = f"generated/{job_id}.wav"
 
+        # 2. Identical plans over identical stems are served from the cache
+        loop = asyncio.get_running_loop()
+        cache_key = await loop.run_in_executor(None, render_key, plan, tracks_data, "file")
+        cached_path = lookup(cache_key)
+        if cached_path is not None:
+            # with open(cached_path, "rb") as f:
+            #     supabase_client.storage.from_('mashups').upload(
+            #         path=storage_path, file=f, file_options={"content-type": "audio/wav", "upsert": "true"}
+            #     )
+            yield f"data: {json.dumps({'progress': 100, 'message': 'Complete! (cached)', 'storage_path': storage_path})}\n\n"
+            return
+
+        # 3. Dispatch every section layer to the process pool
+        executor = get_executor()
+        section_lens = []
+        layer_blocks = []
+        pending = {}
+        for i, section in enumerate(timeline):
             section_len_samples = int(section.get('duration_sec', 10) * sr)
-            section_audio = np.zeros((2, section_len_samples), dtype=np.float32) # Stereo
-
-            for layer in section.get('layers', []):
-                song_id = layer['songId']
-                stem_name = layer.get('stem', 'mix')
-
-                y = tracks_data.get(song_id, {}).get('stems', {}).get(stem_name)
-                if y is None:
-                    raise ValueError(f"Stem {stem_name} not found for {song_id}")
-
-                start_sec = layer.get('start_sec', 0)
-                start_sample = int(start_sec * sr)
-                end_sample = start_sample + section_len_samples
-                segment = y[:, start_sample:end_sample]
-
-                # Apply effects, pitch, volume, etc.
-                # This logic would be much more detailed in a full implementation
-                if 'volume_db' in layer:
-                    segment = apply_gain_db(segment, layer['volume_db'])
-
-                if segment.shape[1] < section_audio.shape[1]:
-                    segment = np.pad(segment, ((0,0), (0, section_audio.shape[1] - segment.shape[1])))
-
-                section_audio += segment
+            section_lens.append(section_len_samples)
+            layers = section.get('layers', [])
+            layer_blocks.append([None] * len(layers))
+
+            for j, layer in enumerate(layers):
+                audio_path = layer_audio_path(tracks_data, layer)
+                future = loop.run_in_executor(executor, render_layer, layer, audio_path, section_len_samples, sr)
+                pending[future] = (i, j)
+
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                i, j = pending.pop(future)
+                layer_blocks[i][j] = future.result()
+                yield progress_update(f"Rendered section {i+1} layer {j+1}: {timeline[i].get('description', '')}", 1)
+
+        # 4. Assemble sections in timeline order
+        master_track = np.array([], dtype=np.float32)
+        for i, section_len_samples in enumerate(section_lens):
+            sidechains = section_sidechains(timeline[i].get('layers', []), sr)
+            section_audio = mix_section(layer_blocks[i], section_len_samples, sidechains)
 
             if master_track.shape[0] == 0:
                 master_track = section_audio
             else:
                 master_track = s_curve_xfade(master_track, section_audio, sr, bars=2, bpm=120)
 
-            await asyncio.sleep(0.1)
-
-        # 3. Final mastering
+        # 5. Final mastering
         yield progress_update("Applying mastering effects...", 1)
         master_track = apply_replay_gain(master_track, sr)
 
-        # 4. Upload final file
+        # 6. Upload final file
         yield progress_update("Uploading final mashup...", 1)
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_f:
             save_wav(temp_f.name, master_track, sr)
             temp_filepath = temp_f.name
+        store(cache_key, temp_filepath)
 
-        storage_path = f"generated/{job_id}.wav"
         # with open(temp_filepath, "rb") as f:
         #     supabase_client.storage.from_('mashups').upload(
         #         path=storage_path, file=f, file_options={"content-type": "audio/wav", "upsert": "true"}
@@ -161,14 +192,126 @@ async def render_mashup_streamer(plan: Dict, songs: List[Dict], job_id: str):
         yield f"data: {json.dumps({'error': error_message})}\n\n"
 
 
+async def render_mashup_pcm_streamer(plan: Dict, tracks_data: Dict, job_id: str, sr: int = 44100, cache_key: str = None):
+    """
+    Streams the mix as a 16-bit WAV while it renders. Sections are split into
+    STREAM_BLOCK_SEC blocks that are all queued on the pool up front in timeline
+    order, and each block is mastered and emitted as soon as it and its
+    predecessors are done. The pool renders layer sources only; stretched or
+    pitch-shifted ones once per section, sliced into blocks, so they have no
+    seams at block boundaries. Effects, gain and mixing run on each block in
+    order, so reverb and delay tails carry over without replaying audio. With
+    a cache_key the stream is also written to the render
+    cache, and kept only if it completes.
+    """
+    timeline = plan.get('timeline', [])
+    block_len = max(int(STREAM_BLOCK_SEC * sr), 1)
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    section_lens = [int(section.get('duration_sec', 10) * sr) for section in timeline]
+    sections = []  # per section: ([(offset, length)], per layer: section future or [block futures])
+    futures = []
+    for section, section_len_samples in zip(timeline, section_lens):
+        spans = [
+            (offset, min(block_len, section_len_samples - offset))
+            for offset in range(0, section_len_samples, block_len)
+        ]
+        layers = section.get('layers', [])
+        paths = [layer_audio_path(tracks_data, layer) for layer in layers]
+        renders = [
+            loop.run_in_executor(executor, render_source, layer, path, section_len_samples, sr)
+            if is_warped(layer) else []
+            for layer, path in zip(layers, paths)
+        ]
+        for offset, length in spans:
+            for layer, path, render in zip(layers, paths, renders):
+                if isinstance(render, list):
+                    render.append(loop.run_in_executor(
+                        executor, render_source, layer, path, section_len_samples, sr, offset, length,
+                    ))
+        for render in renders:
+            futures.extend(render if isinstance(render, list) else [render])
+        sections.append((spans, renders))
+
+    writer = CacheWriter(cache_key) if cache_key else None
+
+    def emit(chunk):
+        if writer is not None:
+            writer.write(chunk)
+        return chunk
+
+    try:
+        yield emit(wav_stream_header(sr, channels=2))
+        xfade = StreamingXfade(section_lens, sr, bars=2, bpm=120)
+        master = StreamingMaster(sr)
+        for section, (spans, renders) in zip(timeline, sections):
+            xfade.start_section()
+            layers = section.get('layers', [])
+            chains = section_chains(layers, sr)
+            sidechains = section_sidechains(layers, sr)
+            for b, (offset, length) in enumerate(spans):
+                sources = []
+                for render in renders:
+                    if isinstance(render, list):
+                        sources.append(await render[b])
+                    else:
+                        sources.append((await render)[:, offset:offset + length])
+                # Off the event loop, but still one block at a time
+                block = await loop.run_in_executor(None, mix_block, layers, sources, chains, length, sidechains)
+                out = xfade.push(block)
+                if out is not None:
+                    yield emit(to_pcm16(master.process(out)))
+        tail = xfade.finish()
+        if tail is not None and tail.shape[-1]:
+            yield emit(to_pcm16(master.process(tail)))
+        yield emit(to_pcm16(master.flush()))
+        if writer is not None:
+            writer.commit()
+    except Exception as e:
+        # Headers are already sent, so the stream can only be cut short
+        print(f"Error during streaming render of {job_id}: {e}", file=sys.stderr)
+        traceback.print_exc()
+    finally:
+        # Errors and client disconnects (GeneratorExit, CancelledError) drop
+        # the blocks still queued, and leave no partial cache entry
+        for future in futures:
+            future.cancel()
+        if writer is not None:
+            writer.discard()
+
+
 # --- API Endpoint ---
 @app.post("/execute-masterplan")
 async def execute_masterplan_endpoint(request: RenderRequest):
     return StreamingResponse(
-        render_mashup_streamer(request.masterplan.dict(), request.songs, request.job_id),
+        render_mashup_streamer(request.masterplan.dict(), [song.dict() for song in request.songs], request.job_id),
         media_type="text/event-stream"
     )
 
+@app.post("/execute-masterplan/stream")
+async def stream_masterplan_endpoint(request: RenderRequest):
+    """Streams the rendered mix as a WAV file while it is still rendering."""
+    songs = [song.dict() for song in request.songs]
+    try:
+        tracks_data = resolve_tracks(songs)
+        for section in request.masterplan.timeline:
+            for layer in section.get('layers', []):
+                layer_audio_path(tracks_data, layer)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    plan = request.masterplan.dict()
+    cache_key = await asyncio.get_running_loop().run_in_executor(None, render_key, plan, tracks_data, "stream")
+    cached_path = lookup(cache_key)
+    if cached_path is not None:
+        return FileResponse(cached_path, media_type="audio/wav")
+    return StreamingResponse(
+        render_mashup_pcm_streamer(plan, tracks_data, request.job_id, cache_key=cache_key),
+        media_type="audio/wav"
+    )
+
 # --- Main execution ---
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8001))
@@ -0,0 +1,123 @@
+import os
+import struct
+import tempfile
+
+from core.hashing import hash_file, hash_json, library_versions
+from infra.metrics import render_cache_requests
+
+# Bump whenever a change to the render path alters the output for the same
+# plan and stems, so stale entries are never served.
+RENDER_VERSION = "2"
+
+CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "render_cache"))
+
+# Size the cache directory is trimmed to after each new entry, least
+# recently served entries first
+MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", 10 << 30))
+
+
+def engine_versions():
+    return {"render": RENDER_VERSION, **library_versions()}
+
+
+def render_key(plan, tracks_data, output):
+    """
+    Canonical hash of the plan, the content of every input stem, the engine
+    versions (Rubber Band included) and the output kind ("file" or "stream",
+    which are mastered differently).
+    """
+    inputs = {
+        song_id: {stem: hash_file(path) for stem, path in track['stems'].items()}
+        for song_id, track in tracks_data.items()
+    }
+    return hash_json({"plan": plan, "inputs": inputs, "engines": engine_versions(), "output": output})
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.wav")
+
+
+def lookup(key):
+    """Returns the cached WAV path for key, or None, and counts the lookup."""
+    path = cache_path(key)
+    try:
+        # Served entries count as recently used for eviction
+        os.utime(path)
+    except FileNotFoundError:
+        render_cache_requests.labels(result="miss").inc()
+        return None
+    render_cache_requests.labels(result="hit").inc()
+    return path
+
+
+def store(key, wav_path):
+    """Copies a finished WAV into the cache atomically."""
+    with CacheWriter(key) as writer:
+        with open(wav_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                writer.write(chunk)
+        writer.commit(patch_wav_sizes=False)
+
+
+def evict(max_bytes=None):
+    """Deletes the least recently used entries until the cache fits in max_bytes."""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith('.wav'):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class CacheWriter:
+    """
+    Writes a cache entry incrementally (e.g. tee'd from a PCM stream) to a
+    temporary file that only replaces the entry on commit(); an entry that
+    was never committed is discarded on exit.
+    """
+
+    def __init__(self, key):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = cache_path(key)
+        fd, self.tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.part')
+        self.f = os.fdopen(fd, 'wb')
+        self.size = 0
+
+    def write(self, data):
+        self.f.write(data)
+        self.size += len(data)
+
+    def commit(self, patch_wav_sizes=True):
+        """Publishes the entry. Streamed WAVs get their RIFF and data sizes filled in."""
+        if patch_wav_sizes:
+            self.f.seek(4)
+            self.f.write(struct.pack('<I', self.size - 8))
+            self.f.seek(40)
+            self.f.write(struct.pack('<I', self.size - 44))
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+        evict()
+
+    def discard(self):
+        """Drops an uncommitted entry; a no-op after commit()."""
+        if not self.f.closed:
+            self.f.close()
+            os.unlink(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.discard()
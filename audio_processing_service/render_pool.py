@@ -0,0 +1,140 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_ops import time_stretch, pitch_shift_semitones, apply_gain_db
+from core.assets import ensure_canonical
+from fx_chain import build_chain, build_sidechain
+
+_executor = None
+
+# Memory-mapped canonical tracks, opened at most once per worker process
+# regardless of how many layers and blocks reference them. Keyed by the
+# canonical copy and checked against its mtime and size, so a rebuilt copy
+# replaces the stale memmap; the least recently used tracks are closed once
+# more than TRACK_CACHE_SIZE are open.
+TRACK_CACHE_SIZE = int(os.environ.get("RENDER_TRACK_CACHE_SIZE", 16))
+_track_cache = OrderedDict()
+
+def get_executor():
+    """Returns the shared render process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        workers = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def _load_track(path, sr):
+    cpath = ensure_canonical(path, sr)
+    st = os.stat(cpath)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _track_cache.pop(cpath, None)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, np.load(cpath, mmap_mode='r'))
+    _track_cache[cpath] = cached
+    while len(_track_cache) > TRACK_CACHE_SIZE:
+        _track_cache.popitem(last=False)
+    return cached[1]
+
+
+def is_warped(layer):
+    """Whether a layer goes through the time stretcher or pitch shifter."""
+    return float(layer.get('stretch_ratio', 1.0)) != 1.0 or bool(layer.get('pitch_shift'))
+
+
+def render_source(layer, audio_path, section_len_samples, sr, offset=0, length=None):
+    """
+    Renders the source audio of a timeline layer: load, stretch and shift.
+    Runs inside a pool worker and returns a (2, length) float32 block covering
+    samples [offset, offset + length) of the section (the whole section by default).
+    Warped layers (see is_warped) are stretched and shifted in one pass per
+    section, so they cannot be rendered a block at a time.
+    """
+    y = _load_track(audio_path, sr)
+    if length is None:
+        length = section_len_samples - offset
+    if (offset > 0 or length < section_len_samples) and is_warped(layer):
+        raise ValueError("stretched or pitch-shifted layers render a whole section at a time")
+
+    start_sample = int(layer.get('start_sec', 0) * sr)
+    rate = float(layer.get('stretch_ratio', 1.0))
+    shift = layer.get('pitch_shift')
+    # A rate above 1 speeds the source up, so more source material is needed
+    # to fill the section.
+    source_start = start_sample + int(round(offset * rate))
+    source_len = int(round(length * rate))
+    segment = y[:, source_start:source_start + source_len]
+
+    if segment.shape[1] and rate != 1.0:
+        segment = time_stretch(segment, sr, rate)
+    if segment.shape[1] and shift:
+        segment = pitch_shift_semitones(segment, sr, shift)
+    segment = segment[:, :length]
+
+    if segment.shape[1] < length:
+        segment = np.pad(segment, ((0, 0), (0, length - segment.shape[1])))
+    # Copies slices of the read-only memmap into a plain array
+    return np.ascontiguousarray(segment, dtype=np.float32)
+
+
+def finish_layer(layer, segment, fx):
+    """
+    Runs a block of a layer's source through its FxChain and gain. The chain
+    carries filter, reverb and delay state from block to block, so every
+    block of a section must go through the same chain, in order.
+    """
+    segment = np.array(segment, dtype=np.float32)
+    if fx:
+        fx.process_buffer(segment)
+    if 'volume_db' in layer:
+        segment = apply_gain_db(segment, layer['volume_db'])
+    return np.ascontiguousarray(segment, dtype=np.float32)
+
+
+def render_layer(layer, audio_path, section_len_samples, sr, offset=0, length=None, fx=None):
+    """
+    Renders a single timeline layer: load, stretch, shift, FX and gain.
+    Returns a (2, length) float32 block covering samples [offset, offset + length)
+    of the section (the whole section by default). To render a section block
+    by block, pass the same chain from section_chains as `fx` for each block,
+    in order; without one, the effects start from silence at `offset`.
+    """
+    if fx is None:
+        fx = build_chain(layer.get('effects'), sr, position=offset)
+    return finish_layer(layer, render_source(layer, audio_path, section_len_samples, sr, offset, length), fx)
+
+
+def section_chains(layers, sr):
+    """One FxChain per layer; reuse them across a section's blocks, in order."""
+    return [build_chain(layer.get('effects'), sr) for layer in layers]
+
+
+def section_sidechains(layers, sr):
+    """One SidechainDucker (or None) per layer; reuse them across a section's blocks."""
+    return [build_sidechain(layer.get('effects'), sr) for layer in layers]
+
+
+def mix_section(layer_blocks, section_len_samples, sidechains=None):
+    """
+    Sums rendered layer blocks into one stereo section buffer. Layers with a
+    sidechain ducker are ducked under the sum of the other layers.
+    """
+    section_audio = np.zeros((2, section_len_samples), dtype=np.float32)
+    sidechains = sidechains or [None] * len(layer_blocks)
+    for block, ducker in zip(layer_blocks, sidechains):
+        if ducker is None:
+            section_audio += block
+    trigger = section_audio.copy() if any(sidechains) else None
+    for block, ducker in zip(layer_blocks, sidechains):
+        if ducker is not None:
+            section_audio += ducker.process(block.copy(), trigger)
+    return section_audio
+
+
+def mix_block(layers, sources, chains, length, sidechains=None):
+    """Finishes one block of every layer's source with its section chain and mixes them."""
+    blocks = [finish_layer(layer, source, fx) for layer, source, fx in zip(layers, sources, chains)]
+    return mix_section(blocks, length, sidechains)
@@ -1,4 +1,7 @@
 import numpy as np
+from scipy.signal import oaconvolve
+
+from fx_chain import FxChain, FilterSweep, SidechainDucker
 
 def s_curve_xfade(clip1, clip2, sr, bars, bpm):
     """
@@ -7,14 +10,14 @@ def s_curve_xfade(clip1, clip2, sr, bars, bpm):
     """
     duration_beats = bars * 4 # Assuming 4/4 time
     duration_sec = (duration_beats / bpm) * 60
-    fade_len = int(duration_sec * sr)
+    # Ensure clips are long enough for the fade; clips may be (channels, samples)
+    fade_len = min(int(duration_sec * sr), clip1.shape[-1], clip2.shape[-1])
 
     if fade_len == 0:
-        return np.concatenate((clip1, clip2))
+        return np.concatenate((clip1, clip2), axis=-1)
 
-    # Ensure clips are long enough for the fade
-    clip1_fade = clip1[-fade_len:]
-    clip2_fade = clip2[:fade_len]
+    clip1_fade = clip1[..., -fade_len:]
+    clip2_fade = clip2[..., :fade_len]
 
     # Equal power crossfade (S-curve)
     fade_in = np.sqrt(np.linspace(0, 1, fade_len))
@@ -22,46 +25,107 @@ def s_curve_xfade(clip1, clip2, sr, bars, bpm):
 
     xfade_part = clip1_fade * fade_out + clip2_fade * fade_in
 
-    return np.concatenate((clip1[:-fade_len], xfade_part, clip2[fade_len:]))
+    return np.concatenate((clip1[..., :-fade_len], xfade_part, clip2[..., fade_len:]), axis=-1)
 
-def filter_sweep(clip, sr, start_freq, end_freq, duration_sec):
+class StreamingXfade:
     """
-    Applies a filter sweep to a clip.
-    NOTE: This requires a filter implementation, e.g., from scipy.signal.
-    This is a placeholder for the concept.
+    Applies the same S-curve crossfades as s_curve_xfade between consecutive
+    sections, but on a stream of (channels, samples) blocks. Only the tail a
+    later crossfade can still touch is held back; everything else is released
+    as soon as it arrives.
     """
-    # A real implementation would use something like:
-    # from scipy.signal import butter, lfilter
-    # ... and apply it frame by frame with changing cutoff.
-    print(f"Applying filter sweep from {start_freq} to {end_freq} Hz.")
-    return clip # Return unmodified for now
 
-def echo_out(clip, sr, delay_sec, decay):
-    """
-    Adds a decaying echo effect to the end of a clip.
-    """
-    delay_samples = int(delay_sec * sr)
+    def __init__(self, section_lens, sr, bars, bpm):
+        duration_sec = (bars * 4 / bpm) * 60
+        fade = int(duration_sec * sr)
+
+        # Fade length per boundary, matching s_curve_xfade on the growing master
+        self.fades = []
+        master_len = section_lens[0] if section_lens else 0
+        for next_len in section_lens[1:]:
+            f = min(fade, master_len, next_len)
+            self.fades.append(f)
+            master_len += next_len - f
+
+        # Samples at the end of the master after each section that a later
+        # crossfade may still modify
+        self.holds = [0] * len(section_lens)
+        for k in range(len(self.fades) - 1, -1, -1):
+            reach = self.holds[k + 1] - section_lens[k + 1] + self.fades[k]
+            self.holds[k] = max(self.fades[k], reach)
+
+        self.section = -1
+        self.pending = None
+        self.head = None
+
+    def start_section(self):
+        """Marks the start of the next section in the stream."""
+        self.section += 1
+        fade = self.fades[self.section - 1] if self.section > 0 else 0
+        self.head = [] if fade else None
+
+    def push(self, block):
+        """Adds a block of the current section; returns audio ready to emit or None."""
+        if self.pending is None:
+            self.pending = block[..., :0]
 
-    # Create a new buffer with extra space for the echo tail
-    new_len = len(clip) + delay_samples * 4 # Add space for a few echos
-    out = np.zeros(new_len)
-    out[:len(clip)] = clip
+        if self.head is None:
+            self.pending = np.concatenate((self.pending, block), axis=-1)
+        else:
+            self.head.append(block)
+            head = np.concatenate(self.head, axis=-1)
+            fade = self.fades[self.section - 1]
+            if head.shape[-1] < fade:
+                return None
+            self.head = None
+            fade_in = np.sqrt(np.linspace(0, 1, fade))
+            fade_out = np.sqrt(np.linspace(1, 0, fade))
+            xfade_part = self.pending[..., -fade:] * fade_out + head[..., :fade] * fade_in
+            self.pending = np.concatenate((self.pending[..., :-fade], xfade_part, head[..., fade:]), axis=-1)
 
-    # Add decaying echos
-    for i in range(1, 5):
-        start = delay_samples * i
-        end = start + len(clip)
-        if start >= new_len: break
+        cut = self.pending.shape[-1] - self.holds[self.section]
+        if cut <= 0:
+            return None
+        out, self.pending = self.pending[..., :cut], self.pending[..., cut:]
+        return out
 
-        # Mix in the delayed and decayed signal
-        out[start:end] += clip * (decay ** i)
+    def finish(self):
+        """Returns whatever audio is still held back at the end of the stream."""
+        out, self.pending = self.pending, None
+        return out
 
+def filter_sweep(clip, sr, start_freq, end_freq, duration_sec, kind='lowpass'):
+    """
+    Applies a filter sweep to a clip: the cutoff glides exponentially from
+    start_freq to end_freq over duration_sec and then holds.
+    """
+    out = np.array(clip, dtype=np.float32)
+    block = np.atleast_2d(out)
+    sweep = FilterSweep(kind, start_freq, end_freq, duration_sec, sr, channels=block.shape[0])
+    FxChain([sweep]).process_buffer(block)
     return out
 
-def sidechain_duck(track_to_duck, trigger_track, sr):
+def echo_out(clip, sr, delay_sec, decay, repeats=4):
+    """
+    Adds a decaying echo effect to the end of a clip.
+    """
+    delay_samples = int(delay_sec * sr)
+    clip = np.asarray(clip, dtype=np.float32)
+    if delay_samples <= 0:
+        return clip.copy()
+
+    # Impulse response with one tap per echo; the FFT convolution replaces
+    # mixing delayed copies one by one.
+    taps = np.zeros(delay_samples * repeats + 1, dtype=np.float32)
+    taps[::delay_samples] = decay ** np.arange(repeats + 1)
+    return oaconvolve(clip, taps.reshape((1,) * (clip.ndim - 1) + (-1,)), axes=-1).astype(np.float32)
+
+def sidechain_duck(track_to_duck, trigger_track, sr, threshold_db=-30.0, ratio=4.0, attack_ms=10.0, release_ms=150.0):
     """
     Applies sidechain compression to one track based on the envelope of another.
-    This is a complex effect. Placeholder for the concept.
     """
-    print("Applying sidechain ducking.")
-    return track_to_duck # Return unmodified for now
+    out = np.array(track_to_duck, dtype=np.float32)
+    ducker = SidechainDucker(sr, threshold_db, ratio, attack_ms, release_ms)
+    n = min(out.shape[-1], np.shape(trigger_track)[-1])
+    FxChain([ducker]).process_buffer(out[..., :n], trigger=np.asarray(trigger_track, dtype=np.float32)[..., :n])
+    return out
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import librosa
+
+# Sample rate of every canonical asset; renders run at this rate.
+PROJECT_SAMPLE_RATE = 44100
+
+
+def canonical_path(audio_path: Path | str, sample_rate: int = PROJECT_SAMPLE_RATE) -> Path:
+    """Return the canonical ``.npy`` copy of ``audio_path`` (e.g. ``drums.44100.npy``)."""
+    return Path(audio_path).with_suffix(f".{sample_rate}.npy")
+
+
+def to_canonical(audio: np.ndarray, sr: int, sample_rate: int = PROJECT_SAMPLE_RATE) -> np.ndarray:
+    """Return ``audio`` as float32 ``(2, samples)`` at ``sample_rate``.
+
+    ``audio`` is ``(samples,)`` or ``(channels, samples)``; mono is duplicated
+    to both channels and anything wider keeps its first two.
+    """
+    audio = np.atleast_2d(np.asarray(audio, dtype=np.float32))
+    if audio.shape[0] == 1:
+        audio = np.repeat(audio, 2, axis=0)
+    audio = audio[:2]
+    if sr != sample_rate:
+        audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate, res_type="soxr_hq")
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def write_canonical(
+    audio_path: Path | str, audio: np.ndarray, sr: int, sample_rate: int = PROJECT_SAMPLE_RATE
+) -> Path:
+    """Write the canonical copy of ``audio_path`` from already decoded ``audio``.
+
+    Safe to call from several processes at once; the last complete write wins.
+    """
+    path = canonical_path(audio_path, sample_rate)
+    # A temp file per writer, so concurrent writers of one source never share
+    # one; readers never see a partially written file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp.npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, to_canonical(audio, sr, sample_rate))
+        os.replace(tmp, path)
+    except FileNotFoundError:
+        # Another writer won the race and its copy is in place
+        if not path.exists():
+            raise
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return path
+
+
+def ensure_canonical(audio_path: Path | str, sample_rate: int = PROJECT_SAMPLE_RATE) -> Path:
+    """Return the canonical copy of ``audio_path``, decoding the source first if needed.
+
+    The copy is created on first use, or when the source is newer than it, so
+    every later open skips decoding and resampling.
+    """
+    audio_path = Path(audio_path)
+    path = canonical_path(audio_path, sample_rate)
+    if not path.exists() or path.stat().st_mtime < audio_path.stat().st_mtime:
+        audio, sr = librosa.load(audio_path, sr=None, mono=False)
+        write_canonical(audio_path, audio, sr, sample_rate)
+    return path
+
+
+def open_canonical(audio_path: Path | str, sample_rate: int = PROJECT_SAMPLE_RATE) -> np.ndarray:
+    """Open the canonical copy of ``audio_path`` memory-mapped and read-only."""
+    return np.load(ensure_canonical(audio_path, sample_rate), mmap_mode="r")
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import fcntl
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import librosa
+import numpy as np
+from scipy.cluster.vq import kmeans2
+
+from core.envelopes import analysis_energy
+from core.harmony import BEST_CONFIDENCE
+from core.score import TrackFeatures, top_partners
+from schemas.models import Analysis
+
+# Buckets per tempo octave; half and double time share a bucket
+BPM_BUCKETS = 48
+N_MFCC = 20
+# MFCC means and deviations without the loudness coefficient, plus mean chroma
+EMBEDDING_DIM = 2 * (N_MFCC - 1) + 12
+# The embedding clusters are retrained once the index has grown this much
+_RETRAIN_GROWTH = 2
+_MIN_TRAIN = 1024
+_INDEX = "catalog.npz"
+
+
+def fold_bpm(bpm: np.ndarray | float) -> np.ndarray:
+    """Position of ``bpm`` within its tempo octave, in [0, 1).
+
+    Halving or doubling a tempo leaves the position unchanged, so 70 and 140
+    BPM fold together.
+    """
+    return np.mod(np.log2(np.asarray(bpm, dtype=np.float64)), 1.0)
+
+
+def bpm_bucket(bpm: np.ndarray | float) -> np.ndarray:
+    return (np.floor(fold_bpm(bpm) * BPM_BUCKETS) % BPM_BUCKETS).astype(np.int16)
+
+
+def track_embedding(power: np.ndarray, sr: int) -> np.ndarray:
+    """Unit-length timbre and harmony embedding from a power spectrogram.
+
+    MFCC statistics and mean chroma are normalised separately so neither
+    dominates the cosine similarity.
+    """
+    mel = librosa.feature.melspectrogram(S=power, sr=sr)
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)[1:]
+    chroma = librosa.feature.chroma_stft(S=power, sr=sr)
+    parts = [mfcc.mean(axis=1), mfcc.std(axis=1), chroma.mean(axis=1)]
+    parts = [p / (np.linalg.norm(p) + 1e-9) for p in parts]
+    return _unit(np.concatenate(parts))
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32)
+    return v / (np.linalg.norm(v, axis=-1, keepdims=True) + 1e-9)
+
+
+class PartnerIndex:
+    """Persistent index of analysed tracks for partner retrieval.
+
+    Holds the scoring features of every track (``core.score.TrackFeatures``)
+    plus a folded BPM bucket, an embedding and its coarse cluster. ``search``
+    filters by BPM bucket and key compatibility, takes the nearest candidates
+    by embedding from the closest clusters only, and fully scores those.
+    Tracks are added one at a time as their analyses land.
+    """
+
+    def __init__(self, root: Path | str | None = None):
+        self.root = Path(root) if root is not None else None
+        self.features = TrackFeatures.from_tracks([], [], [], [], [], [])
+        self.bucket = np.zeros(0, dtype=np.int16)
+        self.embedding = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.centroids: np.ndarray | None = None
+        self.cluster = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._rows
+
+    @classmethod
+    def open(cls, root: Path | str) -> "PartnerIndex":
+        """Load the index stored under ``root``, or an empty one."""
+        index = cls(root)
+        path = Path(root) / _INDEX
+        if not path.exists():
+            return index
+        with np.load(path) as data:
+            index.features = TrackFeatures(
+                ids=tuple(data["ids"].tolist()),
+                bpm=data["bpm"],
+                key_index=data["key_index"].astype(np.intp),
+                vocals=data["vocals"],
+                energy=data["energy"],
+                section_starts=data["section_starts"],
+                section_ends=data["section_ends"],
+                section_owner=data["section_owner"],
+            )
+            index.bucket = data["bucket"]
+            index.embedding = data["embedding"]
+            index.cluster = data["cluster"]
+            index.centroids = data["centroids"] if len(data["centroids"]) else None
+            index._trained_size = int(data["trained_size"])
+        index._rows = {tid: i for i, tid in enumerate(index.features.ids)}
+        return index
+
+    def save(self) -> Path:
+        """Write the index atomically under its root."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        f = self.features
+        tmp = self.root / f"{_INDEX}.tmp"
+        with open(tmp, "wb") as out:
+            np.savez(
+                out,
+                ids=np.array(f.ids, dtype=str),
+                bpm=f.bpm,
+                key_index=f.key_index,
+                vocals=f.vocals,
+                energy=f.energy,
+                section_starts=f.section_starts,
+                section_ends=f.section_ends,
+                section_owner=f.section_owner,
+                bucket=self.bucket,
+                embedding=self.embedding,
+                cluster=self.cluster,
+                centroids=self.centroids if self.centroids is not None else np.zeros((0, EMBEDDING_DIM)),
+                trained_size=self._trained_size,
+            )
+        os.replace(tmp, self.root / _INDEX)
+        return self.root / _INDEX
+
+    def add(
+        self, track_id: str, analysis: Analysis, embedding: np.ndarray, energy: np.ndarray | None = None
+    ) -> None:
+        """Index one analysed track, replacing any earlier entry for ``track_id``.
+
+        ``energy`` is the track's energy envelope; by default the one stored
+        in the analysis.
+        """
+        if track_id in self._rows:
+            self.remove(track_id)
+        if energy is None:
+            energy = analysis_energy(analysis)
+        new = TrackFeatures.from_tracks(
+            [track_id], [analysis.bpm], [analysis.key], [analysis.vocals_presence], [energy], [analysis.sections]
+        )
+        vector = _unit(embedding)[None, :]
+        self._rows[track_id] = len(self)
+        self.features = self.features.concat(new)
+        self.bucket = np.concatenate([self.bucket, bpm_bucket([analysis.bpm])])
+        self.embedding = np.concatenate([self.embedding, vector])
+        cluster = int(np.argmax(self.centroids @ vector[0])) if self.centroids is not None else 0
+        self.cluster = np.append(self.cluster, np.int32(cluster))
+        if len(self) >= max(_MIN_TRAIN, _RETRAIN_GROWTH * self._trained_size):
+            self.train()
+
+    def remove(self, track_id: str) -> None:
+        row = self._rows.pop(track_id)
+        keep = np.delete(np.arange(len(self)), row)
+        self.features = self.features.take(keep)
+        self.bucket = self.bucket[keep]
+        self.embedding = self.embedding[keep]
+        self.cluster = self.cluster[keep]
+        self._rows = {tid: i for i, tid in enumerate(self.features.ids)}
+
+    def train(self) -> None:
+        """Cluster the embeddings (about sqrt(N) clusters) for approximate search."""
+        n_clusters = max(1, int(np.sqrt(len(self))))
+        centroids, _ = kmeans2(self.embedding.astype(np.float64), n_clusters, minit="++", seed=0)
+        self.centroids = _unit(centroids)
+        self.cluster = np.argmax(self.embedding @ self.centroids.T, axis=1).astype(np.int32)
+        self._trained_size = len(self)
+
+    def retrieve(
+        self,
+        track_id: str,
+        limit: int = 200,
+        bpm_window: int = 2,
+        min_key_confidence: float = 0.5,
+        n_probe: int = 8,
+    ) -> np.ndarray:
+        """Rows of up to ``limit`` candidates for ``track_id``, nearest embedding first.
+
+        Candidates lie within ``bpm_window`` folded BPM buckets of the query,
+        have a key reachable with at least ``min_key_confidence`` and, once
+        the index is clustered, sit in one of the ``n_probe`` clusters closest
+        to the query.
+        """
+        q = self._rows[track_id]
+        distance = (self.bucket.astype(np.int32) - self.bucket[q]) % BPM_BUCKETS
+        mask = np.minimum(distance, BPM_BUCKETS - distance) <= bpm_window
+        mask &= BEST_CONFIDENCE[self.features.key_index[q], self.features.key_index] >= min_key_confidence
+        if self.centroids is not None:
+            probe = np.argsort(self.centroids @ self.embedding[q])[-n_probe:]
+            mask &= np.isin(self.cluster, probe)
+        mask[q] = False
+        rows = np.flatnonzero(mask)
+        similarity = self.embedding[rows] @ self.embedding[q]
+        if len(rows) > limit:
+            best = np.argpartition(-similarity, limit - 1)[:limit]
+            rows, similarity = rows[best], similarity[best]
+        return rows[np.argsort(-similarity, kind="stable")]
+
+    def search(self, track_id: str, k: int = 10, **retrieve_options) -> List[Tuple[str, float, Dict[str, float]]]:
+        """The ``k`` best partners of an indexed track, scored with ``core.score``."""
+        rows = self.retrieve(track_id, **retrieve_options)
+        query = self.features.take([self._rows[track_id]])
+        return top_partners(query, self.features.take(rows), k=k)
+
+
+def update_catalog(
+    root: Path | str, track_id: str, analysis: Analysis, embedding: np.ndarray, energy: np.ndarray | None = None
+) -> None:
+    """Add one analysis to the index under ``root``; safe across worker processes."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / "catalog.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = PartnerIndex.open(root)
+        index.add(track_id, analysis, embedding, energy)
+        index.save()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import base64
+from typing import List, Sequence
+
+import librosa
+import numpy as np
+
+from schemas.models import Analysis, EnergyEnvelope
+
+# Fixed-rate resolutions stored next to the beat-synchronous envelope
+ENVELOPE_RATES_HZ = (4.0, 1.0)
+
+
+def encode_envelope(values: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(values, dtype="<f2").tobytes()).decode("ascii")
+
+
+def decode_envelope(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f2").astype(np.float32)
+
+
+def resample_envelope(values: np.ndarray, length: int) -> np.ndarray:
+    """Linearly resample ``values`` to ``length`` points spanning the same time."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == length:
+        return values
+    if len(values) < 2:
+        return np.full(length, values[0] if len(values) else 0.0)
+    return np.interp(np.linspace(0.0, 1.0, length), np.linspace(0.0, 1.0, len(values)), values)
+
+
+def _fixed_rate(rms: np.ndarray, frame_rate: float, rate_hz: float) -> np.ndarray:
+    """Mean of ``rms`` over consecutive windows of ``1 / rate_hz`` seconds."""
+    bins = np.floor(np.arange(len(rms)) * rate_hz / frame_rate).astype(int)
+    return np.bincount(bins, rms) / np.bincount(bins)
+
+
+def energy_envelopes(
+    rms: np.ndarray, frame_rate: float, beat_frames: np.ndarray, rates_hz: Sequence[float] = ENVELOPE_RATES_HZ
+) -> List[EnergyEnvelope]:
+    """Beat-synchronous and fixed-rate float16 envelopes of frame RMS.
+
+    The beat envelope has one value per beat interval of the beatgrid.
+    """
+    envelopes = []
+    if len(beat_frames):
+        # sync adds a segment before the first beat; drop it so values start on beats
+        beats = librosa.util.sync(rms[None, :], beat_frames, aggregate=np.mean)[0, 1:]
+        envelopes.append(EnergyEnvelope(rate_hz=None, data=encode_envelope(beats)))
+    for rate in rates_hz:
+        envelopes.append(EnergyEnvelope(rate_hz=rate, data=encode_envelope(_fixed_rate(rms, frame_rate, rate))))
+    return envelopes
+
+
+def analysis_energy(analysis: Analysis, rate_hz: float | None = 1.0) -> np.ndarray:
+    """The stored energy envelope at ``rate_hz`` (None for per beat).
+
+    Falls back to any stored envelope, then to the scalar ``Analysis.energy``.
+    """
+    for env in analysis.energy_envelopes:
+        if env.rate_hz == rate_hz:
+            return decode_envelope(env.data)
+    if analysis.energy_envelopes:
+        return decode_envelope(analysis.energy_envelopes[0].data)
+    return np.array([analysis.energy], dtype=np.float32)
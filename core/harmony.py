@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-import math
 from typing import Tuple
 
+import numpy as np
+
 from schemas.models import KeyInfo, KeyStrategy
 
 # Camelot wheel mappings copied from analyze service to avoid cross import
@@ -15,6 +16,12 @@ _CAMELot_MINOR = {
     "F#": "11A", "G": "6A", "Ab": "1A", "A": "8A", "Bb": "3A", "B": "10A",
 }
 _PITCHES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+_PITCH_INDEX = {pc: i for i, pc in enumerate(_PITCHES)}
+
+# Pitch shifts considered for the second track, in semitones
+SHIFTS = np.arange(-3, 4)
+# Penalty at which confidence reaches zero
+_MAX_PENALTY = 6.0
 
 
 def _camelot(key: KeyInfo) -> Tuple[int, str]:
@@ -27,7 +34,7 @@ def _camelot(key: KeyInfo) -> Tuple[int, str]:
 
 
 def _shift_pitch_class(pc: str, semitones: int) -> str:
-    idx = (_PITCHES.index(pc) + semitones) % 12
+    idx = (_PITCH_INDEX[pc] + semitones) % 12
     return _PITCHES[idx]
 
 
@@ -44,22 +51,67 @@ def _camelot_distance(a: Tuple[int, str], b: Tuple[int, str]) -> float:
     return wheel_dist + mode_pen
 
 
+def key_index(pitch_class: int | str, mode: int | str) -> int:
+    """Index into the 24-key tables: pitch class 0-11, plus 12 for minor."""
+    pc = _PITCH_INDEX[pitch_class] if isinstance(pitch_class, str) else int(pitch_class)
+    minor = mode == "minor" if isinstance(mode, str) else bool(mode)
+    return pc + 12 * minor
+
+
+def _build_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    keys = [KeyInfo(pitch_class=pc, mode=mode) for mode in ("major", "minor") for pc in _PITCHES]
+    codes = [_camelot(k) for k in keys]
+    distance = np.array([[_camelot_distance(a, b) for b in codes] for a in codes])
+    # shifted[b, s]: key index of key b moved by SHIFTS[s]
+    idx = np.arange(24)
+    shifted = (idx[:, None] % 12 + SHIFTS[None, :]) % 12 + 12 * (idx[:, None] >= 12)
+    # penalty[a, b, s] = distance from a to b shifted by s, plus the shift size
+    penalty = distance[:, shifted] + np.abs(SHIFTS)
+    # argmin keeps the first (most negative) shift on ties, as the pairwise loop did
+    best = penalty.argmin(axis=-1)
+    return distance, SHIFTS[best].astype(np.int8), np.take_along_axis(penalty, best[..., None], -1)[..., 0]
+
+
+# 24x24 Camelot distances, and the best shift of key b towards key a with its penalty
+CAMELOT_DISTANCE, BEST_SHIFT, BEST_PENALTY = _build_tables()
+BEST_CONFIDENCE = np.maximum(0.0, 1.0 - BEST_PENALTY / _MAX_PENALTY).astype(np.float32)
+
+
+def key_indices(pitch_classes: np.ndarray, modes: np.ndarray) -> np.ndarray:
+    """Vectorised ``key_index`` for arrays of pitch class indices and modes (0/1 or strings)."""
+    modes = np.asarray(modes)
+    minor = modes == "minor" if modes.dtype.kind in "US" else modes.astype(bool)
+    return np.asarray(pitch_classes, dtype=np.intp) % 12 + 12 * minor
+
+
+def key_matrix(
+    pitch_classes: np.ndarray,
+    modes: np.ndarray,
+    other_pitch_classes: np.ndarray | None = None,
+    other_modes: np.ndarray | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best pitch shift and confidence for every pair of tracks.
+
+    Returns ``(shift, confidence)`` shaped ``(N, M)``: entry ``[i, j]`` is the
+    shift for track ``j`` of the other set (the same set when omitted) to match
+    track ``i``, as ``suggest_key_strategy(i, j)`` would return. Both are plain
+    lookups into the precomputed 24x24 tables, so scoring one track against a
+    whole catalog is a single gather.
+    """
+    rows = key_indices(pitch_classes, modes)
+    if other_pitch_classes is None:
+        cols = rows
+    else:
+        cols = key_indices(other_pitch_classes, other_modes)
+    return BEST_SHIFT[rows[:, None], cols[None, :]], BEST_CONFIDENCE[rows[:, None], cols[None, :]]
+
+
 def suggest_key_strategy(track_a: KeyInfo, track_b: KeyInfo) -> Tuple[KeyStrategy, float]:
     """Suggest pitch shift in semitones for track_b to best match track_a.
 
     Returns a KeyStrategy and a confidence score [0,1].
     """
-    best_shift = 0
-    best_penalty = math.inf
-    code_a = _camelot(track_a)
-    for shift in range(-3, 4):
-        shifted_pc = _shift_pitch_class(track_b.pitch_class, shift)
-        shifted_key = KeyInfo(pitch_class=shifted_pc, mode=track_b.mode)
-        code_b = _camelot(shifted_key)
-        dist = _camelot_distance(code_a, code_b)
-        penalty = dist + abs(shift) * 1.0  # discourage large shifts strongly
-        if penalty < best_penalty:
-            best_penalty = penalty
-            best_shift = shift
-    confidence = max(0.0, 1.0 - best_penalty / 6.0)
-    return KeyStrategy(pitch_shift_semitones=float(best_shift)), confidence
+    a = key_index(track_a.pitch_class, track_a.mode)
+    b = key_index(track_b.pitch_class, track_b.mode)
+    confidence = max(0.0, 1.0 - float(BEST_PENALTY[a, b]) / _MAX_PENALTY)
+    return KeyStrategy(pitch_shift_semitones=float(BEST_SHIFT[a, b])), confidence
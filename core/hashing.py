@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+import librosa
+import numpy as np
+import pyrubberband
+import scipy
+
+from core.stretch import rubberband_version
+
+
+def canonical_json(obj: Any) -> str:
+    """Serialise ``obj`` with sorted keys and no whitespace, so equal plans hash equally."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def hash_json(obj: Any) -> str:
+    """SHA-256 of ``obj`` as canonical JSON."""
+    return hashlib.sha256(canonical_json(obj).encode()).hexdigest()
+
+
+def hash_audio(audio: np.ndarray) -> str:
+    """SHA-256 of an audio array's dtype, shape and samples."""
+    audio = np.ascontiguousarray(audio)
+    h = hashlib.sha256(f"{audio.dtype.str}{audio.shape}".encode())
+    h.update(memoryview(audio).cast("B"))
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_file(path: Path | str) -> str:
+    """SHA-256 of a file's content; unchanged files (same size and mtime) are read once."""
+    st = os.stat(path)
+    return _file_sha256(str(path), st.st_size, st.st_mtime_ns)
+
+
+def library_versions() -> Dict[str, str]:
+    """Versions of the libraries and tools that shape rendered samples.
+
+    Render cache keys include these, so upgrading any of them, the Rubber
+    Band CLI included, never serves audio rendered by the old version.
+    """
+    return {
+        "librosa": librosa.__version__,
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "pyrubberband": pyrubberband.__version__,
+        "rubberband": rubberband_version(),
+    }
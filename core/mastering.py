@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+from scipy.ndimage import minimum_filter1d
+from scipy.signal import firwin, lfilter, sosfilt
+
+# Loudness target for rendered mixes (streaming-platform level)
+TARGET_LUFS = -14.0
+CEILING_DB = -1.0
+
+# BS.1770 gating: 400 ms blocks with 75% overlap
+GATE_BLOCK_SEC = 0.4
+GATE_STEP_SEC = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+# True-peak detection: 4x polyphase oversampling; an odd tap count keeps
+# phase 0 on the input samples
+OVERSAMPLE = 4
+_TP_TAPS = 49
+# Delay of the interpolator, in input samples (rounded up)
+_TP_DELAY = (_TP_TAPS - 1) // 2 // OVERSAMPLE
+
+
+def k_weighting_sos(sr: int) -> np.ndarray:
+    """BS.1770 K-weighting (high shelf + RLB high-pass) for any sample rate, as SOS."""
+    # High shelf modelling the acoustic effect of the head
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+        1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0,
+    ]
+    # RLB high-pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+
+class LoudnessMeter:
+    """Incremental BS.1770 / EBU R128 integrated loudness.
+
+    Blocks are K-weighted with carried filter state and reduced to the mean
+    square of each 100 ms step; gating runs over the 400 ms blocks formed by
+    four consecutive steps, so memory grows with ten floats per second of
+    audio rather than the audio.
+    """
+
+    def __init__(self, sr: int, channels: int = 2):
+        self.sos = k_weighting_sos(sr)
+        self.zi = np.zeros((self.sos.shape[0], channels, 2))
+        self.step = max(int(round(GATE_STEP_SEC * sr)), 1)
+        self.steps_per_block = int(round(GATE_BLOCK_SEC / GATE_STEP_SEC))
+        self.step_powers: List[float] = []
+        self._partial = 0.0
+        self._partial_n = 0
+
+    def process(self, block: np.ndarray) -> None:
+        """Feed a ``(channels, samples)`` block; the block itself is not modified."""
+        weighted, self.zi = sosfilt(self.sos, np.asarray(block, dtype=np.float64), axis=-1, zi=self.zi)
+        # Channel weights are 1.0 for L/R (no surround channels here)
+        power = np.square(weighted).sum(axis=0)
+        head = min(self.step - self._partial_n, power.shape[-1])
+        self._partial += power[:head].sum()
+        self._partial_n += head
+        if self._partial_n < self.step:
+            return
+        self.step_powers.append(self._partial / self.step)
+        rest = power[head:]
+        n_full = rest.shape[-1] // self.step
+        self.step_powers.extend(rest[: n_full * self.step].reshape(n_full, self.step).mean(axis=-1).tolist())
+        tail = rest[n_full * self.step :]
+        self._partial = tail.sum()
+        self._partial_n = tail.shape[-1]
+
+    def block_powers(self) -> np.ndarray:
+        steps = np.asarray(self.step_powers)
+        n = self.steps_per_block
+        if steps.shape[-1] < n:
+            return steps[:0]
+        csum = np.concatenate([[0.0], np.cumsum(steps)])
+        return (csum[n:] - csum[:-n]) / n
+
+    def integrated(self) -> float:
+        """Gated integrated loudness in LUFS so far; -inf until a block passes the gates."""
+        z = self.block_powers()
+        with np.errstate(divide="ignore"):
+            z = z[-0.691 + 10 * np.log10(z) > ABSOLUTE_GATE_LUFS]
+            if not z.size:
+                return float("-inf")
+            relative = -0.691 + 10 * np.log10(z.mean()) + RELATIVE_GATE_LU
+            z = z[-0.691 + 10 * np.log10(z) > relative]
+            return float(-0.691 + 10 * np.log10(z.mean()))
+
+
+def integrated_loudness(y: np.ndarray, sr: int, block_size: int = 65536) -> float:
+    """Integrated loudness of a whole buffer, measured block by block."""
+    y = np.atleast_2d(y)
+    meter = LoudnessMeter(sr, channels=y.shape[0])
+    for i in range(0, y.shape[-1], block_size):
+        meter.process(y[:, i : i + block_size])
+    return meter.integrated()
+
+
+class TruePeakLimiter:
+    """Look-ahead brickwall limiter on 4x-oversampled true peak, linked across channels.
+
+    Per block, the required gain is min-filtered over the look-ahead window,
+    released exponentially in the dB domain (a running max, so no per-sample
+    loop) and box-smoothed over the look-ahead, which keeps every output
+    sample under the ceiling while the gain glides into each peak. The audio
+    is delayed by ``latency`` samples; call ``flush()`` at the end of a stream.
+    """
+
+    def __init__(
+        self,
+        sr: int,
+        ceiling_db: float = CEILING_DB,
+        lookahead_ms: float = 5.0,
+        release_ms: float = 100.0,
+        channels: int = 2,
+    ):
+        self.ceiling = 10 ** (ceiling_db / 20)
+        self.L = max(int(sr * lookahead_ms / 1000), 1)
+        self.latency = self.L + _TP_DELAY
+        self.log_release = -1.0 / (sr * release_ms / 1000)
+        h = firwin(_TP_TAPS, 1.0 / OVERSAMPLE) * OVERSAMPLE
+        self.phases = [h[p::OVERSAMPLE] for p in range(OVERSAMPLE)]
+        self.tp_zi = [np.zeros((channels, len(hp) - 1)) for hp in self.phases]
+        self.delay = np.zeros((channels, self.latency), dtype=np.float32)
+        self.gain_hist = np.ones(self.L)  # required gain, last L samples
+        self.smooth_hist = np.ones(self.L)  # released gain, last L samples
+        self.release_db = 0.0
+
+    def _true_peak(self, block: np.ndarray) -> np.ndarray:
+        peak = np.zeros(block.shape[-1])
+        for p, hp in enumerate(self.phases):
+            y, self.tp_zi[p] = lfilter(hp, [1.0], block, axis=-1, zi=self.tp_zi[p])
+            np.maximum(peak, np.abs(y).max(axis=0), out=peak)
+        return peak
+
+    def _gain(self, peak: np.ndarray) -> np.ndarray:
+        n = peak.shape[-1]
+        required = np.minimum(1.0, self.ceiling / np.maximum(peak, 1e-12))
+        # Min over the current sample and the L before it
+        window = np.concatenate([self.gain_hist, required])
+        held = minimum_filter1d(window, self.L + 1, origin=self.L // 2)[self.L :]
+        self.gain_hist = window[-self.L :]
+
+        # Release: att[n] = max(held_att[n], att[n - 1] * c), solved as a
+        # running max in the log domain
+        with np.errstate(divide="ignore"):
+            log_att = np.log(-20 * np.log10(held))
+            log_prev = np.log(self.release_db) if self.release_db > 0 else -np.inf
+        k = np.arange(n)
+        acc = np.maximum(np.maximum.accumulate(log_att - k * self.log_release), log_prev + self.log_release)
+        att = np.exp(acc + k * self.log_release)
+        self.release_db = float(att[-1]) if n else self.release_db
+        released = 10 ** (-att / 20)
+
+        # Box average over the look-ahead window
+        window = np.concatenate([self.smooth_hist, released])
+        csum = np.concatenate([[0.0], np.cumsum(window)])
+        smoothed = (csum[self.L + 1 :] - csum[: -self.L - 1]) / (self.L + 1)
+        self.smooth_hist = window[-self.L :]
+        return smoothed
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Return the limited, delayed block (same length as the input)."""
+        if not block.shape[-1]:
+            return block.astype(np.float32, copy=False)
+        gain = self._gain(self._true_peak(block))
+        audio = np.concatenate([self.delay, block], axis=-1)
+        self.delay = audio[:, block.shape[-1] :]
+        return (audio[:, : block.shape[-1]] * gain).astype(np.float32)
+
+    def flush(self) -> np.ndarray:
+        """Drain the look-ahead delay line."""
+        return self.process(np.zeros_like(self.delay))
+
+
+class StreamingMaster:
+    """Block-streaming mastering: loudness normalisation, then the true-peak limiter.
+
+    The gain tracks the integrated loudness measured so far and ramps
+    linearly across each block, so it settles as the measurement does
+    without a second pass over the mix. Boost is capped at ``max_gain_db`` so
+    near-silent intros are not pulled up to the target.
+    """
+
+    def __init__(
+        self,
+        sr: int,
+        target_lufs: float = TARGET_LUFS,
+        ceiling_db: float = CEILING_DB,
+        max_gain_db: float = 12.0,
+        channels: int = 2,
+    ):
+        self.target_lufs = target_lufs
+        self.max_gain_db = max_gain_db
+        self.meter = LoudnessMeter(sr, channels=channels)
+        self.limiter = TruePeakLimiter(sr, ceiling_db=ceiling_db, channels=channels)
+        self.gain_db = 0.0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        self.meter.process(block)
+        loudness = self.meter.integrated()
+        target = self.gain_db
+        if np.isfinite(loudness):
+            target = min(self.target_lufs - loudness, self.max_gain_db)
+        ramp = np.linspace(self.gain_db, target, block.shape[-1], endpoint=False) if block.shape[-1] else target
+        self.gain_db = target
+        return self.limiter.process(block * 10 ** (ramp / 20))
+
+    def flush(self) -> np.ndarray:
+        return self.limiter.flush()
+
+
+def master(y: np.ndarray, sr: int, target_lufs: float = TARGET_LUFS, ceiling_db: float = CEILING_DB) -> np.ndarray:
+    """Normalise a whole mix to ``target_lufs`` and true-peak limit it to ``ceiling_db``.
+
+    ``y`` is ``(samples,)`` or ``(channels, samples)``; the result has the
+    same shape. Mixes too short or quiet to measure are only limited.
+    """
+    audio = np.atleast_2d(np.asarray(y, dtype=np.float32))
+    loudness = integrated_loudness(audio, sr)
+    if np.isfinite(loudness):
+        audio = (audio * 10 ** ((target_lufs - loudness) / 20)).astype(np.float32)
+    limiter = TruePeakLimiter(sr, ceiling_db=ceiling_db, channels=audio.shape[0])
+    limited = np.concatenate([limiter.process(audio), limiter.flush()], axis=-1)[:, limiter.latency :]
+    return limited.reshape(np.shape(y))
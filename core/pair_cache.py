@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Mapping, Tuple
+
+from infra.metrics import pair_score_cache_requests
+
+
+def content_hash(obj: Any) -> str:
+    """SHA-256 of ``obj`` serialised as canonical JSON."""
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def pair_key(hash_a: str, hash_b: str, weights: Mapping[str, float] | None = None) -> Tuple[str, bool]:
+    """Cache key of an unordered pair, and whether ``(a, b)`` is the reverse of its stored order.
+
+    A/B and B/A share one key, so a score computed for either order serves both.
+    """
+    first, second = sorted((hash_a, hash_b))
+    key = content_hash({"pair": [first, second], "weights": dict(weights or {})})
+    return key, hash_a != first
+
+
+class PairScoreCache:
+    """Pair scores in a bounded in-memory LRU, optionally backed by SQLite.
+
+    Values must be JSON serialisable. A memory miss falls through to the
+    SQLite tier when ``path`` is given, and entries found there are promoted
+    into memory. Every lookup is counted in ``pair_score_cache_requests``.
+    """
+
+    def __init__(self, maxsize: int = 4096, path: Path | str | None = None):
+        self.maxsize = maxsize
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS pair_scores (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        pair_score_cache_requests.labels(result="hit" if hit else "miss").inc()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._count(True)
+                return self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM pair_scores WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self._count(True)
+                    return value
+            self._count(False)
+            return None
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pair_scores (key, value) VALUES (?, ?)", (key, json.dumps(value))
+                )
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+# Binary layout (little endian):
+#   header  : magic "MPKS", version u16, channels u16, sample_rate u32,
+#             n_samples u64, n_levels u16
+#   levels  : n_levels x (samples_per_bin u32, n_bins u64, offset u64)
+#   payload : per level, int16 array shaped (n_bins, channels, 3) holding
+#             min, max and RMS scaled to full-scale 16-bit.
+MAGIC = b"MPKS"
+VERSION = 1
+DEFAULT_BINS = (256, 1024, 4096)
+_HEADER = struct.Struct("<4sHHIQH")
+_LEVEL = struct.Struct("<IQQ")
+
+
+def peaks_path(audio_path: Path | str) -> Path:
+    """Return the peaks file that sits next to ``audio_path``."""
+    return Path(audio_path).with_suffix(".peaks")
+
+
+def _base_level(y: np.ndarray, samples_per_bin: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n_bins = -(-y.shape[-1] // samples_per_bin)
+    padded = np.zeros((y.shape[0], n_bins * samples_per_bin), dtype=np.float32)
+    padded[:, : y.shape[-1]] = y
+    # Padding must not pull the min/max of the last bin towards zero
+    if n_bins and y.shape[-1] % samples_per_bin:
+        padded[:, y.shape[-1] :] = padded[:, y.shape[-1] - 1 : y.shape[-1]]
+    frames = padded.reshape(y.shape[0], n_bins, samples_per_bin)
+    mean_sq = np.square(frames).mean(axis=-1)
+    return frames.min(axis=-1), frames.max(axis=-1), mean_sq
+
+
+def build_peaks(y: np.ndarray, bins: Sequence[int] = DEFAULT_BINS) -> Dict[int, np.ndarray]:
+    """Compute min/max/RMS per bin for every resolution in ``bins``.
+
+    ``y`` is ``(samples,)`` or ``(channels, samples)``. Coarser levels are
+    reduced from the finest one when the bin sizes divide evenly. Returns a
+    mapping of samples-per-bin to an int16 array shaped ``(n_bins, channels, 3)``.
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=np.float32))
+    bins = sorted(bins)
+    levels: Dict[int, np.ndarray] = {}
+    lo, hi, ms = _base_level(y, bins[0])
+    base = bins[0]
+    for spb in bins:
+        if spb % base:
+            lo, hi, ms = _base_level(y, spb)
+        elif spb != base:
+            factor = spb // base
+            n = -(-lo.shape[-1] // factor)
+            pad = n * factor - lo.shape[-1]
+            edge = ((0, 0), (0, pad))
+            lo = np.pad(lo, edge, mode="edge").reshape(y.shape[0], n, factor).min(axis=-1)
+            hi = np.pad(hi, edge, mode="edge").reshape(y.shape[0], n, factor).max(axis=-1)
+            ms = np.pad(ms, edge, mode="edge").reshape(y.shape[0], n, factor).mean(axis=-1)
+        base = spb
+        stacked = np.stack([lo, hi, np.sqrt(ms)], axis=-1)  # (channels, bins, 3)
+        levels[spb] = (np.clip(stacked, -1.0, 1.0) * 32767).astype("<i2").transpose(1, 0, 2)
+    return levels
+
+
+def write_peaks(path: Path | str, y: np.ndarray, sample_rate: int, bins: Sequence[int] = DEFAULT_BINS) -> Path:
+    """Write the peak pyramid of ``y`` to ``path`` and return the path."""
+    path = Path(path)
+    y = np.atleast_2d(np.asarray(y, dtype=np.float32))
+    levels = build_peaks(y, bins)
+    offset = _HEADER.size + _LEVEL.size * len(levels)
+    table = []
+    for spb, data in levels.items():
+        table.append(_LEVEL.pack(spb, data.shape[0], offset))
+        offset += data.nbytes
+    with path.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, y.shape[0], sample_rate, y.shape[-1], len(levels)))
+        f.write(b"".join(table))
+        for data in levels.values():
+            f.write(data.tobytes())
+    return path
+
+
+def read_peaks(path: Path | str, start: int = 0, end: int | None = None, max_bins: int = 2048) -> Dict[str, Any]:
+    """Return peaks covering samples ``start:end`` at the finest level that fits.
+
+    The level is the finest one with at most ``max_bins`` bins in the window
+    (the coarsest level if none fits). Only that slice is read from disk.
+    """
+    path = Path(path)
+    with path.open("rb") as f:
+        magic, version, channels, sample_rate, n_samples, n_levels = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a peaks file: {path}")
+        table = [_LEVEL.unpack(f.read(_LEVEL.size)) for _ in range(n_levels)]
+    end = n_samples if end is None else min(end, n_samples)
+    start = max(0, min(start, end))
+
+    spb, n_bins, offset = table[-1]
+    for level in table:
+        if -(-(end - start) // level[0]) <= max_bins:
+            spb, n_bins, offset = level
+            break
+    first = start // spb
+    last = min(-(-end // spb), n_bins)
+    data = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(n_bins, channels, 3))
+    window = np.asarray(data[first:last], dtype=np.float32) / 32767
+    return {
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "samples_per_bin": spb,
+        "start_sample": first * spb,
+        "min": window[..., 0].T.tolist(),
+        "max": window[..., 1].T.tolist(),
+        "rms": window[..., 2].T.tolist(),
+    }
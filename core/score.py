@@ -1,24 +1,73 @@
 from __future__ import annotations
 
-from typing import Dict, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Sequence, Tuple
 
 import numpy as np
 
+from core.envelopes import analysis_energy, resample_envelope
+from core.harmony import BEST_CONFIDENCE, key_index, suggest_key_strategy
+from core.pair_cache import PairScoreCache, content_hash, pair_key
+from schemas.models import Analysis
+
+FACTORS = ("key", "tempo", "sections", "vocals", "energy")
+DEFAULT_WEIGHTS = {name: 1.0 for name in FACTORS}
+# Energy envelopes are resampled to this many points before correlating
+ENVELOPE_POINTS = 64
+
+
+def _coverage_integral(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Breakpoints and values of F(t) = integral of the number of intervals covering t.
+
+    F is piecewise linear between the sorted interval boundaries, so the summed
+    pairwise overlap of any interval [s, e] with the set is ``F(e) - F(s)``.
+    """
+    points = np.unique(np.concatenate([starts, ends])).astype(np.float64)
+    if not len(points):
+        return np.zeros(1), np.zeros(1)
+    # Intervals covering each elementary span [points[i], points[i + 1])
+    covering = np.searchsorted(np.sort(starts), points[:-1], side="right") - np.searchsorted(
+        np.sort(ends), points[:-1], side="right"
+    )
+    values = np.concatenate([[0.0], np.cumsum(covering * np.diff(points))])
+    return points, values
+
+
+def _intervals(sections) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.array([s.start_ms for s in sections], dtype=np.float64)
+    ends = np.array([s.end_ms for s in sections], dtype=np.float64)
+    return starts, ends
+
 
 def section_overlap(sections_a, sections_b) -> float:
     """Compute overlap ratio between two sets of sections."""
-    total_a = sum(s.end_ms - s.start_ms for s in sections_a)
-    total_b = sum(s.end_ms - s.start_ms for s in sections_b)
+    starts_a, ends_a = _intervals(sections_a)
+    starts_b, ends_b = _intervals(sections_b)
+    total_a = (ends_a - starts_a).sum()
+    total_b = (ends_b - starts_b).sum()
     if not total_a or not total_b:
         return 0.0
-    overlap = 0
-    for sa in sections_a:
-        for sb in sections_b:
-            start = max(sa.start_ms, sb.start_ms)
-            end = min(sa.end_ms, sb.end_ms)
-            if end > start:
-                overlap += end - start
-    return overlap / min(total_a, total_b)
+    points, values = _coverage_integral(starts_a, ends_a)
+    overlap = (np.interp(ends_b, points, values) - np.interp(starts_b, points, values)).sum()
+    return float(overlap / min(total_a, total_b))
+
+
+def normalize_envelopes(envelopes: Sequence[np.ndarray], points: int = ENVELOPE_POINTS) -> np.ndarray:
+    """Resample energy envelopes to ``points`` samples and z-normalise each row.
+
+    The row mean of the product of two normalised envelopes is their Pearson
+    correlation, so a query is correlated with every candidate in one matmul.
+    Flat or empty envelopes become zeros and correlate as 0.
+    """
+    out = np.zeros((len(envelopes), points), dtype=np.float32)
+    for i, env in enumerate(envelopes):
+        if not len(env):
+            continue
+        row = resample_envelope(env, points)
+        std = row.std()
+        if std > 0:
+            out[i] = (row - row.mean()) / std
+    return out
 
 
 def mashability_score(
@@ -29,15 +78,19 @@ def mashability_score(
     vocal_density_b: float,
     energy_a: np.ndarray,
     energy_b: np.ndarray,
+    weights: Mapping[str, float] | None = None,
 ) -> Tuple[float, Dict[str, float]]:
-    """Compute mashability score between 0 and 1 with rationale."""
+    """Compute mashability score between 0 and 1 with rationale.
+
+    The score is the ``weights``-weighted mean of the factors, equal weights
+    by default.
+    """
     tempo_factor = max(0.0, 1.0 - abs(1 - tempo_ratio))
     vocal_conflict = 1.0 - abs(vocal_density_a - vocal_density_b)
-    if len(energy_a) != len(energy_b):
-        L = min(len(energy_a), len(energy_b))
-        energy_a = energy_a[:L]
-        energy_b = energy_b[:L]
-    energy_corr = float(np.corrcoef(energy_a, energy_b)[0, 1]) if len(energy_a) and len(energy_b) else 0.0
+    # Envelopes span whole tracks, so they are resampled rather than truncated,
+    # onto the same grid batch scoring uses
+    rows = normalize_envelopes([energy_a, energy_b])
+    energy_corr = float(rows[0] @ rows[1]) / rows.shape[1]
     energy_factor = (energy_corr + 1.0) / 2.0
     factors = {
         "key": key_confidence,
@@ -46,5 +99,172 @@ def mashability_score(
         "vocals": vocal_conflict,
         "energy": energy_factor,
     }
-    score = float(np.clip(np.mean(list(factors.values())), 0.0, 1.0))
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    total = sum(weights.values())
+    if not total:
+        raise ValueError("Total weight cannot be zero")
+    score = sum(factors[name] * weights.get(name, 0.0) for name in FACTORS) / total
+    return float(np.clip(score, 0.0, 1.0)), factors
+
+
+def pair_score(
+    analysis_a: Analysis,
+    analysis_b: Analysis,
+    energy_a: np.ndarray | None = None,
+    energy_b: np.ndarray | None = None,
+    cache: PairScoreCache | None = None,
+    weights: Mapping[str, float] | None = None,
+) -> Tuple[float, Dict[str, float]]:
+    """``mashability_score`` of two analysed tracks, memoized in ``cache``.
+
+    Energy envelopes default to the ones stored in each analysis, so no
+    audio is needed. The score is symmetric, so the cache is keyed by the
+    unordered pair of content hashes plus ``weights``, and serves both A/B
+    and B/A.
+    """
+    energy_a = analysis_energy(analysis_a) if energy_a is None else energy_a
+    energy_b = analysis_energy(analysis_b) if energy_b is None else energy_b
+    if cache is not None:
+        hash_a = content_hash([analysis_a.model_dump(), np.asarray(energy_a).tolist()])
+        hash_b = content_hash([analysis_b.model_dump(), np.asarray(energy_b).tolist()])
+        key, _ = pair_key(hash_a, hash_b, DEFAULT_WEIGHTS if weights is None else weights)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached[0], cached[1]
+    _, key_confidence = suggest_key_strategy(analysis_a.key, analysis_b.key)
+    score, factors = mashability_score(
+        key_confidence,
+        min(analysis_a.bpm, analysis_b.bpm) / max(analysis_a.bpm, analysis_b.bpm),
+        section_overlap(analysis_a.sections, analysis_b.sections),
+        analysis_a.vocals_presence,
+        analysis_b.vocals_presence,
+        np.asarray(energy_a),
+        np.asarray(energy_b),
+        weights,
+    )
+    if cache is not None:
+        cache.put(key, [score, factors])
     return score, factors
+
+
+@dataclass(frozen=True)
+class TrackFeatures:
+    """Columnar features of N tracks, precomputed once for batch scoring.
+
+    Sections are flattened into ``section_starts``/``section_ends`` with
+    ``section_owner`` giving the track index of each.
+    """
+
+    ids: Tuple[str, ...]
+    bpm: np.ndarray
+    key_index: np.ndarray
+    vocals: np.ndarray
+    energy: np.ndarray
+    section_starts: np.ndarray
+    section_ends: np.ndarray
+    section_owner: np.ndarray
+
+    @classmethod
+    def from_tracks(
+        cls,
+        ids: Sequence[str],
+        bpm: Sequence[float],
+        keys: Sequence,
+        vocals: Sequence[float],
+        energy: Sequence[np.ndarray],
+        sections: Sequence[Sequence],
+    ) -> "TrackFeatures":
+        """Build from per-track values; ``keys`` are KeyInfo, ``sections`` lists of Section."""
+        owner = np.repeat(np.arange(len(sections)), [len(s) for s in sections])
+        starts, ends = _intervals([s for track in sections for s in track])
+        return cls(
+            ids=tuple(ids),
+            bpm=np.asarray(bpm, dtype=np.float64),
+            key_index=np.array([key_index(k.pitch_class, k.mode) for k in keys], dtype=np.intp),
+            vocals=np.asarray(vocals, dtype=np.float64),
+            energy=normalize_envelopes(energy),
+            section_starts=starts,
+            section_ends=ends,
+            section_owner=owner,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, rows: np.ndarray) -> "TrackFeatures":
+        """The tracks at ``rows``, in that order."""
+        rows = np.asarray(rows, dtype=np.intp)
+        position = np.full(len(self), -1, dtype=np.intp)
+        position[rows] = np.arange(len(rows))
+        keep = np.flatnonzero(position[self.section_owner] >= 0)
+        order = keep[np.argsort(position[self.section_owner[keep]], kind="stable")]
+        return TrackFeatures(
+            ids=tuple(self.ids[i] for i in rows),
+            bpm=self.bpm[rows],
+            key_index=self.key_index[rows],
+            vocals=self.vocals[rows],
+            energy=self.energy[rows],
+            section_starts=self.section_starts[order],
+            section_ends=self.section_ends[order],
+            section_owner=position[self.section_owner[order]],
+        )
+
+    def concat(self, other: "TrackFeatures") -> "TrackFeatures":
+        return TrackFeatures(
+            ids=self.ids + other.ids,
+            bpm=np.concatenate([self.bpm, other.bpm]),
+            key_index=np.concatenate([self.key_index, other.key_index]),
+            vocals=np.concatenate([self.vocals, other.vocals]),
+            energy=np.concatenate([self.energy, other.energy]),
+            section_starts=np.concatenate([self.section_starts, other.section_starts]),
+            section_ends=np.concatenate([self.section_ends, other.section_ends]),
+            section_owner=np.concatenate([self.section_owner, other.section_owner + len(self)]),
+        )
+
+    def section_totals(self) -> np.ndarray:
+        return np.bincount(self.section_owner, self.section_ends - self.section_starts, minlength=len(self))
+
+
+def batch_factors(query: TrackFeatures, candidates: TrackFeatures, index: int = 0) -> Dict[str, np.ndarray]:
+    """All five mashability factors of track ``index`` of ``query`` against every candidate."""
+    bpm = query.bpm[index]
+    tempo_ratio = np.minimum(bpm, candidates.bpm) / np.maximum(bpm, candidates.bpm)
+
+    own = query.section_owner == index
+    points, values = _coverage_integral(query.section_starts[own], query.section_ends[own])
+    per_section = np.interp(candidates.section_ends, points, values) - np.interp(
+        candidates.section_starts, points, values
+    )
+    overlap = np.bincount(candidates.section_owner, per_section, minlength=len(candidates))
+    shorter = np.minimum((query.section_ends[own] - query.section_starts[own]).sum(), candidates.section_totals())
+    sections = np.divide(overlap, shorter, out=np.zeros(len(candidates)), where=shorter > 0)
+
+    energy_corr = candidates.energy @ query.energy[index] / query.energy.shape[1]
+    return {
+        "key": BEST_CONFIDENCE[query.key_index[index], candidates.key_index].astype(np.float64),
+        "tempo": np.maximum(0.0, 1.0 - np.abs(1.0 - tempo_ratio)),
+        "sections": sections,
+        "vocals": 1.0 - np.abs(query.vocals[index] - candidates.vocals),
+        "energy": (energy_corr + 1.0) / 2.0,
+    }
+
+
+def top_partners(
+    query: TrackFeatures, candidates: TrackFeatures, k: int = 10, index: int = 0
+) -> List[Tuple[str, float, Dict[str, float]]]:
+    """The ``k`` best-scoring candidates for one query track, best first.
+
+    Each result is ``(candidate_id, score, factors)`` with the same factor
+    rationale as ``mashability_score``.
+    """
+    factors = batch_factors(query, candidates, index)
+    scores = np.clip(np.mean([factors[name] for name in FACTORS], axis=0), 0.0, 1.0)
+    k = min(k, len(candidates))
+    if not k:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [
+        (candidates.ids[j], float(scores[j]), {name: float(factors[name][j]) for name in FACTORS})
+        for j in best
+    ]
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Sequence
+
+import librosa
+import numpy as np
+from scipy.fft import irfftn, next_fast_len, rfftn
+
+from core.harmony import SHIFTS
+from schemas.models import Analysis
+
+FACTORS = ("chroma", "energy", "vocals")
+# Shortest overlap, as a fraction of the shorter section, an offset is scored on
+_MIN_OVERLAP = 0.5
+
+
+class BeatFeatures(NamedTuple):
+    """Per-beat features of a track; column ``i`` spans beat ``i`` to beat ``i + 1``.
+
+    ``chroma`` is ``(12, beats)``; ``energy`` and ``vocals`` (share of
+    harmonic energy, as in ``Analysis.vocals_presence``) are ``(beats,)``.
+    """
+
+    chroma: np.ndarray
+    energy: np.ndarray
+    vocals: np.ndarray
+
+
+class SectionPair(NamedTuple):
+    """One placement of a section of track B over a section of track A.
+
+    Beat ``t`` of B's section plays with beat ``t + offset_beats`` of A's, and
+    B is shifted by ``pitch_shift`` semitones. The overlap lasts ``beats``
+    beats from ``start_ms_a`` in A and ``start_ms_b`` in B.
+    """
+
+    section_a: int
+    section_b: int
+    offset_beats: int
+    pitch_shift: int
+    start_ms_a: int
+    start_ms_b: int
+    beats: int
+    score: float
+    factors: Dict[str, float]
+
+
+def beat_features(
+    power: np.ndarray, harmonic_power: np.ndarray, rms: np.ndarray, sr: int, beat_frames: np.ndarray
+) -> BeatFeatures:
+    """Beat-synchronous chroma, energy and vocal share from analysis frames."""
+    chroma = librosa.feature.chroma_stft(S=power, sr=sr)
+    vocals = np.sqrt(harmonic_power).sum(axis=0) / (np.sqrt(power).sum(axis=0) + 1e-9)
+    n = min(chroma.shape[1], len(rms))
+    frames = np.vstack([chroma[:, :n], rms[None, :n], vocals[None, :n]])
+    # sync adds a segment before the first beat; drop it so columns start on beats
+    synced = librosa.util.sync(frames, beat_frames, aggregate=np.mean)[:, 1:]
+    return BeatFeatures(synced[:12].astype(np.float32), synced[12].astype(np.float32), synced[13].astype(np.float32))
+
+
+def save_beat_features(path: Path | str, features: BeatFeatures) -> None:
+    np.savez(path, **features._asdict())
+
+
+def load_beat_features(path: Path | str) -> BeatFeatures:
+    with np.load(path) as data:
+        return BeatFeatures(data["chroma"], data["energy"], data["vocals"])
+
+
+def _section_beats(analysis: Analysis, n_beats: int) -> List[tuple[int, int]]:
+    """Beat index range of every section, clipped to the available features."""
+    grid = np.asarray(analysis.beatgrid)
+    spans = []
+    for s in analysis.sections:
+        lo, hi = np.searchsorted(grid, [s.start_ms, s.end_ms])
+        spans.append((min(int(lo), n_beats), min(int(hi), n_beats)))
+    return spans
+
+
+def _stack(chroma: np.ndarray, spans: Sequence[tuple[int, int]], length: int) -> np.ndarray:
+    """Unit-normalised chroma of each section, zero padded to ``length`` beats."""
+    unit = chroma / (np.linalg.norm(chroma, axis=0, keepdims=True) + 1e-9)
+    out = np.zeros((len(spans), 12, length), dtype=np.float32)
+    for k, (lo, hi) in enumerate(spans):
+        out[k, :, : hi - lo] = unit[:, lo:hi]
+    return out
+
+
+def _section_means(values: np.ndarray, spans: Sequence[tuple[int, int]]) -> np.ndarray:
+    return np.array([values[lo:hi].mean() if hi > lo else 0.0 for lo, hi in spans])
+
+
+def section_pairs(
+    analysis_a: Analysis,
+    features_a: BeatFeatures,
+    analysis_b: Analysis,
+    features_b: BeatFeatures,
+    top_k: int = 10,
+    beats_per_bar: int = 4,
+) -> List[SectionPair]:
+    """Rank every (section of A, section of B) placement, best first.
+
+    Chroma compatibility is the mean per-beat cosine similarity of the
+    overlapping beats. For all section pairs, pitch shifts and beat offsets it
+    comes from one batched 2-D FFT cross-correlation of the beat-synchronous
+    chroma, which is circular over the 12 pitch classes and linear over time.
+    Offsets are whole bars, shifts are those of ``core.harmony.SHIFTS``, and
+    at least half of the shorter section must overlap. Energy match compares
+    section energies relative to each track's loudest section; the vocal
+    factor penalises sections that both carry vocals. The score is the mean
+    of the three factors.
+    """
+    spans_a = _section_beats(analysis_a, features_a.chroma.shape[1])
+    spans_b = _section_beats(analysis_b, features_b.chroma.shape[1])
+    len_a = np.array([hi - lo for lo, hi in spans_a])
+    len_b = np.array([hi - lo for lo, hi in spans_b])
+    if not len(len_a) or not len(len_b) or not len_a.max() or not len_b.max():
+        return []
+    n_fft = next_fast_len(int(len_a.max() + len_b.max() - 1), real=True)
+    spec_a = rfftn(_stack(features_a.chroma, spans_a, n_fft), axes=(-2, -1))
+    spec_b = rfftn(_stack(features_b.chroma, spans_b, n_fft), axes=(-2, -1))
+    # corr[i, j, r, lag] = sum_c,t A_i[c + r, t + lag] * B_j[c, t]
+    corr = irfftn(spec_a[:, None] * np.conj(spec_b[None, :]), s=(12, n_fft), axes=(-2, -1))
+    corr = corr[:, :, SHIFTS % 12]
+
+    lags = np.arange(n_fft)
+    lags = np.where(lags < len_a.max(), lags, lags - n_fft)
+    la, lb = len_a[:, None, None], len_b[None, :, None]
+    overlap = np.minimum(la, lb + lags) - np.maximum(0, lags)
+    valid = (overlap >= np.maximum(_MIN_OVERLAP * np.minimum(la, lb), 1)) & (lags % beats_per_bar == 0)
+    chroma = np.where(valid[:, :, None], corr / np.maximum(overlap, 1)[:, :, None], -np.inf)
+    flat = chroma.reshape(len(spans_a), len(spans_b), -1)
+    best = flat.argmax(axis=-1)
+    chroma_score = np.take_along_axis(flat, best[..., None], -1)[..., 0]
+    best_shift = SHIFTS[best // n_fft]
+    best_lag = lags[best % n_fft]
+
+    energy_a = _section_means(features_a.energy, spans_a)
+    energy_b = _section_means(features_b.energy, spans_b)
+    energy_a = energy_a / (energy_a.max() + 1e-9)
+    energy_b = energy_b / (energy_b.max() + 1e-9)
+    factors = {
+        "chroma": np.clip(chroma_score, 0.0, 1.0),
+        "energy": 1.0 - np.abs(energy_a[:, None] - energy_b[None, :]),
+        "vocals": 1.0 - np.outer(_section_means(features_a.vocals, spans_a), _section_means(features_b.vocals, spans_b)),
+    }
+    scores = np.where(np.isfinite(chroma_score), np.mean([factors[f] for f in FACTORS], axis=0), -np.inf)
+
+    grid_a = np.asarray(analysis_a.beatgrid)
+    grid_b = np.asarray(analysis_b.beatgrid)
+    results = []
+    for flat_idx in np.argsort(-scores, axis=None, kind="stable")[:top_k]:
+        i, j = np.unravel_index(flat_idx, scores.shape)
+        if not np.isfinite(scores[i, j]):
+            break
+        lag = int(best_lag[i, j])
+        start_a = spans_a[i][0] + max(lag, 0)
+        start_b = spans_b[j][0] + max(-lag, 0)
+        results.append(
+            SectionPair(
+                section_a=int(i),
+                section_b=int(j),
+                offset_beats=lag,
+                pitch_shift=int(best_shift[i, j]),
+                start_ms_a=int(grid_a[start_a]),
+                start_ms_b=int(grid_b[start_b]),
+                beats=int(min(len_a[i], len_b[j] + lag) - max(0, lag)),
+                score=float(scores[i, j]),
+                factors={f: float(factors[f][i, j]) for f in FACTORS},
+            )
+        )
+    return results
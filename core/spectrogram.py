@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import librosa
+
+# Tiles are fixed TILE_FRAMES x TILE_BINS uint8 blocks, stored as raw bytes
+# (frequency-major, low bins first) so serving one is a single file read.
+TILE_FRAMES = 256
+TILE_BINS = 256
+DB_FLOOR = -80.0
+MAX_LEVELS = 6
+
+
+def spectrogram_dir(audio_path: Path | str) -> Path:
+    """Return the tile directory that sits next to ``audio_path``."""
+    return Path(audio_path).with_suffix(".spec")
+
+
+def quantize_db(S: np.ndarray, n_fft: int) -> np.ndarray:
+    """Map STFT magnitudes to uint8 dB, 0 = ``DB_FLOOR`` dBFS, 255 = 0 dBFS."""
+    # A full-scale sine peaks at n_fft / 4 under a Hann window
+    db = 20 * np.log10(np.maximum(np.abs(S), 1e-10) / (n_fft / 4))
+    return np.round((np.clip(db, DB_FLOOR, 0.0) - DB_FLOOR) * (255 / -DB_FLOOR)).astype(np.uint8)
+
+
+def _tile_path(out_dir: Path, level: int, x: int, y: int) -> Path:
+    return out_dir / str(level) / f"{x}_{y}.u8"
+
+
+def write_tiles(out_dir: Path | str, S: np.ndarray, sample_rate: int, n_fft: int, hop_length: int) -> Dict[str, Any]:
+    """Quantize an STFT and write it as tiles at several time zoom levels.
+
+    ``S`` is ``(bins, frames)`` or ``(channels, bins, frames)``; channels are
+    averaged. Level ``n`` max-pools ``2**n`` frames per column. Returns the
+    metadata that is also written to ``meta.json``.
+    """
+    out_dir = Path(out_dir)
+    mag = np.abs(S)
+    if mag.ndim == 3:
+        mag = mag.mean(axis=0)
+    q = quantize_db(mag, n_fft)
+    n_bins, n_frames = q.shape
+    y_tiles = -(-n_bins // TILE_BINS)
+
+    levels = 0
+    while levels < MAX_LEVELS:
+        frames = q.shape[1]
+        x_tiles = max(1, -(-frames // TILE_FRAMES))
+        padded = np.zeros((y_tiles * TILE_BINS, x_tiles * TILE_FRAMES), dtype=np.uint8)
+        padded[:n_bins, :frames] = q
+        # (y_tiles, TILE_BINS, x_tiles, TILE_FRAMES) -> one block per tile
+        tiles = padded.reshape(y_tiles, TILE_BINS, x_tiles, TILE_FRAMES).transpose(2, 0, 1, 3)
+        (out_dir / str(levels)).mkdir(parents=True, exist_ok=True)
+        for x in range(x_tiles):
+            for y in range(y_tiles):
+                _tile_path(out_dir, levels, x, y).write_bytes(np.ascontiguousarray(tiles[x, y]).tobytes())
+        levels += 1
+        if x_tiles == 1:
+            break
+        if frames % 2:
+            q = np.concatenate([q, q[:, -1:]], axis=1)
+        q = np.maximum(q[:, 0::2], q[:, 1::2])
+
+    meta = {
+        "sample_rate": sample_rate,
+        "n_fft": n_fft,
+        "hop_length": hop_length,
+        "n_frames": n_frames,
+        "n_bins": n_bins,
+        "levels": levels,
+        "tile_frames": TILE_FRAMES,
+        "tile_bins": TILE_BINS,
+        "db_floor": DB_FLOOR,
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta))
+    return meta
+
+
+def write_spectrogram(
+    out_dir: Path | str, y: np.ndarray, sample_rate: int, n_fft: int = 2048, hop_length: int = 512
+) -> Dict[str, Any]:
+    """Compute the STFT of ``y`` and write it as spectrogram tiles."""
+    S = librosa.stft(np.asarray(y, dtype=np.float32), n_fft=n_fft, hop_length=hop_length)
+    return write_tiles(out_dir, S, sample_rate, n_fft, hop_length)
+
+
+def read_meta(out_dir: Path | str) -> Dict[str, Any]:
+    return json.loads((Path(out_dir) / "meta.json").read_text())
+
+
+def read_tile(out_dir: Path | str, level: int, x: int, y: int) -> bytes:
+    """Return the raw uint8 bytes of one tile; raises FileNotFoundError if absent."""
+    return _tile_path(Path(out_dir), level, x, y).read_bytes()
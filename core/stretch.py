@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import subprocess
+import time
+from fractions import Fraction
+from functools import lru_cache
+from typing import Callable, Dict, List, Protocol, Tuple
+
+import numpy as np
+import librosa
+import pyrubberband as pyrb
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import resample_poly
+
+from infra.metrics import stretch_xrt_factor
+
+
+# Monotonic (source_sample, target_sample) anchors; the last pair must be
+# (len(y), output_length).
+TimeMap = List[Tuple[int, int]]
+
+
+class StretchEngine(Protocol):
+    """Time-stretch / pitch-shift backend.
+
+    Audio is ``(samples,)`` or ``(channels, samples)``. ``last_xrt`` holds the
+    speed of the most recent call relative to realtime.
+    """
+
+    name: str
+    last_xrt: float
+
+    def time_stretch(self, y: np.ndarray, sr: int, rate: float) -> np.ndarray: ...
+    def pitch_shift(self, y: np.ndarray, sr: int, semitones: float) -> np.ndarray: ...
+    def time_map_stretch(self, y: np.ndarray, sr: int, time_map: TimeMap) -> np.ndarray: ...
+
+
+@lru_cache(maxsize=1)
+def rubberband_version() -> str:
+    """Version of the Rubber Band CLI, or ``"missing"`` when librosa stands in for it."""
+    try:
+        out = subprocess.run(["rubberband", "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "missing"
+    return (out.stdout + out.stderr).strip() or "unknown"
+
+
+def _timed(engine, y: np.ndarray, sr: int, fn: Callable[[], np.ndarray]) -> np.ndarray:
+    """Run ``fn`` and record its realtime factor on ``engine``."""
+    start = time.perf_counter()
+    out = fn()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    engine.last_xrt = (y.shape[-1] / sr) / elapsed
+    stretch_xrt_factor.labels(engine=engine.name).observe(engine.last_xrt)
+    return out
+
+
+class RubberBandEngine:
+    """Rubber Band CLI via pyrubberband, falling back to librosa."""
+
+    name = "rubberband"
+
+    def __init__(self, rbargs: Dict[str, str] | None = None):
+        self.rbargs = rbargs if rbargs is not None else {"-t": "", "-F": ""}
+        self.last_xrt = 0.0
+
+    def time_stretch(self, y: np.ndarray, sr: int, rate: float) -> np.ndarray:
+        def _run() -> np.ndarray:
+            try:
+                # pyrubberband expects (samples, channels)
+                return pyrb.time_stretch(y.T, sr, rate, rbargs=dict(self.rbargs)).T
+            except Exception:
+                return librosa.effects.time_stretch(y, rate=rate)
+
+        return _timed(self, y, sr, _run)
+
+    def pitch_shift(self, y: np.ndarray, sr: int, semitones: float) -> np.ndarray:
+        def _run() -> np.ndarray:
+            try:
+                return pyrb.pitch_shift(y.T, sr, semitones, rbargs=dict(self.rbargs)).T
+            except Exception:
+                return librosa.effects.pitch_shift(y, sr=sr, n_steps=semitones)
+
+        return _timed(self, y, sr, _run)
+
+    def time_map_stretch(self, y: np.ndarray, sr: int, time_map: TimeMap) -> np.ndarray:
+        def _run() -> np.ndarray:
+            try:
+                return pyrb.timemap_stretch(y.T, sr, time_map, rbargs=dict(self.rbargs)).T
+            except Exception:
+                # librosa has no time-map mode; use the in-process vocoder
+                return PhaseVocoderEngine()._warp(y, time_map)
+
+        return _timed(self, y, sr, _run)
+
+
+class PhaseVocoderEngine:
+    """In-process STFT phase vocoder.
+
+    All channels and frames are processed as one NumPy block, so no temp files
+    or subprocesses are involved.
+    """
+
+    name = "phase_vocoder"
+
+    def __init__(self, n_fft: int = 2048, hop_length: int = 512):
+        if n_fft % hop_length:
+            raise ValueError("n_fft must be a multiple of hop_length")
+        self.n_fft = n_fft
+        self.hop = hop_length
+        self.window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        self.last_xrt = 0.0
+
+    def _stft(self, y: np.ndarray) -> np.ndarray:
+        pad = self.n_fft // 2
+        n_frames = 1 + int(np.ceil(y.shape[-1] / self.hop))
+        total = (n_frames - 1) * self.hop + self.n_fft
+        widths = [(0, 0)] * (y.ndim - 1) + [(pad, total - y.shape[-1] - pad)]
+        padded = np.pad(y.astype(np.float32, copy=False), widths)
+        frames = sliding_window_view(padded, self.n_fft, axis=-1)[..., :: self.hop, :]
+        return np.fft.rfft(frames * self.window, axis=-1)  # (..., frames, bins)
+
+    def _istft(self, S: np.ndarray, length: int) -> np.ndarray:
+        frames = np.fft.irfft(S, n=self.n_fft, axis=-1).astype(np.float32) * self.window
+        n_frames = frames.shape[-2]
+        overlap = self.n_fft // self.hop
+        out = np.zeros(frames.shape[:-2] + ((n_frames + overlap - 1) * self.hop,), dtype=np.float32)
+        norm = np.zeros(out.shape[-1], dtype=np.float32)
+        win_sq = self.window**2
+        # Overlap-add one hop-sized slice of every frame at a time.
+        for k in range(overlap):
+            chunk = frames[..., k * self.hop : (k + 1) * self.hop]
+            out[..., k * self.hop : (k + n_frames) * self.hop] += chunk.reshape(frames.shape[:-2] + (-1,))
+            norm[k * self.hop : (k + n_frames) * self.hop] += np.tile(win_sq[k * self.hop : (k + 1) * self.hop], n_frames)
+        out /= np.maximum(norm, 1e-6)
+        start = self.n_fft // 2
+        out = out[..., start : start + length]
+        if out.shape[-1] < length:
+            out = np.pad(out, [(0, 0)] * (out.ndim - 1) + [(0, length - out.shape[-1])])
+        return out
+
+    def _resynth(self, S: np.ndarray, steps: np.ndarray) -> np.ndarray:
+        """Resample STFT frames at fractional ``steps`` with phase propagation."""
+        S = np.concatenate([S, np.zeros_like(S[..., :1, :])], axis=-2)
+        steps = np.clip(steps, 0, S.shape[-2] - 2)
+        idx = np.floor(steps).astype(int)
+        frac = (steps - idx)[:, None].astype(np.float32)
+        mag = np.abs(S)
+        phase = np.angle(S)
+        out_mag = (1 - frac) * mag[..., idx, :] + frac * mag[..., idx + 1, :]
+
+        expected = 2 * np.pi * self.hop * np.arange(S.shape[-1]) / self.n_fft
+        dphi = phase[..., idx + 1, :] - phase[..., idx, :] - expected
+        dphi = dphi - 2 * np.pi * np.round(dphi / (2 * np.pi)) + expected
+        acc = np.cumsum(dphi, axis=-2)
+        out_phase = np.empty_like(acc)
+        out_phase[..., 0, :] = phase[..., idx[0], :]
+        out_phase[..., 1:, :] = phase[..., idx[0] : idx[0] + 1, :] + acc[..., :-1, :]
+        return out_mag * np.exp(1j * out_phase)
+
+    def _stretch(self, y: np.ndarray, rate: float) -> np.ndarray:
+        S = self._stft(y)
+        length = int(round(y.shape[-1] / rate))
+        n_out = 1 + int(np.ceil(length / self.hop))
+        steps = np.arange(n_out) * rate
+        return self._istft(self._resynth(S, steps), length)
+
+    def _warp(self, y: np.ndarray, time_map: TimeMap) -> np.ndarray:
+        src, tgt = np.asarray(time_map, dtype=np.float64).T
+        length = int(tgt[-1])
+        n_out = 1 + int(np.ceil(length / self.hop))
+        # Frame t is centred on output sample t * hop; read the source frame
+        # centred on the corresponding mapped source position.
+        steps = np.interp(np.arange(n_out) * self.hop, tgt, src) / self.hop
+        return self._istft(self._resynth(self._stft(y), steps), length)
+
+    def time_stretch(self, y: np.ndarray, sr: int, rate: float) -> np.ndarray:
+        return _timed(self, y, sr, lambda: self._stretch(y, rate))
+
+    def time_map_stretch(self, y: np.ndarray, sr: int, time_map: TimeMap) -> np.ndarray:
+        return _timed(self, y, sr, lambda: self._warp(y, time_map))
+
+    def pitch_shift(self, y: np.ndarray, sr: int, semitones: float) -> np.ndarray:
+        def _run() -> np.ndarray:
+            ratio = Fraction(2 ** (semitones / 12)).limit_denominator(1000)
+            stretched = self._stretch(y, 1 / float(ratio))
+            shifted = resample_poly(stretched, ratio.denominator, ratio.numerator, axis=-1)
+            shifted = shifted[..., : y.shape[-1]].astype(np.float32, copy=False)
+            if shifted.shape[-1] < y.shape[-1]:
+                shifted = np.pad(shifted, [(0, 0)] * (y.ndim - 1) + [(0, y.shape[-1] - shifted.shape[-1])])
+            return shifted
+
+        return _timed(self, y, sr, _run)
+
+
+ENGINES: Dict[str, Callable[..., StretchEngine]] = {
+    RubberBandEngine.name: RubberBandEngine,
+    PhaseVocoderEngine.name: PhaseVocoderEngine,
+}
+
+
+class LazyStretch:
+    """Time-stretched view of ``y`` that is rendered only where it is read.
+
+    The output timeline is split into regions of ``region`` samples. Reading
+    a range stretches just the regions it touches, each from its source span
+    plus ``context`` source samples on both sides, and memoizes them. Every
+    region also renders ``fade`` samples past its end, which is crossfaded
+    into the next region's head, because separately stretched regions do not
+    share phase. Slicing the last axis returns an ndarray; anything else, or
+    ``np.asarray``, renders the whole track.
+    """
+
+    def __init__(
+        self,
+        y: np.ndarray,
+        sr: int,
+        rate: float,
+        engine: StretchEngine,
+        region: int = 1 << 18,
+        context: int = 8192,
+        fade: int = 1024,
+    ):
+        self.y = y
+        self.sr = sr
+        self.rate = rate
+        self.engine = engine
+        self.region = region
+        self.context = context
+        self.fade = fade
+        self.length = int(round(y.shape[-1] / rate))
+        self._regions: Dict[int, np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.y.shape[:-1] + (self.length,)
+
+    @property
+    def ndim(self) -> int:
+        return self.y.ndim
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def rendered_fraction(self) -> float:
+        """Share of the output that has been stretched so far."""
+        return min(1.0, len(self._regions) * self.region / max(self.length, 1))
+
+    def _render_region(self, k: int) -> np.ndarray:
+        """Region ``k`` followed by up to ``fade`` samples of overlap."""
+        if k not in self._regions:
+            out_start = k * self.region
+            out_len = min(self.region + self.fade, self.length - out_start)
+            src_start = int(round(out_start * self.rate))
+            lead = min(self.context, src_start)
+            src_end = min(self.y.shape[-1], int(round((out_start + out_len) * self.rate)) + self.context)
+            stretched = self.engine.time_stretch(self.y[..., src_start - lead : src_end], self.sr, self.rate)
+            skip = int(round(lead / self.rate))
+            seg = stretched[..., skip : skip + out_len]
+            if seg.shape[-1] < out_len:
+                seg = np.pad(seg, [(0, 0)] * (seg.ndim - 1) + [(0, out_len - seg.shape[-1])])
+            self._regions[k] = seg
+        return self._regions[k]
+
+    def _region_output(self, k: int, head: bool = True) -> np.ndarray:
+        """The ``region`` samples output for region ``k``.
+
+        Its first ``fade`` samples are a crossfade from region ``k - 1``'s
+        overlap, so every read sees the same join whatever its bounds;
+        ``head=False`` skips that (and rendering ``k - 1``) for reads that
+        start past the fade.
+        """
+        part = self._render_region(k)[..., : self.region]
+        if k == 0 or not head:
+            return part
+        tail = self._render_region(k - 1)[..., self.region :]
+        ramp = np.linspace(0.0, 1.0, tail.shape[-1], endpoint=False, dtype=np.float32)
+        part = part.copy()
+        part[..., : tail.shape[-1]] = tail * (1 - ramp) + part[..., : tail.shape[-1]] * ramp
+        return part
+
+    def render(self, start: int, end: int) -> np.ndarray:
+        """Stretched samples ``start:end`` of the output."""
+        start, end = max(start, 0), min(end, self.length)
+        if end <= start:
+            return np.zeros(self.y.shape[:-1] + (0,), dtype=np.float32)
+        first, last = start // self.region, (end - 1) // self.region
+        offset = first * self.region
+        parts = [self._region_output(first, head=start - offset < self.fade)]
+        parts += [self._region_output(k) for k in range(first + 1, last + 1)]
+        return np.concatenate(parts, axis=-1)[..., start - offset : end - offset]
+
+    def __getitem__(self, key):
+        lead, last = (key[:-1], key[-1]) if isinstance(key, tuple) else ((), key)
+        if isinstance(last, slice) and last.step in (None, 1) and all(
+            k is Ellipsis or k == slice(None) for k in lead
+        ):
+            start, stop, _ = last.indices(self.length)
+            return self.render(start, stop)
+        return np.asarray(self)[key]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        out = self.render(0, self.length)
+        return out if dtype is None else out.astype(dtype)
+
+
+def get_engine(name: str = "rubberband", **options) -> StretchEngine:
+    """Return a new stretch engine instance by name, passing ``options`` through."""
+    try:
+        factory = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"unknown stretch engine: {name}") from None
+    return factory(**options)
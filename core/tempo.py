@@ -1,21 +1,145 @@
 from __future__ import annotations
 
 import math
-from typing import Tuple
+from pathlib import Path
+from typing import List, NamedTuple, Sequence, Tuple
 
 import numpy as np
-import librosa
-import pyrubberband as pyrb
+from scipy.fft import irfft, next_fast_len, rfft
 
+from core.stretch import LazyStretch, TimeMap, get_engine
 from schemas.models import Analysis, Alignment
 
 
-def _time_stretch(y: np.ndarray, sr: int, rate: float) -> np.ndarray:
-    """Stretch audio with Rubber Band, falling back to librosa."""
-    try:
-        return pyrb.time_stretch(y, sr, rate, rbargs={"-t": "", "-F": ""})
-    except Exception:
-        return librosa.effects.time_stretch(y, rate=rate)
+# Shortest overlap, as a fraction of the shorter envelope, a lag is scored on
+_MIN_OVERLAP = 0.5
+
+
+class OnsetEnvelope(NamedTuple):
+    """Onset strength per analysis frame and the frames per second."""
+
+    values: np.ndarray
+    frame_rate: float
+
+
+class OffsetEstimate(NamedTuple):
+    """Delay of track b, in seconds, that lands its downbeats on track a's.
+
+    Negative values advance b. ``confidence`` is the normalised correlation
+    of the two onset envelopes at that lag, clipped to [0, 1].
+    """
+
+    offset_sec: float
+    confidence: float
+
+    def offset_samples(self, sr: int) -> int:
+        return int(round(self.offset_sec * sr))
+
+
+def save_onset_envelope(path: Path | str, values: np.ndarray, sr: int, hop_length: int = 512) -> None:
+    np.savez(path, values=np.asarray(values, dtype=np.float32), frame_rate=sr / hop_length)
+
+
+def load_onset_envelope(path: Path | str) -> OnsetEnvelope:
+    with np.load(path) as data:
+        return OnsetEnvelope(data["values"], float(data["frame_rate"]))
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    x = x - x.mean()
+    std = x.std()
+    return x / std if std > 0 else x
+
+
+def estimate_offset(
+    onset_a: OnsetEnvelope,
+    onset_b: OnsetEnvelope,
+    stretch_ratio: float = 1.0,
+    max_offset_sec: float | None = None,
+) -> OffsetEstimate:
+    """Cross-correlate onset envelopes to find the downbeat offset of b against a.
+
+    ``onset_b`` is first resampled onto a's frame grid as it will sound after
+    stretching by ``stretch_ratio`` (b's times divide by the ratio), so both
+    envelopes share one tempo. All lags are correlated at once with an FFT;
+    the peak is refined to a fraction of a frame by parabolic interpolation.
+    """
+    fr = onset_a.frame_rate
+    a = _zscore(np.asarray(onset_a.values, dtype=np.float64))
+    n_b = int(len(onset_b.values) / onset_b.frame_rate / stretch_ratio * fr)
+    source = np.arange(n_b) * stretch_ratio * onset_b.frame_rate / fr
+    b = _zscore(np.interp(source, np.arange(len(onset_b.values)), onset_b.values))
+    if not len(a) or not len(b):
+        return OffsetEstimate(0.0, 0.0)
+    n_fft = next_fast_len(len(a) + len(b) - 1, real=True)
+    full = irfft(rfft(a, n_fft) * np.conj(rfft(b, n_fft)), n_fft)
+    # corr[lag] = sum_n a[n + lag] * b[n]; negative lags wrap to the end
+    lags = np.arange(-(len(b) - 1), len(a))
+    corr = np.concatenate([full[n_fft - len(b) + 1 :], full[: len(a)]])
+    overlap = np.minimum(len(b), len(a) - lags) - np.maximum(0, -lags)
+    r = corr / overlap
+    valid = overlap >= _MIN_OVERLAP * min(len(a), len(b))
+    if max_offset_sec is not None:
+        valid &= np.abs(lags) <= max_offset_sec * fr
+    if not valid.any():
+        return OffsetEstimate(0.0, 0.0)
+    peak = int(np.argmax(np.where(valid, r, -np.inf)))
+    shift = 0.0
+    if 0 < peak < len(r) - 1:
+        left, mid, right = r[peak - 1], r[peak], r[peak + 1]
+        denom = left - 2 * mid + right
+        if denom < 0:
+            shift = 0.5 * (left - right) / denom
+    return OffsetEstimate((lags[peak] + shift) / fr, float(np.clip(r[peak], 0.0, 1.0)))
+
+
+def _time_stretch(y: np.ndarray, sr: int, rate: float, engine: str = "rubberband") -> LazyStretch:
+    """Lazily stretch audio with the named engine (Rubber Band by default)."""
+    return LazyStretch(y, sr, rate, get_engine(engine))
+
+
+def beat_time_map(
+    beatgrid_ms: Sequence[int],
+    target_grid_ms: Sequence[int],
+    n_samples: int,
+    sr: int,
+) -> TimeMap:
+    """Build a monotonic sample time map pairing source beats with target beats.
+
+    Beats are paired in order; audio before the first beat keeps its rate
+    relative to the origin and audio after the last beat continues at the
+    rate of the final beat interval.
+    """
+    n = min(len(beatgrid_ms), len(target_grid_ms))
+    src = np.asarray(beatgrid_ms[:n], dtype=np.float64) * sr / 1000
+    tgt = np.asarray(target_grid_ms[:n], dtype=np.float64) * sr / 1000
+    keep = (src > 0) & (tgt > 0) & (src < n_samples)
+    src, tgt = src[keep], tgt[keep]
+    # Keep only anchors past every earlier one, so the map stays monotonic
+    # even after an out-of-order beat is dropped
+    mono = (src > np.maximum.accumulate(np.concatenate(([0.0], src[:-1])))) & (
+        tgt > np.maximum.accumulate(np.concatenate(([0.0], tgt[:-1])))
+    )
+    src, tgt = src[mono], tgt[mono]
+    src = np.concatenate(([0.0], src))
+    tgt = np.concatenate(([0.0], tgt))
+    tail_rate = (tgt[-1] - tgt[-2]) / (src[-1] - src[-2]) if len(src) > 1 else 1.0
+    end = tgt[-1] + (n_samples - src[-1]) * tail_rate
+    pairs: List[Tuple[int, int]] = [(int(a), int(b)) for a, b in zip(src, tgt)]
+    pairs.append((n_samples, int(round(end))))
+    return pairs
+
+
+def stretch_to_grid(
+    y: np.ndarray,
+    sr: int,
+    beatgrid_ms: Sequence[int],
+    target_grid_ms: Sequence[int],
+    engine: str = "rubberband",
+) -> np.ndarray:
+    """Warp ``y`` so its beats land on ``target_grid_ms`` in a single pass."""
+    time_map = beat_time_map(beatgrid_ms, target_grid_ms, y.shape[-1], sr)
+    return get_engine(engine).time_map_stretch(y, sr, time_map)
 
 
 def align_tempo(
@@ -24,21 +148,36 @@ def align_tempo(
     audio_a: np.ndarray,
     audio_b: np.ndarray,
     sr: int,
-) -> Tuple[np.ndarray, np.ndarray, Alignment]:
+    engine: str = "rubberband",
+    onset_a: OnsetEnvelope | None = None,
+    onset_b: OnsetEnvelope | None = None,
+) -> Tuple[np.ndarray | LazyStretch, np.ndarray | LazyStretch, Alignment]:
     """Align tempos of two tracks, returning stretched audio and alignment info.
 
-    The track requiring the smaller stretch becomes the reference.
+    The track requiring the smaller stretch becomes the reference; the other
+    is returned as a ``LazyStretch`` that only stretches the ranges the
+    renderer reads. ``engine``
+    selects the stretch backend from ``core.stretch.ENGINES``. Given the onset
+    envelopes saved during analysis, ``offset_ms`` is the delay of the
+    stretched b that lines its downbeats up with a (see ``estimate_offset``).
     """
     ratio_a = track_b.bpm / track_a.bpm
     ratio_b = track_a.bpm / track_b.bpm
     if abs(1 - ratio_a) <= abs(1 - ratio_b):
         stretch_ratio = ratio_b
         aligned_a = audio_a
-        aligned_b = _time_stretch(audio_b, sr, stretch_ratio)
+        aligned_b = _time_stretch(audio_b, sr, stretch_ratio, engine)
     else:
         stretch_ratio = ratio_a
-        aligned_a = _time_stretch(audio_a, sr, stretch_ratio)
+        aligned_a = _time_stretch(audio_a, sr, stretch_ratio, engine)
         aligned_b = audio_b
+    offset_ms = 0
+    if onset_a is not None and onset_b is not None:
+        if aligned_a is audio_a:
+            offset = estimate_offset(onset_a, onset_b, stretch_ratio).offset_sec
+        else:
+            offset = -estimate_offset(onset_b, onset_a, stretch_ratio).offset_sec
+        offset_ms = int(round(offset * 1000))
     stretch_cents = 1200 * math.log2(stretch_ratio)
-    alignment = Alignment(offset_ms=0, stretch_cents=stretch_cents)
+    alignment = Alignment(offset_ms=offset_ms, stretch_cents=stretch_cents)
     return aligned_a, aligned_b, alignment
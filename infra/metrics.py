@@ -1,5 +1,24 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 stage_latency_ms = Histogram('stage_latency_ms', 'Stage latency in ms', ['stage'])
 render_xrt_factor = Histogram('render_xrt_factor', 'Render speed vs realtime')
 plan_validation_failures = Counter('plan_validation_failures', 'Number of plan validation failures')
+stretch_xrt_factor = Histogram('stretch_xrt_factor', 'Stretch engine speed vs realtime', ['engine'])
+render_cache_requests = Counter('render_cache_requests', 'Render cache lookups', ['result'])
+pair_score_cache_requests = Counter('pair_score_cache_requests', 'Pair score cache lookups', ['result'])
+pair_score_cache_hit_ratio = Gauge('pair_score_cache_hit_ratio', 'Share of pair score lookups served from cache')
+
+
+def _pair_score_hit_ratio() -> float:
+    # Derived from the counter, so it covers every cache in the process
+    counts = {
+        sample.labels['result']: sample.value
+        for metric in pair_score_cache_requests.collect()
+        for sample in metric.samples
+        if sample.name.endswith('_total')
+    }
+    total = sum(counts.values())
+    return counts.get('hit', 0.0) / total if total else 0.0
+
+
+pair_score_cache_hit_ratio.set_function(_pair_score_hit_ratio)
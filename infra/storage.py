@@ -5,12 +5,15 @@ from typing import Protocol
 
 import boto3
 from botocore.client import BaseClient
+from botocore.exceptions import ClientError
 
 
 class ObjectStore(Protocol):
     def put(self, key: str, file_path: Path) -> str: ...
     def get(self, key: str, dest_path: Path) -> Path: ...
     def url(self, key: str, expires_sec: int = 3600) -> str: ...
+    def exists(self, key: str) -> bool: ...
+    def delete(self, key: str) -> None: ...
 
 
 class LocalObjectStore:
@@ -32,6 +35,12 @@ class LocalObjectStore:
     def url(self, key: str, expires_sec: int = 3600) -> str:
         return f"file://{self.root / key}"
 
+    def exists(self, key: str) -> bool:
+        return (self.root / key).is_file()
+
+    def delete(self, key: str) -> None:
+        (self.root / key).unlink(missing_ok=True)
+
 
 class S3ObjectStore:
     def __init__(self, bucket: str, client: BaseClient | None = None):
@@ -50,3 +59,15 @@ class S3ObjectStore:
         return self.client.generate_presigned_url(
             "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_sec
         )
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
@@ -1,14 +1,22 @@
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict
+from prometheus_client import make_asgi_app
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
 import numpy as np
 import traceback
+import json
+import re
 import sys
 import os
 from scipy.spatial.distance import cosine
 
+# Add the repository root to Python path for the shared core package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pair_cache import PairScoreCache, content_hash, pair_key
+
 # --- Pydantic Models ---
 class AnalysisResult(BaseModel):
     harmonic: Dict
@@ -27,9 +35,34 @@ class ScoringRequest(BaseModel):
     song2_analysis: AnalysisResult
     user_weights: Optional[UserWeights] = None
 
+class CandidateAnalysis(BaseModel):
+    id: str
+    analysis: AnalysisResult
+
+class BatchScoringRequest(BaseModel):
+    query_analysis: AnalysisResult
+    candidates: List[CandidateAnalysis] = []
+    # Resolved from ANALYSIS_STORE_DIR/<id>.json
+    candidate_ids: List[str] = []
+    user_weights: Optional[UserWeights] = None
+    top_k: Optional[int] = Field(None, ge=1)
+
+# Stored analyses (AnalysisResult JSON) that batch requests can refer to by id
+ANALYSIS_STORE_DIR = os.environ.get("ANALYSIS_STORE_DIR", "/data/mashability/analyses")
+_ANALYSIS_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+# In-memory pair scores kept before the least recently used are evicted, and
+# an optional SQLite file that keeps them across restarts
+PAIR_CACHE_SIZE = int(os.environ.get("PAIR_CACHE_SIZE", 4096))
+PAIR_CACHE_DB = os.environ.get("PAIR_CACHE_DB")
+
 # --- FastAPI App ---
 app = FastAPI()
 
+pair_cache = PairScoreCache(maxsize=PAIR_CACHE_SIZE, path=PAIR_CACHE_DB)
+
+# Prometheus metrics, including the pair score cache lookups
+app.mount("/metrics", make_asgi_app())
+
 # Set up CORS
 origins = [
     "http://localhost:8080",
@@ -136,22 +169,132 @@ def calculate_mashability(analysis1: dict, analysis2: dict, weights: dict):
         "warnings": ["Warning based on scores..."],
     }
 
+def _stack_features(analyses):
+    """
+    Collects the scalar inputs of every scoring dimension into one array per
+    field, so each dimension is scored for all candidates at once.
+    """
+    return {
+        "key": np.array([a['harmonic']['key'] for a in analyses], dtype=object),
+        "chord_complexity": np.array([a['harmonic']['chord_complexity'] for a in analyses], dtype=float),
+        "bpm": np.array([a['rhythmic']['bpm'] for a in analyses], dtype=float),
+        "groove_stability": np.array([a['rhythmic']['groove_stability'] for a in analyses], dtype=float),
+        "swing_factor": np.array([a['rhythmic']['swing_factor'] for a in analyses], dtype=float),
+        "beat_confidence": np.array([a['rhythmic']['beat_confidence'] for a in analyses], dtype=float),
+        "mfcc": np.array([np.array(a['spectral']['mfccs']).mean(axis=1) for a in analyses], dtype=float),
+        "brightness": np.array([a['spectral']['brightness'] for a in analyses], dtype=float),
+        "dynamic_range": np.array([a['spectral']['dynamic_range'] for a in analyses], dtype=float),
+        "vocal_presence": np.array([a['vocal']['vocal_presence'] for a in analyses], dtype=float),
+    }
+
+def _relative_compat(x, y):
+    return 1 - np.abs(x - y) / np.maximum(np.maximum(x, y), 1e-9)
+
+def calculate_mashability_batch(query: dict, candidates: List[dict], weights: dict):
+    """
+    Scores one query analysis against every candidate with the same formulas
+    as calculate_mashability. Returns the overall score and the four
+    dimension scores as arrays aligned with candidates.
+    """
+    q = _stack_features([query])
+    c = _stack_features(candidates)
+
+    key_compat = np.where(c['key'] == q['key'][0], 1.0, 0.5)
+    chord_sim = 1.0 - np.abs(c['chord_complexity'] - q['chord_complexity'])
+    harmonic = (key_compat + chord_sim) / 2 * 100
+
+    tempo_ratio = np.minimum(c['bpm'], q['bpm']) / np.maximum(c['bpm'], q['bpm'])
+    groove_sim = 1.0 - np.abs(c['groove_stability'] - q['groove_stability'])
+    swing_compat = 1.0 - np.abs(c['swing_factor'] - q['swing_factor'])
+    beat_conf = (c['beat_confidence'] + q['beat_confidence']) / 2
+    rhythmic = (0.4 * tempo_ratio + 0.3 * groove_sim + 0.2 * swing_compat + 0.1 * beat_conf) * 100
+
+    norms = np.linalg.norm(c['mfcc'], axis=1) * np.linalg.norm(q['mfcc'][0])
+    mfcc_sim = np.divide(c['mfcc'] @ q['mfcc'][0], norms, out=np.zeros(len(candidates)), where=norms > 0)
+    brightness_compat = _relative_compat(c['brightness'], q['brightness'])
+    range_compat = _relative_compat(c['dynamic_range'], q['dynamic_range'])
+    spectral = (0.5 * mfcc_sim + 0.25 * brightness_compat + 0.25 * range_compat) * 100
+
+    p1, p2 = q['vocal_presence'], c['vocal_presence']
+    vocal = np.where((p1 > 0.5) | (p2 > 0.5), (1 - p1 * p2) * 100, 50.0)
+
+    dimensions = {"harmonic": harmonic, "rhythmic": rhythmic, "spectral": spectral, "vocal": vocal}
+    overall = sum(dimensions[k] * weights[k] for k in dimensions)
+    return overall, dimensions
+
+def load_stored_analysis(analysis_id: str) -> dict:
+    if not _ANALYSIS_ID.match(analysis_id):
+        raise HTTPException(status_code=400, detail=f"Invalid analysis id: {analysis_id}")
+    path = os.path.join(ANALYSIS_STORE_DIR, f"{analysis_id}.json")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Analysis not found: {analysis_id}")
+    with open(path) as f:
+        return AnalysisResult(**json.load(f)).dict()
+
+def _swap_vocal_presence(result):
+    """The only order-dependent fields of a result are the per-song vocal presences."""
+    vocal = dict(result['compatibility_breakdown']['vocal'])
+    vocal['vocal_presence_1'], vocal['vocal_presence_2'] = vocal['vocal_presence_2'], vocal['vocal_presence_1']
+    return {**result, "compatibility_breakdown": {**result['compatibility_breakdown'], "vocal": vocal}}
+
+def _normalized_weights(user_weights: Optional[UserWeights]) -> dict:
+    weights = user_weights.dict() if user_weights else UserWeights().dict()
+    total_weight = sum(weights.values())
+    if total_weight == 0: raise ValueError("Total weight cannot be zero.")
+    return {k: v / total_weight for k, v in weights.items()}
+
 # --- API Endpoint ---
 @app.post("/calculate-mashability")
 async def calculate_mashability_endpoint(request: ScoringRequest):
     try:
-        weights = request.user_weights.dict() if request.user_weights else UserWeights().dict()
-        total_weight = sum(weights.values())
-        if total_weight == 0: raise ValueError("Total weight cannot be zero.")
-        norm_weights = {k: v / total_weight for k, v in weights.items()}
+        norm_weights = _normalized_weights(request.user_weights)
+        analysis1 = request.song1_analysis.dict()
+        analysis2 = request.song2_analysis.dict()
 
-        result = calculate_mashability(request.song1_analysis.dict(), request.song2_analysis.dict(), norm_weights)
-        return result
+        key, swapped = pair_key(content_hash(analysis1), content_hash(analysis2), norm_weights)
+        result = pair_cache.get(key)
+        if result is None:
+            # Stored in canonical pair order so either order can be served
+            result = calculate_mashability(*((analysis2, analysis1) if swapped else (analysis1, analysis2)), norm_weights)
+            pair_cache.put(key, result)
+        return _swap_vocal_presence(result) if swapped else result
     except Exception as e:
         print(f"Error in /calculate-mashability: {e}", file=sys.stderr)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/calculate-mashability/batch")
+async def calculate_mashability_batch_endpoint(request: BatchScoringRequest):
+    """
+    Ranks many candidates against one query analysis in a single request,
+    best first. Candidates are given inline, by stored id, or both.
+    """
+    try:
+        norm_weights = _normalized_weights(request.user_weights)
+        ids = [c.id for c in request.candidates] + list(request.candidate_ids)
+        analyses = [c.analysis.dict() for c in request.candidates]
+        analyses += [load_stored_analysis(analysis_id) for analysis_id in request.candidate_ids]
+        if not analyses:
+            return {"results": []}
+
+        overall, dimensions = calculate_mashability_batch(request.query_analysis.dict(), analyses, norm_weights)
+        order = np.argsort(-overall, kind="stable")[:request.top_k]
+        results = [
+            {
+                "id": ids[i],
+                "overall_score": float(overall[i]),
+                "dimension_scores": {k: float(v[i]) for k, v in dimensions.items()},
+            }
+            for i in order
+        ]
+        return {"results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in /calculate-mashability/batch: {e}", file=sys.stderr)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- Main execution ---
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8002))
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
+import string
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from jsonschema import validate
 
 from schemas.models import Analysis
 
+# Source ids: "a", "b", "c", ... for the first, second, third track
+SOURCE_PATTERN = "^[a-z][a-z0-9_]*$"
+
 # Minimal schema describing the master plan structure
 PLAN_SCHEMA: Dict[str, Any] = {
     "type": "object",
     "properties": {
+        "sources": {
+            "type": "array",
+            "items": {"type": "string", "pattern": SOURCE_PATTERN},
+            "minItems": 1,
+            "uniqueItems": True,
+        },
         "sections": {
             "type": "array",
             "items": {
@@ -27,11 +37,11 @@ PLAN_SCHEMA: Dict[str, Any] = {
                 "properties": {
                     "start_ms": {"type": "integer", "minimum": 0},
                     "end_ms": {"type": "integer", "minimum": 0},
-                    "top_stem": {"type": "string", "enum": ["a", "b"]},
+                    "top_stem": {"type": "string", "pattern": SOURCE_PATTERN},
                     "gain_db": {
                         "type": "object",
                         "patternProperties": {
-                            "^(a|b)$": {"type": "number"}
+                            SOURCE_PATTERN: {"type": "number"}
                         },
                         "additionalProperties": False,
                     },
@@ -41,14 +51,14 @@ PLAN_SCHEMA: Dict[str, Any] = {
                     "pitch_shift": {
                         "type": "object",
                         "patternProperties": {
-                            "^(a|b)$": {"type": "number"}
+                            SOURCE_PATTERN: {"type": "number"}
                         },
                         "additionalProperties": False,
                     },
                     "stretch_ratio": {
                         "type": "object",
                         "patternProperties": {
-                            "^(a|b)$": {"type": "number", "minimum": 0}
+                            SOURCE_PATTERN: {"type": "number", "minimum": 0}
                         },
                         "additionalProperties": False,
                     },
@@ -70,45 +80,63 @@ def _duration_ms(analysis: Analysis) -> int:
     return 0
 
 
-def _validate(plan: Dict[str, Any], dur_a: int, dur_b: int) -> None:
-    """Validate plan against schema and timing constraints."""
+def _validate(plan: Dict[str, Any], durations: Dict[str, int]) -> None:
+    """Validate plan against schema and timing constraints.
+
+    ``durations`` maps every available source id to its length in ms. Plans
+    without a ``sources`` list may use any of them.
+    """
     validate(instance=plan, schema=PLAN_SCHEMA)
-    max_dur = min(dur_a, dur_b)
+    sources = set(plan.get("sources", durations))
+    if not sources <= durations.keys():
+        raise ValueError("plan lists undefined sources")
+    max_dur = min(durations[s] for s in sources)
     for sec in plan["sections"]:
         if not (0 <= sec["start_ms"] < sec["end_ms"] <= max_dur):
             raise ValueError("section times out of range")
-        if sec["top_stem"] not in {"a", "b"}:
+        if sec["top_stem"] not in sources:
             raise ValueError("undefined stem")
-        for stem in sec["gain_db"].keys():
-            if stem not in {"a", "b"}:
-                raise ValueError("gain refers to undefined stem")
+        for field in ("gain_db", "pitch_shift", "stretch_ratio"):
+            for stem in sec[field].keys():
+                if stem not in sources:
+                    raise ValueError(f"{field} refers to undefined stem")
 
 
-def generate_masterplan(analysis_a: Analysis, analysis_b: Analysis) -> Dict[str, Any]:
-    """Generate a deterministic mash plan for two tracks.
+def source_ids(n: int) -> List[str]:
+    """Return the ids of ``n`` sources: ``a``, ``b``, ``c``, ..."""
+    if not 1 <= n <= len(string.ascii_lowercase):
+        raise ValueError(f"unsupported number of sources: {n}")
+    return list(string.ascii_lowercase[:n])
+
+
+def generate_masterplan(*analyses: Analysis) -> Dict[str, Any]:
+    """Generate a deterministic mash plan for two or more tracks.
 
     This implementation does not rely on an external LLM so that tests can
-    execute offline. It constructs a minimal plan that keeps the shorter track
-    on top for its full duration while ducking the other track slightly.
+    execute offline. It constructs a minimal plan that keeps the first track
+    on top for the shortest track's full duration while ducking the others
+    slightly. Tracks are referred to as sources ``a``, ``b``, ``c``, ...
     """
-    dur_a = _duration_ms(analysis_a)
-    dur_b = _duration_ms(analysis_b)
-    total = min(dur_a, dur_b)
+    if len(analyses) < 2:
+        raise ValueError("a mashup needs at least two tracks")
+    ids = source_ids(len(analyses))
+    durations = {sid: _duration_ms(a) for sid, a in zip(ids, analyses)}
+    total = min(durations.values())
     plan = {
+        "sources": ids,
         "sections": [
             {
                 "start_ms": 0,
                 "end_ms": total,
-                "top_stem": "a",
-                "gain_db": {"a": 0.0, "b": -3.0},
+                "top_stem": ids[0],
+                "gain_db": {sid: 0.0 if sid == ids[0] else -3.0 for sid in ids},
                 "eq": {},
                 "sidechain": False,
                 "x_fade": {"curve": "linear"},
-                "pitch_shift": {"a": 0.0, "b": 0.0},
-                "stretch_ratio": {"a": 1.0, "b": 1.0},
+                "pitch_shift": {sid: 0.0 for sid in ids},
+                "stretch_ratio": {sid: 1.0 for sid in ids},
             }
-        ]
+        ],
     }
-    _validate(plan, dur_a, dur_b)
+    _validate(plan, durations)
     return plan
-
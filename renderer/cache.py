@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+from core.hashing import canonical_json, hash_json, library_versions
+from infra.metrics import render_cache_requests
+from infra.storage import ObjectStore
+from renderer.quality import QualityTier
+
+# Bump whenever a renderer change alters the output for the same inputs, so
+# stale cache entries are never served.
+RENDERER_VERSION = "2"
+
+_MANIFEST = "manifest.json"
+
+
+def engine_versions(tier: QualityTier) -> Dict[str, Any]:
+    """Versions of everything that shapes the rendered samples for ``tier``."""
+    return {
+        "renderer": RENDERER_VERSION,
+        "stretch_engine": tier.engine,
+        "stretch_options": tier.engine_options,
+        **library_versions(),
+    }
+
+
+def render_key(plan: Dict[str, Any], input_hashes: Sequence[str], sample_rate: int, tier: QualityTier) -> str:
+    """Deterministic cache key for a render of ``plan`` over the hashed inputs."""
+    payload = {
+        "plan": plan,
+        "inputs": list(input_hashes),
+        "sample_rate": sample_rate,
+        "quality": tier.name,
+        "engines": engine_versions(tier),
+    }
+    return hash_json(payload)
+
+
+class RenderCache:
+    """Render outputs stored in an ObjectStore under ``{prefix}/{key}/``.
+
+    Each entry is a set of files plus a manifest listing them; the manifest is
+    written last, so an entry is only visible once all of its files are.
+    """
+
+    def __init__(self, store: ObjectStore, prefix: str = "render-cache"):
+        self.store = store
+        self.prefix = prefix
+
+    def _key(self, key: str, name: str) -> str:
+        return f"{self.prefix}/{key}/{name}"
+
+    def restore(self, key: str, out_dir: Path) -> List[Path] | None:
+        """Copy a cached entry into ``out_dir``; returns the files or None on a miss."""
+        manifest_key = self._key(key, _MANIFEST)
+        if not self.store.exists(manifest_key):
+            render_cache_requests.labels(result="miss").inc()
+            return None
+        render_cache_requests.labels(result="hit").inc()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = json.loads(self.store.get(manifest_key, Path(tmp) / _MANIFEST).read_text())
+        files = []
+        for name in manifest["files"]:
+            dest = out_dir / name
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            files.append(self.store.get(self._key(key, name), dest))
+        return files
+
+    def save(self, key: str, out_dir: Path, names: Iterable[str]) -> None:
+        """Store ``names`` (files or directories relative to ``out_dir``) under ``key``."""
+        files = []
+        for name in names:
+            path = out_dir / name
+            paths = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+            for p in paths:
+                rel = p.relative_to(out_dir).as_posix()
+                self.store.put(self._key(key, rel), p)
+                files.append(rel)
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = Path(tmp) / _MANIFEST
+            manifest.write_text(canonical_json({"files": files}))
+            self.store.put(self._key(key, _MANIFEST), manifest)
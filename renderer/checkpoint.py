@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from infra.storage import ObjectStore
+
+_MANIFEST = "manifest.json"
+
+
+class RenderCheckpoint:
+    """Per-section render progress stored in an ObjectStore.
+
+    Entries live under ``{prefix}/{render_key}/``: one ``.npy`` per finished
+    section holding that section's contribution to the mix, and a manifest
+    mapping section index to its output offset. A section file is uploaded
+    before the manifest names it, so a crash between the two only loses that
+    section. Because the render key covers the plan, inputs and engines, a
+    retry of the same job finds its checkpoints and a changed job never does.
+    """
+
+    def __init__(self, store: ObjectStore, prefix: str = "checkpoints"):
+        self.store = store
+        self.prefix = prefix
+
+    def _key(self, render_key: str, name: str) -> str:
+        return f"{self.prefix}/{render_key}/{name}"
+
+    def _manifest(self, render_key: str, tmp: Path) -> Dict[str, Dict[str, int]]:
+        key = self._key(render_key, _MANIFEST)
+        if not self.store.exists(key):
+            return {}
+        return json.loads(self.store.get(key, tmp / _MANIFEST).read_text())["sections"]
+
+    def load(self, render_key: str) -> Dict[int, Tuple[int, np.ndarray]]:
+        """Return ``{section: (start_sample, audio)}`` for every completed section."""
+        done: Dict[int, Tuple[int, np.ndarray]] = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for k, entry in self._manifest(render_key, tmp).items():
+                path = self.store.get(self._key(render_key, f"section-{k}.npy"), tmp / f"section-{k}.npy")
+                done[int(k)] = (entry["start"], np.load(path))
+        return done
+
+    def save_section(self, render_key: str, section: int, start: int, audio: np.ndarray) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            path = tmp / f"section-{section}.npy"
+            np.save(path, audio)
+            self.store.put(self._key(render_key, path.name), path)
+            sections = self._manifest(render_key, tmp)
+            sections[str(section)] = {"start": start, "length": int(audio.shape[-1])}
+            manifest = tmp / "next.json"
+            manifest.write_text(json.dumps({"sections": sections}))
+            self.store.put(self._key(render_key, _MANIFEST), manifest)
+
+    def clear(self, render_key: str) -> None:
+        """Delete every checkpoint of a finished render."""
+        with tempfile.TemporaryDirectory() as tmp:
+            sections = self._manifest(render_key, Path(tmp))
+        self.store.delete(self._key(render_key, _MANIFEST))
+        for k in sections:
+            self.store.delete(self._key(render_key, f"section-{k}.npy"))
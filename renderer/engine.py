@@ -1,52 +1,213 @@
 from __future__ import annotations
 
+import json
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, Mapping, Sequence
 
 import numpy as np
 import soundfile as sf
 
+from core.hashing import hash_audio
+from core.mastering import master
+from core.peaks import peaks_path, write_peaks
+from core.spectrogram import spectrogram_dir, write_spectrogram
+from core.stretch import StretchEngine
+from infra.metrics import render_xrt_factor
+from renderer.cache import RenderCache, render_key
+from renderer.checkpoint import RenderCheckpoint
+from renderer.export import Exporter
+from renderer.quality import FINAL, conform, get_tier
 
-def render_draft(
+# Files of a render that are stored in and restored from the render cache
+CACHED_OUTPUTS = ("draft.wav", "stems_bus.wav", "draft.peaks", "draft.spec", "render.json")
+
+
+def _section_audio(
+    audio: np.ndarray,
+    start: int,
+    end: int,
+    sample_rate: int,
+    stretch_ratio: float,
+    pitch_shift: float,
+    engine: StretchEngine,
+) -> np.ndarray:
+    """Return ``audio`` for samples ``start:end`` after stretching and shifting."""
+    length = end - start
+    if stretch_ratio == 1.0 and not pitch_shift:
+        return audio[..., start:end]
+    seg = audio[..., start : start + int(round(length * stretch_ratio))]
+    if not seg.shape[-1]:
+        return seg
+    if stretch_ratio != 1.0:
+        seg = engine.time_stretch(seg, sample_rate, stretch_ratio)
+    if pitch_shift:
+        seg = engine.pitch_shift(seg, sample_rate, pitch_shift)
+    return seg[..., :length]
+
+
+def gain_matrix(plan: Dict[str, Any], source_ids: Sequence[str]) -> np.ndarray:
+    """Linear gains shaped ``(sources, sections)``; sources without a gain are muted."""
+    db = np.full((len(source_ids), len(plan["sections"])), -np.inf)
+    index = {sid: i for i, sid in enumerate(source_ids)}
+    for k, sec in enumerate(plan["sections"]):
+        for sid, gain_db in sec["gain_db"].items():
+            if sid not in index:
+                raise ValueError(f"gain refers to undefined source: {sid}")
+            db[index[sid], k] = gain_db
+    return (10 ** (db / 20.0)).astype(np.float32)
+
+
+def render_mix(
     plan: Dict[str, Any],
-    audio_a: np.ndarray,
-    audio_b: np.ndarray,
+    sources: Mapping[str, np.ndarray],
     sample_rate: int,
     pair_id: str,
     root: Path | str = Path("data"),
+    quality: str = "final",
+    cache: RenderCache | None = None,
+    exporter: Exporter | None = None,
+    checkpoint: RenderCheckpoint | None = None,
 ) -> np.ndarray:
-    """Render a draft mashup according to a master plan.
+    """Render a mashup of any number of sources according to a master plan.
+
+    ``sources`` maps the source ids used in the plan (``"a"``, ``"b"``,
+    ``"c"``, ...) to audio shaped ``(samples,)`` or ``(channels, samples)``.
+    Each section stretches and shifts only the sources it hears, stacks them
+    and sums them with one product against that section's column of the
+    ``(sources, sections)`` gain matrix, so extra sources add stretch work but
+    no per-source mixing loop. The mix is normalised to ``TARGET_LUFS`` and
+    true-peak limited (``core.mastering.master``), then written to
+    ``draft.wav`` and ``stems_bus.wav`` inside ``{root}/renders/{pair_id}``
+    and returned. A waveform peak pyramid (``draft.peaks``) and spectrogram
+    tiles (``draft.spec/``) are written next to the draft for the DAW
+    timeline.
+
+    ``quality`` names a tier from ``renderer.quality``. Non-final tiers render
+    into their own subdirectory (e.g. ``{pair_id}/preview``) so drafts never
+    replace the final render. Each render writes ``render.json`` with its
+    realtime factor; previews also report their speedup over the pair's last
+    final render.
+
+    With a ``cache``, renders are keyed by the plan, the input audio, the
+    tier and the engine versions; a hit restores the stored outputs into the
+    render directory and returns the cached draft without rendering.
+
+    With an ``exporter``, the mix is also queued for compressed encoding and
+    upload under ``renders/{pair_id}[/{tier}]``; this returns without waiting
+    for it (see ``exporter.jobs``).
 
-    The implementation mixes the two input tracks using the gain settings in the
-    plan. It writes the result to ``draft.wav`` and ``stems_bus.wav`` inside
-    ``{root}/renders/{pair_id}`` and returns the mixed waveform.
+    With a ``checkpoint``, each finished section's contribution is stored
+    under the render key; a retried render adds the stored sections back
+    instead of rendering them again. Checkpoints are cleared on success.
     """
+    started = time.perf_counter()
+    tier = get_tier(quality)
     root = Path(root)
-    out_dir = root / "renders" / pair_id
+    final_dir = root / "renders" / pair_id
+    out_dir = final_dir if tier is FINAL else final_dir / tier.name
     out_dir.mkdir(parents=True, exist_ok=True)
+    source_ids = sorted(sources)
+
+    key = None
+    if cache is not None or checkpoint is not None:
+        hashes = [f"{sid}:{hash_audio(sources[sid])}" for sid in source_ids]
+        key = render_key(plan, hashes, sample_rate, tier)
+    if cache is not None:
+        if cache.restore(key, out_dir) is not None:
+            cached, cached_sr = sf.read(out_dir / "draft.wav", dtype="float32")
+            cached = np.ascontiguousarray(cached.T)
+            if exporter is not None:
+                exporter.submit(cached, cached_sr, out_dir.relative_to(root).as_posix())
+            return cached
+
+    audio = []
+    for sid in source_ids:
+        conformed, out_sr = conform(sources[sid], sample_rate, tier)
+        audio.append(conformed)
+    sample_rate = out_sr
+    # Mono sources join stereo ones on every channel
+    channels = max((a.shape[0] for a in audio if a.ndim > 1), default=None)
+    if channels is not None:
+        audio = [np.broadcast_to(a, (channels, a.shape[-1])) if a.ndim == 1 else a for a in audio]
+    engine = tier.make_engine()
+    gains = gain_matrix(plan, source_ids)
 
     total_ms = max(sec["end_ms"] for sec in plan["sections"])
     total_samples = int(total_ms / 1000 * sample_rate)
-    mix = np.zeros(total_samples, dtype=np.float32)
+    mix = np.zeros(audio[0].shape[:-1] + (total_samples,), dtype=np.float32)
 
-    def _gain(v):
-        return 10 ** (v / 20.0)
-
-    for sec in plan["sections"]:
+    completed = checkpoint.load(key) if checkpoint is not None else {}
+    for k, sec in enumerate(plan["sections"]):
+        if k in completed:
+            start, section_mix = completed[k]
+            mix[..., start : start + section_mix.shape[-1]] += section_mix
+            continue
         start = int(sec["start_ms"] / 1000 * sample_rate)
         end = int(sec["end_ms"] / 1000 * sample_rate)
-        ga = _gain(sec["gain_db"].get("a", -120.0))
-        gb = _gain(sec["gain_db"].get("b", -120.0))
-        seg_a = audio_a[start:end]
-        seg_b = audio_b[start:end]
-        length = min(len(seg_a), len(seg_b))
-        mix[start : start + length] += ga * seg_a[:length] + gb * seg_b[:length]
-
-    peak = float(np.max(np.abs(mix))) if mix.size else 0.0
-    if peak > 1.0:
-        mix *= 0.98 / peak
-
-    sf.write(out_dir / "draft.wav", mix, sample_rate)
-    sf.write(out_dir / "stems_bus.wav", mix, sample_rate)
+        active = np.flatnonzero(gains[:, k])
+        if not active.size:
+            continue
+        stretch = sec.get("stretch_ratio", {})
+        shift = sec.get("pitch_shift", {})
+        segments = [
+            _section_audio(
+                audio[i], start, end, sample_rate,
+                stretch.get(source_ids[i], 1.0), shift.get(source_ids[i], 0.0), engine,
+            )
+            for i in active
+        ]
+        length = min(seg.shape[-1] for seg in segments)
+        stack = np.stack([seg[..., :length] for seg in segments])
+        section_mix = np.tensordot(gains[active, k], stack, axes=1)
+        mix[..., start : start + length] += section_mix
+        if checkpoint is not None:
+            checkpoint.save_section(key, k, start, section_mix)
+
+    mix = master(mix, sample_rate)
+
+    sf.write(out_dir / "draft.wav", mix.T, sample_rate)
+    sf.write(out_dir / "stems_bus.wav", mix.T, sample_rate)
+    write_peaks(peaks_path(out_dir / "draft.wav"), mix, sample_rate)
+    write_spectrogram(spectrogram_dir(out_dir / "draft.wav"), mix, sample_rate)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    xrt = (total_samples / sample_rate) / elapsed
+    render_xrt_factor.observe(xrt)
+    report: Dict[str, Any] = {
+        "quality": tier.name,
+        "sample_rate": sample_rate,
+        "channels": 1 if mix.ndim == 1 else mix.shape[0],
+        "sources": len(source_ids),
+        "elapsed_sec": elapsed,
+        "xrt": xrt,
+    }
+    final_report = final_dir / "render.json"
+    if tier is not FINAL and final_report.exists():
+        report["speedup"] = xrt / json.loads(final_report.read_text())["xrt"]
+    (out_dir / "render.json").write_text(json.dumps(report))
+    if cache is not None:
+        cache.save(key, out_dir, CACHED_OUTPUTS)
+    if checkpoint is not None:
+        checkpoint.clear(key)
+    if exporter is not None:
+        exporter.submit(mix, sample_rate, out_dir.relative_to(root).as_posix())
     return mix
 
+
+def render_draft(
+    plan: Dict[str, Any],
+    audio_a: np.ndarray,
+    audio_b: np.ndarray,
+    sample_rate: int,
+    pair_id: str,
+    root: Path | str = Path("data"),
+    quality: str = "final",
+    cache: RenderCache | None = None,
+    exporter: Exporter | None = None,
+    checkpoint: RenderCheckpoint | None = None,
+) -> np.ndarray:
+    """Render a two-track draft; see ``render_mix`` for the outputs written."""
+    return render_mix(
+        plan, {"a": audio_a, "b": audio_b}, sample_rate, pair_id, root, quality, cache, exporter, checkpoint
+    )
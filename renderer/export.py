@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from infra.storage import ObjectStore
+
+# Frames handed to the encoder per write; progress is reported per block.
+EXPORT_BLOCK = 65536
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """A libsndfile container/codec pair and how its objects are stored."""
+
+    name: str
+    format: str
+    subtype: str
+    suffix: str
+    content_type: str
+    # Codecs restricted to fixed rates (Opus) are resampled while encoding
+    sample_rate: int | None = None
+    compression_level: float | None = None
+
+
+FORMATS: Dict[str, ExportFormat] = {
+    "flac": ExportFormat("flac", "FLAC", "PCM_16", ".flac", "audio/flac", compression_level=0.5),
+    "mp3": ExportFormat("mp3", "MP3", "MPEG_LAYER_III", ".mp3", "audio/mpeg", compression_level=0.3),
+    "opus": ExportFormat("opus", "OGG", "OPUS", ".opus", "audio/ogg", sample_rate=48000, compression_level=0.3),
+}
+
+ProgressCallback = Callable[[str, str, float], None]
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared encoder pool. libsndfile releases the GIL, so threads encode in parallel."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("EXPORT_WORKERS", len(FORMATS)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+    return _executor
+
+
+def get_format(name: str) -> ExportFormat:
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(f"unknown export format: {name}") from None
+
+
+def encode(
+    audio: np.ndarray,
+    sample_rate: int,
+    fmt: ExportFormat,
+    dest: Path | str,
+    progress: Callable[[float], None] | None = None,
+) -> Path:
+    """Encode ``audio`` (``(samples,)`` or ``(channels, samples)``) to ``dest`` block by block."""
+    frames = np.atleast_2d(audio).T  # libsndfile takes (frames, channels)
+    out_rate = fmt.sample_rate or sample_rate
+    resampler = None
+    if out_rate != sample_rate:
+        resampler = soxr.ResampleStream(sample_rate, out_rate, frames.shape[1], dtype="float32", quality="HQ")
+    total = frames.shape[0]
+    with sf.SoundFile(
+        dest, "w", samplerate=out_rate, channels=frames.shape[1],
+        format=fmt.format, subtype=fmt.subtype, compression_level=fmt.compression_level,
+    ) as f:
+        for start in range(0, total, EXPORT_BLOCK):
+            block = np.ascontiguousarray(frames[start : start + EXPORT_BLOCK], dtype=np.float32)
+            if resampler is not None:
+                block = resampler.resample_chunk(block, last=start + EXPORT_BLOCK >= total)
+            f.write(block)
+            if progress is not None:
+                progress(min(start + EXPORT_BLOCK, total) / max(total, 1))
+    return Path(dest)
+
+
+class ExportJob:
+    """Background export of one render to several formats.
+
+    ``status()`` returns ``{format: {"state", "progress", "key"}}`` where state
+    moves from ``pending`` through ``encoding`` and ``uploading`` to ``done``
+    (or ``failed`` with an ``error``).
+    """
+
+    def __init__(self, prefix: str, formats: Sequence[str]):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._status: Dict[str, Dict[str, object]] = {
+            name: {"state": "pending", "progress": 0.0, "key": None} for name in formats
+        }
+        self.futures: Dict[str, Future] = {}
+
+    def _update(self, name: str, **fields: object) -> None:
+        with self._lock:
+            self._status[name].update(fields)
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {name: dict(fields) for name, fields in self._status.items()}
+
+    def wait(self, timeout: float | None = None) -> Dict[str, Dict[str, object]]:
+        """Block until every format has finished; re-raises the first failure."""
+        for future in self.futures.values():
+            future.result(timeout)
+        return self.status()
+
+    @property
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures.values())
+
+
+class Exporter:
+    """Encodes rendered mixes in the background and uploads them to an ObjectStore.
+
+    Objects are stored as ``{prefix}/draft{suffix}``. ``on_progress`` is called
+    from the encoder threads with ``(format, state, progress)``.
+    """
+
+    def __init__(
+        self,
+        store: ObjectStore,
+        formats: Sequence[str] = tuple(FORMATS),
+        on_progress: ProgressCallback | None = None,
+        executor: ThreadPoolExecutor | None = None,
+    ):
+        self.store = store
+        self.formats = [get_format(name) for name in formats]
+        self.on_progress = on_progress
+        self.executor = executor
+        self.jobs: Dict[str, ExportJob] = {}
+
+    def _report(self, job: ExportJob, name: str, state: str, progress: float) -> None:
+        job._update(name, state=state, progress=progress)
+        if self.on_progress is not None:
+            self.on_progress(name, state, progress)
+
+    def _export(self, job: ExportJob, audio: np.ndarray, sample_rate: int, fmt: ExportFormat) -> str:
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = encode(
+                    audio, sample_rate, fmt, Path(tmp) / f"draft{fmt.suffix}",
+                    lambda p: self._report(job, fmt.name, "encoding", p),
+                )
+                self._report(job, fmt.name, "uploading", 1.0)
+                key = f"{job.prefix}/draft{fmt.suffix}"
+                self.store.put(key, path)
+        except Exception as e:
+            job._update(fmt.name, state="failed", error=str(e))
+            if self.on_progress is not None:
+                self.on_progress(fmt.name, "failed", job.status()[fmt.name]["progress"])
+            raise
+        job._update(fmt.name, key=key)
+        self._report(job, fmt.name, "done", 1.0)
+        return key
+
+    def submit(self, audio: np.ndarray, sample_rate: int, prefix: str) -> ExportJob:
+        """Queue every format for ``audio`` and return immediately."""
+        executor = self.executor or get_executor()
+        job = ExportJob(prefix, [fmt.name for fmt in self.formats])
+        # The caller may keep mutating its buffer; encoders get their own copy
+        audio = np.array(audio, dtype=np.float32)
+        for fmt in self.formats:
+            job.futures[fmt.name] = executor.submit(self._export, job, audio, sample_rate, fmt)
+        self.jobs[prefix] = job
+        return job
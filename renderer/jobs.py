@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import dramatiq
+
+from core.assets import PROJECT_SAMPLE_RATE, open_canonical
+from infra.queue import broker  # noqa: F401  (registers the broker before the actor)
+from infra.storage import LocalObjectStore, ObjectStore, S3ObjectStore
+from renderer.checkpoint import RenderCheckpoint
+from renderer.engine import render_mix
+
+# Shared bucket for section checkpoints, so a retry on another host (after a
+# spot preemption) resumes; without it checkpoints stay on the worker's disk
+# and only a retry on the same host resumes
+CHECKPOINT_BUCKET = os.getenv("MASHER_CHECKPOINT_BUCKET")
+CHECKPOINT_ROOT = Path(os.getenv("MASHER_CHECKPOINT_ROOT", "data/checkpoints"))
+
+status: Dict[str, str] = {}
+
+
+def checkpoint_store() -> ObjectStore:
+    """The configured checkpoint store: S3 when ``CHECKPOINT_BUCKET`` is set, else local disk."""
+    if CHECKPOINT_BUCKET:
+        return S3ObjectStore(CHECKPOINT_BUCKET)
+    return LocalObjectStore(CHECKPOINT_ROOT)
+
+
+@dramatiq.actor(max_retries=5)
+def render_job(
+    job_id: str,
+    plan: Dict[str, Any],
+    source_paths: Dict[str, str],
+    pair_id: str,
+    root: str = "data",
+    quality: str = "final",
+) -> None:
+    """Render ``plan`` over the canonical copies of ``source_paths``.
+
+    Completed sections are checkpointed in ``checkpoint_store()``, so a
+    retry after a crash or preemption resumes from the last finished section.
+    """
+    checkpoint = RenderCheckpoint(checkpoint_store())
+    sources = {sid: open_canonical(path) for sid, path in source_paths.items()}
+    render_mix(plan, sources, PROJECT_SAMPLE_RATE, pair_id, root=root, quality=quality, checkpoint=checkpoint)
+    status[job_id] = "completed"
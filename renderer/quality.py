@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from core.stretch import StretchEngine, get_engine
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    """Sample rate, channel layout and stretch engine settings for a render."""
+
+    name: str
+    sample_rate: int
+    mono: bool
+    engine: str
+    engine_options: Dict[str, Any] = field(default_factory=dict)
+
+    def make_engine(self) -> StretchEngine:
+        return get_engine(self.engine, **self.engine_options)
+
+
+FINAL = QualityTier("final", 44100, mono=False, engine="rubberband", engine_options={"rbargs": {"-t": "", "-F": ""}})
+# Drafts for auditioning: half rate, mono and the in-process vocoder with a
+# short FFT instead of a Rubber Band subprocess per stretch.
+PREVIEW = QualityTier("preview", 22050, mono=True, engine="phase_vocoder", engine_options={"n_fft": 1024, "hop_length": 256})
+
+TIERS: Dict[str, QualityTier] = {FINAL.name: FINAL, PREVIEW.name: PREVIEW}
+
+
+def get_tier(name: str) -> QualityTier:
+    try:
+        return TIERS[name]
+    except KeyError:
+        raise ValueError(f"unknown quality tier: {name}") from None
+
+
+def conform(audio: np.ndarray, sample_rate: int, tier: QualityTier) -> tuple[np.ndarray, int]:
+    """Downmix and resample ``audio`` to the tier's layout.
+
+    ``audio`` is ``(samples,)`` or ``(channels, samples)``. Audio already at or
+    below the tier's sample rate is never upsampled.
+    """
+    if tier.mono and audio.ndim > 1:
+        audio = audio.mean(axis=0)
+    out_sr = min(sample_rate, tier.sample_rate)
+    if out_sr != sample_rate:
+        g = np.gcd(out_sr, sample_rate)
+        audio = resample_poly(audio, out_sr // g, sample_rate // g, axis=-1)
+    return audio.astype(np.float32, copy=False), out_sr
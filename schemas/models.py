@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, HttpUrl, Field
 
@@ -61,6 +61,15 @@ class ChordSegment(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
 
+class EnergyEnvelope(BaseModel):
+    """RMS energy as base64 little-endian float16, one value per beat when ``rate_hz`` is null."""
+
+    rate_hz: Optional[float]
+    data: str
+
+    model_config = ConfigDict(extra="forbid")
+
+
 class Analysis(BaseModel):
     bpm: float
     tempo_conf: float
@@ -72,6 +81,7 @@ class Analysis(BaseModel):
     danceability: float
     vocals_presence: float
     chord_segments: List[ChordSegment]
+    energy_envelopes: List[EnergyEnvelope] = Field(default_factory=list)
 
     model_config = ConfigDict(extra="forbid")
 
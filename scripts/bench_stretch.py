@@ -0,0 +1,56 @@
+"""A/B benchmark of the stretch engines on the golden draft audio.
+
+Usage: ``PYTHONPATH=. python scripts/bench_stretch.py [--seconds 30]``
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import shutil
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from core.stretch import ENGINES
+
+GOLDEN = Path(__file__).resolve().parent.parent / "tests" / "golden" / "draft.wav.b64"
+
+
+def load_golden(seconds: float) -> tuple[np.ndarray, int]:
+    """Decode the golden draft and loop it to ``seconds`` of stereo audio."""
+    raw = base64.b64decode(GOLDEN.read_text())
+    y, sr = sf.read(io.BytesIO(raw), dtype="float32", always_2d=True)
+    y = y.T
+    if y.shape[0] == 1:
+        y = np.repeat(y, 2, axis=0)
+    reps = int(np.ceil(seconds * sr / y.shape[-1]))
+    return np.tile(y, reps)[:, : int(seconds * sr)], sr
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.8, 1.05, 1.25])
+    args = parser.parse_args()
+
+    y, sr = load_golden(args.seconds)
+    have_rb = shutil.which("rubberband") is not None
+    print(f"golden audio: {y.shape[-1] / sr:.1f}s stereo @ {sr} Hz")
+    print(f"{'engine':<14} {'op':<16} {'xRT':>8} {'len err':>8}")
+    for name, factory in ENGINES.items():
+        if name == "rubberband" and not have_rb:
+            print(f"{name:<14} skipped: rubberband CLI not on PATH")
+            continue
+        engine = factory()
+        for rate in args.rates:
+            out = engine.time_stretch(y, sr, rate)
+            err = out.shape[-1] - round(y.shape[-1] / rate)
+            print(f"{name:<14} {'stretch x' + str(rate):<16} {engine.last_xrt:>8.1f} {err:>8d}")
+        out = engine.pitch_shift(y, sr, 2)
+        print(f"{name:<14} {'shift +2':<16} {engine.last_xrt:>8.1f} {out.shape[-1] - y.shape[-1]:>8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import os
 import subprocess
 from datetime import datetime
 from pathlib import Path
@@ -13,8 +14,15 @@ import essentia
 import essentia.standard as es
 from importlib import metadata
 
+from core.catalog import track_embedding, update_catalog
+from core.envelopes import energy_envelopes
+from core.sections import beat_features, save_beat_features
+from core.spectrogram import write_tiles
+from core.tempo import save_onset_envelope
 from schemas.models import Analysis, KeyInfo, Section, ChordSegment, Provenance
 
+CATALOG_ROOT = Path(os.getenv("MASHER_CATALOG_ROOT", "/data/catalog"))
+
 _PITCHES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
 
 _MAJOR_TEMPLATE = np.array([1, 0, 0, 0, 1, 0, 0, 1, 0, 0, 0, 0])
@@ -104,10 +112,15 @@ def analyze_track(audio_path: Path | str, track_id: str) -> Analysis:
     beatgrid = beat_ms
     sections = _sections(y, sr)
     chords = _chords(y, sr)
-    rms = float(librosa.feature.rms(y=y).mean())
+    rms_frames = librosa.feature.rms(y=y)[0]
+    rms = float(rms_frames.mean())
     beat_strength = float(onset_env[beat_frames].mean()) if len(beat_frames) else 0.0
     danceability = float(beat_strength / (onset_env.max() + 1e-6))
-    harmonic, _ = librosa.effects.hpss(y)
+    # One STFT serves both HPSS and the DAW spectrogram tiles
+    n_fft, hop = 2048, 512
+    stft = librosa.stft(y, n_fft=n_fft, hop_length=hop)
+    harmonic_stft, _ = librosa.decompose.hpss(stft)
+    harmonic = librosa.istft(harmonic_stft, hop_length=hop, n_fft=n_fft, length=len(y))
     vocals_presence = float(np.mean(np.abs(harmonic)) / (np.mean(np.abs(y)) + 1e-6))
     meter = pyloudnorm.Meter(sr)
     loudness = float(meter.integrated_loudness(y))
@@ -123,6 +136,8 @@ def analyze_track(audio_path: Path | str, track_id: str) -> Analysis:
         danceability=danceability,
         vocals_presence=vocals_presence,
         chord_segments=chords,
+        # librosa's RMS frames use the same 512-sample hop as the beat tracker
+        energy_envelopes=energy_envelopes(rms_frames, sr / 512, beat_frames),
     )
     provenance = Provenance(
         tool_versions={
@@ -145,4 +160,13 @@ def analyze_track(audio_path: Path | str, track_id: str) -> Analysis:
             },
             f,
         )
+    write_tiles(out_dir / "spectrogram", stft, sr, n_fft, hop)
+    # Reused by core.tempo.estimate_offset when this track is aligned
+    save_onset_envelope(out_dir / "onset.npz", onset_env, sr)
+    # Beat-synchronous features for core.sections.section_pairs
+    power = np.abs(stft) ** 2
+    save_beat_features(
+        out_dir / "beats.npz", beat_features(power, np.abs(harmonic_stft) ** 2, rms_frames, sr, beat_frames)
+    )
+    update_catalog(CATALOG_ROOT, track_id, analysis, track_embedding(power, sr))
     return analysis
@@ -10,6 +10,9 @@ from typing import Dict
 import soundfile as sf
 import pyloudnorm as pyln
 
+from core.assets import write_canonical
+from core.peaks import peaks_path, write_peaks
+
 TARGET_LUFS = -14.0
 MAX_PEAK = 10 ** (-1 / 20)  # -1 dBFS in linear scale
 
@@ -40,7 +43,9 @@ def separate(
 ) -> Dict[str, Path]:
     """Separate ``src_path`` into stems for ``track_id``.
 
-    Returns mapping of stem name to output path.
+    Returns mapping of stem name to output path. Each stem also gets a
+    ``.peaks`` waveform pyramid and its canonical render copy (see
+    ``core.assets``) next to it.
     """
     device = "cuda" if torch.cuda.is_available() else "cpu"
     wav, sr = torchaudio.load(str(src_path))
@@ -66,6 +71,8 @@ def separate(
             audio += np.random.uniform(-1 / 2**15, 1 / 2**15, size=audio.shape)
         out_path = out_dir / f"{name}.wav"
         sf.write(out_path, audio, sr)
+        write_peaks(peaks_path(out_path), audio.T, sr)
+        write_canonical(out_path, audio.T, sr)
         result[name] = out_path
 
     return result
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+from align import (
+    MUSIC_LIMIT, NEIGHBOUR_COST, VOCAL_LIMIT, choose_target_key, key_index, key_name, optimize_target_key, plan_shifts,
+)
+
+
+def _camelot(index):
+    pc, minor = index % 12, index >= 12
+    return ((5 if minor else 8) + 7 * pc) % 12
+
+
+def _brute_force(keys, vocal):
+    """Loop over every target and every allowed shift of every track."""
+    best = None
+    for target in range(24):
+        total = 0.0
+        for k, v in zip(keys, vocal):
+            limit, weight = (VOCAL_LIMIT, 2.0) if v else (MUSIC_LIMIT, 1.0)
+            options = []
+            for s in range(-limit, limit + 1):
+                landed = (k % 12 + s) % 12 + 12 * (k >= 12)
+                steps = min((_camelot(landed) - _camelot(target)) % 12, (_camelot(target) - _camelot(landed)) % 12)
+                if steps <= 1:
+                    options.append(abs(s) + NEIGHBOUR_COST * steps)
+            total += weight * min(options)
+        if best is None or total < best:
+            best = total
+    return best
+
+
+def test_key_parsing():
+    assert key_index("C") == key_index("C major") == key_index("8B") == key_index({"key": "C", "scale": "major"}) == 0
+    assert key_index("Am") == key_index("A minor") == key_index("8A") == 21
+    assert key_index("Db major") == key_index("C#") == 1
+    assert key_index("9A") == key_index("E minor")
+    assert key_name(21) == "A minor"
+
+
+def test_compatible_keys_need_no_shift():
+    shifts, vocal_limit, music_limit = plan_shifts({"a": "C", "b": "A minor", "c": "G"})
+    assert shifts == {"a": 0, "b": 0, "c": 0}
+    assert (vocal_limit, music_limit) == (3, 7)
+    assert choose_target_key(["D major", "D major"]) == "D major"
+
+
+def test_optimizer_matches_brute_force_and_respects_limits():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        n = int(rng.integers(2, 6))
+        keys = rng.integers(0, 24, n)
+        vocal = rng.uniform(size=n) < 0.4
+        target, shifts, total = optimize_target_key([key_name(k) for k in keys], vocal)
+        assert np.isclose(total, _brute_force(keys, vocal))
+        assert all(abs(s) <= (VOCAL_LIMIT if v else MUSIC_LIMIT) for s, v in zip(shifts, vocal))
+
+
+def test_vocal_track_is_shifted_less():
+    # C vs F# major: one of them has to move; the vocal track should stay put
+    shifts, _, _ = plan_shifts({"vox": "C", "beat": "F#"}, vocal_tracks={"vox"})
+    assert shifts["vox"] == 0 and shifts["beat"] != 0
+    shifts, _, _ = plan_shifts({"vox": "F#", "beat": "C"}, vocal_tracks={"vox"})
+    assert shifts["vox"] == 0
+    # An explicit target still gets the cheapest landing in its family
+    shifts, _, _ = plan_shifts({"a": "D", "b": "E minor"}, target_key="G major")
+    assert shifts == {"a": 0, "b": 0}
@@ -18,3 +18,28 @@ def test_endpoints_flow():
     assert r['status'] == 'ok'
     patch = client.post(f"/plan/{pair['id']}/patch", json={'ops': []}).json()
     assert patch['status'] == 'patched'
+
+def test_pair_score_endpoint(tmp_path, monkeypatch):
+    import json
+    import api.main
+    from schemas.models import Analysis, KeyInfo, Section
+    monkeypatch.setattr(api.main, 'ANALYSIS_ROOT', tmp_path)
+    t1 = client.post('/tracks:from_url', json={'url': 'a'}).json()
+    t2 = client.post('/tracks:from_url', json={'url': 'b'}).json()
+    pair = client.post('/pairs', json={'a': t1['id'], 'b': t2['id']}).json()
+    assert client.post(f"/pairs/{pair['id']}/score").status_code == 404
+    for track, bpm in ((t1, 120.0), (t2, 126.0)):
+        analysis = Analysis(
+            bpm=bpm, tempo_conf=1.0, key=KeyInfo(pitch_class='C', mode='major'), key_conf=1.0, beatgrid=[],
+            sections=[Section(label='A', start_ms=0, end_ms=60000)], energy=0.1, danceability=0.5,
+            vocals_presence=0.5, chord_segments=[],
+        )
+        (tmp_path / track['id']).mkdir()
+        (tmp_path / track['id'] / 'Analysis.json').write_text(json.dumps({'analysis': analysis.model_dump()}))
+    r = client.post(f"/pairs/{pair['id']}/score").json()
+    assert 0.0 <= r['score'] <= 1.0 and set(r['factors']) == {'key', 'tempo', 'sections', 'vocals', 'energy'}
+    tempo_only = client.post(
+        f"/pairs/{pair['id']}/score", json={'key': 0, 'tempo': 1, 'sections': 0, 'vocals': 0, 'energy': 0}
+    ).json()
+    assert tempo_only['score'] == r['factors']['tempo']
+    assert client.post(f"/pairs/{pair['id']}/score").json() == r
@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from core.assets import canonical_path, ensure_canonical, open_canonical, write_canonical
+
+
+def test_mono_source_becomes_stereo_at_project_rate(tmp_path):
+    src = tmp_path / "vocals.wav"
+    t = np.arange(22050) / 22050
+    sf.write(src, 0.5 * np.sin(2 * np.pi * 440 * t), 22050)
+
+    audio = open_canonical(src)
+    assert canonical_path(src).name == "vocals.44100.npy"
+    assert isinstance(audio, np.memmap) and not audio.flags.writeable
+    assert audio.dtype == np.float32 and audio.shape == (2, 44100)
+    assert np.array_equal(audio[0], audio[1])
+
+
+def test_open_reuses_canonical_until_source_changes(tmp_path):
+    src = tmp_path / "drums.wav"
+    sf.write(src, np.zeros((1000, 2)), 44100)
+    marker = np.ones((2, 10), dtype=np.float32)
+    path = write_canonical(src, marker, 44100)
+    assert np.array_equal(open_canonical(src), marker)
+
+    # A newer source invalidates the canonical copy
+    later = os.path.getmtime(path) + 10
+    os.utime(src, (later, later))
+    assert open_canonical(src).shape == (2, 1000)
+
+
+def test_concurrent_first_use_builds_one_canonical_copy(tmp_path):
+    src = tmp_path / "bass.wav"
+    t = np.arange(44100) / 44100
+    sf.write(src, np.stack([np.sin(2 * np.pi * 55 * t), np.cos(2 * np.pi * 55 * t)], axis=1), 44100)
+    with ProcessPoolExecutor(8) as pool:
+        paths = list(pool.map(ensure_canonical, [src] * 32))
+    assert set(paths) == {canonical_path(src)}
+    assert open_canonical(src).shape == (2, 44100)
+    # No temp files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bass.44100.npy", "bass.wav"]
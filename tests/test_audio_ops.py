@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+from audio_ops import stretch_to_grid_piecewise
+
+
+def test_service_warp_lands_beats_on_target_grid():
+    sr = 22050
+    # 100 BPM clicks warped onto a 120 BPM grid
+    beats = [0.6 * i for i in range(6)]
+    target = [0.5 * i for i in range(6)]
+    n = np.arange(1000)
+    burst = np.sin(2 * np.pi * 1000 * n / sr) * np.exp(-n / 200)
+    y = np.zeros((2, int(sr * 3.8)), dtype=np.float32)
+    for t in beats:
+        start = int(t * sr)
+        y[:, start : start + len(burst)] += burst
+    warped = stretch_to_grid_piecewise(y, sr, beats, target)
+    assert warped.shape[0] == 2
+    assert abs(warped.shape[-1] - int(sr * 3.8 / 1.2)) <= sr // 100
+    env = np.convolve(warped[0] ** 2, np.ones(64) / 64, mode="same")
+    for t in target[1:]:
+        lo = int((t - 0.2) * sr)
+        seg = env[lo : int((t + 0.2) * sr)]
+        onset = (lo + int(np.argmax(seg > 0.3 * seg.max()))) / sr
+        assert abs(onset - t) <= 0.05
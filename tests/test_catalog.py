@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import core.catalog as catalog
+from core.catalog import EMBEDDING_DIM, PartnerIndex, bpm_bucket, track_embedding, update_catalog
+from schemas.models import Analysis, KeyInfo, Section
+
+_PITCHES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+
+
+def _analysis(bpm, pitch="A", mode="minor", vocals=0.5):
+    return Analysis(
+        bpm=bpm, tempo_conf=1.0, key=KeyInfo(pitch_class=pitch, mode=mode), key_conf=1.0, beatgrid=[],
+        sections=[Section(label="A", start_ms=0, end_ms=30000), Section(label="B", start_ms=30000, end_ms=60000)],
+        energy=0.1, danceability=0.5, vocals_presence=vocals, chord_segments=[],
+    )
+
+
+def _fill(index, n, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        a = _analysis(float(rng.uniform(70, 180)), _PITCHES[rng.integers(12)], rng.choice(["major", "minor"]), rng.uniform())
+        index.add(f"t{i}", a, rng.normal(size=EMBEDDING_DIM), rng.uniform(size=200))
+    return index
+
+
+def test_bpm_folding():
+    assert bpm_bucket(70) == bpm_bucket(140) == bpm_bucket(280)
+    assert bpm_bucket(100) != bpm_bucket(120)
+
+
+def test_track_embedding_is_unit_length():
+    power = np.abs(np.random.default_rng(0).normal(size=(1025, 50))) ** 2
+    e = track_embedding(power, 22050)
+    assert e.shape == (EMBEDDING_DIM,)
+    assert np.linalg.norm(e) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_retrieval_filters_tempo_and_key():
+    index = _fill(PartnerIndex(), 300)
+    index.add("query", _analysis(120.0, "A", "minor"), np.ones(EMBEDDING_DIM), np.ones(200))
+    index.add("double_time", _analysis(240.0, "E", "minor"), np.ones(EMBEDDING_DIM), np.ones(200))
+    index.add("off_tempo", _analysis(100.0, "A", "minor"), np.ones(EMBEDDING_DIM), np.ones(200))
+    rows = index.retrieve("query")
+    ids = [index.features.ids[r] for r in rows]
+    assert ids[0] == "double_time"
+    assert "off_tempo" not in ids and "query" not in ids
+    results = index.search("query", k=5)
+    assert len(results) == 5 and {r[0] for r in results} <= set(ids)
+    assert set(results[0][2]) == {"key", "tempo", "sections", "vocals", "energy"}
+
+
+def test_incremental_updates_and_persistence(tmp_path):
+    a = _analysis(120.0)
+    update_catalog(tmp_path, "x", a, np.ones(EMBEDDING_DIM), np.ones(10))
+    update_catalog(tmp_path, "y", a, np.ones(EMBEDDING_DIM), np.ones(10))
+    update_catalog(tmp_path, "x", _analysis(90.0), np.ones(EMBEDDING_DIM), np.ones(10))
+    index = PartnerIndex.open(tmp_path)
+    assert len(index) == 2 and "x" in index
+    assert index.features.ids == ("y", "x")
+    assert index.features.bpm.tolist() == [120.0, 90.0]
+    assert len(index.features.section_owner) == 4
+
+
+def test_clustered_search_keeps_recall(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "_MIN_TRAIN", 200)
+    index = _fill(PartnerIndex(tmp_path), 2000, seed=1)
+    assert index.centroids is not None
+    index.save()
+    approx = set(PartnerIndex.open(tmp_path).retrieve("t0", limit=20, n_probe=16).tolist())
+    index.centroids = None
+    exact = set(index.retrieve("t0", limit=20).tolist())
+    assert len(exact & approx) >= 10
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from core.envelopes import ENVELOPE_RATES_HZ, analysis_energy, decode_envelope, encode_envelope, energy_envelopes
+from core.score import mashability_score, pair_score
+from schemas.models import Analysis, KeyInfo, Section
+
+
+def _analysis(envelopes, energy=0.1):
+    return Analysis(
+        bpm=120.0, tempo_conf=1.0, key=KeyInfo(pitch_class="A", mode="minor"), key_conf=1.0, beatgrid=[0, 500],
+        sections=[Section(label="A", start_ms=0, end_ms=60000)], energy=energy, danceability=0.5,
+        vocals_presence=0.5, chord_segments=[], energy_envelopes=envelopes,
+    )
+
+
+def test_float16_round_trip():
+    values = np.array([0.0, 0.01, 0.5, 0.99])
+    encoded = encode_envelope(values)
+    assert len(encoded) == 12  # 4 x 2 bytes, base64
+    assert np.allclose(decode_envelope(encoded), values, rtol=1e-3)
+
+
+def test_envelope_resolutions():
+    frame_rate = 44100 / 512
+    rms = np.repeat([0.1, 0.4], int(frame_rate * 10))  # 10 s quiet, 10 s loud
+    envelopes = energy_envelopes(rms, frame_rate, np.arange(0, len(rms), 43))
+    assert [e.rate_hz for e in envelopes] == [None, *ENVELOPE_RATES_HZ]
+    per_second = decode_envelope(envelopes[2].data)
+    assert len(per_second) == 20
+    assert np.allclose(per_second[:9], 0.1, rtol=1e-3) and np.allclose(per_second[11:], 0.4, rtol=1e-3)
+    assert len(decode_envelope(envelopes[1].data)) == 80
+    analysis = _analysis(envelopes)
+    assert np.array_equal(analysis_energy(analysis, None), decode_envelope(envelopes[0].data))
+    # Missing envelopes fall back to the scalar energy
+    assert analysis_energy(_analysis([], energy=0.3)).tolist() == pytest.approx([0.3])
+
+
+def test_scoring_resamples_instead_of_truncating():
+    # The same shape at two rates correlates perfectly once resampled
+    ramp = np.linspace(0, 1, 40)
+    _, factors = mashability_score(1.0, 1.0, 1.0, 0.5, 0.5, ramp, np.linspace(0, 1, 20))
+    assert factors["energy"] == pytest.approx(1.0)
+    a = _analysis(energy_envelopes(np.linspace(0.1, 0.5, 2000), 100.0, np.array([], dtype=int)))
+    b = _analysis(energy_envelopes(np.linspace(0.1, 0.5, 3000), 100.0, np.array([], dtype=int)))
+    score, factors = pair_score(a, b)
+    assert factors["energy"] == pytest.approx(1.0, abs=1e-3)
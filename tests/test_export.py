@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from infra.storage import LocalObjectStore
+from renderer.export import Exporter, encode, get_format
+
+
+def _tone(sr, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    return np.stack([0.3 * np.sin(2 * np.pi * 440 * t), 0.3 * np.sin(2 * np.pi * 660 * t)]).astype(np.float32)
+
+
+def test_flac_roundtrip_and_progress(tmp_path):
+    sr = 44100
+    audio = _tone(sr, 2.0)
+    seen = []
+    path = encode(audio, sr, get_format("flac"), tmp_path / "a.flac", seen.append)
+    decoded, out_sr = sf.read(path, dtype="float32")
+    assert out_sr == sr
+    assert np.allclose(decoded.T, audio, atol=1e-4)
+    assert seen == sorted(seen) and seen[-1] == 1.0
+
+
+def test_opus_is_resampled_to_48k(tmp_path):
+    audio = _tone(44100)
+    path = encode(audio, 44100, get_format("opus"), tmp_path / "a.opus")
+    info = sf.info(path)
+    assert info.samplerate == 48000 and info.channels == 2
+    assert abs(info.frames - 48000) < 1000
+
+
+def test_exporter_uploads_every_format(tmp_path):
+    store = LocalObjectStore(tmp_path / "store")
+    events = []
+    exporter = Exporter(store, on_progress=lambda *e: events.append(e))
+    job = exporter.submit(_tone(44100), 44100, "renders/p1")
+    status = job.wait(timeout=60)
+    assert exporter.jobs["renders/p1"] is job
+    for name, suffix in (("flac", ".flac"), ("mp3", ".mp3"), ("opus", ".opus")):
+        assert status[name] == {"state": "done", "progress": 1.0, "key": f"renders/p1/draft{suffix}"}
+        assert store.exists(f"renders/p1/draft{suffix}")
+        assert (name, "uploading", 1.0) in events
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Exporter(LocalObjectStore(tmp_path), formats=["aac"])
@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import butter, fftconvolve, sosfilt
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+from fx_chain import (
+    IR_PRESETS,
+    ConvolutionReverb,
+    FeedbackDelay,
+    SidechainDucker,
+    build_chain,
+    build_sidechain,
+    ir_spectra,
+    synthetic_ir,
+)
+from render_pool import mix_section, render_layer, section_chains
+from transitions import echo_out
+
+
+def test_blockwise_filter_matches_whole_buffer():
+    sr = 8000
+    y = np.random.default_rng(0).standard_normal((2, 10000)).astype(np.float32)
+    chain = build_chain(["high-pass-filter-800hz"], sr)
+    out = chain.process_buffer(y.copy(), block_size=333)
+    sos = butter(4, 800, btype="highpass", fs=sr, output="sos")
+    assert out.dtype == np.float32
+    assert np.allclose(out, sosfilt(sos, y, axis=-1), atol=1e-4)
+
+
+def test_filter_sweep_position_continues_across_chains():
+    sr = 8000
+    y = np.random.default_rng(1).standard_normal((2, 4096)).astype(np.float32)
+    effect = {"type": "filter-sweep", "start_hz": 200, "end_hz": 3000, "duration_sec": 0.5}
+    whole = build_chain([effect], sr).process_buffer(y.copy())
+    head = build_chain([effect], sr)
+    head.process_buffer(y[:, :2048].copy())
+    tail = build_chain([effect], sr, position=2048)
+    tail.processors[0].zi = head.processors[0].zi
+    assert np.allclose(tail.process_buffer(y[:, 2048:].copy()), whole[:, 2048:], atol=1e-4)
+
+
+def test_unknown_effects_are_skipped():
+    assert not build_chain(["reverse-cymbal", "sidechain"], 44100)
+    assert build_sidechain(["sidechain"], 44100) is not None
+    assert build_sidechain(["low-pass-2khz"], 44100) is None
+
+
+def test_sidechain_ducks_under_trigger():
+    sr = 8000
+    pad = np.full((2, sr), 0.5, dtype=np.float32)
+    kick = np.zeros((2, sr), dtype=np.float32)
+    kick[:, sr // 2 :] = 0.8
+    mixed = mix_section([pad, kick], sr, [SidechainDucker(sr), None])
+    ducked = mixed - kick
+    assert np.allclose(ducked[:, : sr // 4], 0.5, atol=1e-3)
+    assert ducked[0, -1] < 0.5 * 10 ** (-6 / 20)
+
+
+def test_echo_out_repeats_decay():
+    sr = 1000
+    clip = np.zeros(100, dtype=np.float32)
+    clip[0] = 1.0
+    out = echo_out(clip, sr, delay_sec=0.05, decay=0.5, repeats=3)
+    assert out.shape == (250,)
+    assert np.allclose(out[[0, 50, 100, 150]], [1.0, 0.5, 0.25, 0.125])
+
+
+def test_partitioned_reverb_matches_direct_convolution():
+    sr = 8000
+    x = np.random.default_rng(2).standard_normal((2, 20000)).astype(np.float32)
+    reverb = ConvolutionReverb(sr, ir="room", wet=1.0, dry=0.0, partition=512)
+    out = np.concatenate([reverb.process(x[:, i : i + 777].copy()) for i in range(0, x.shape[1], 777)], axis=-1)
+    ref = fftconvolve(x, synthetic_ir(IR_PRESETS["room"], sr), axes=-1)[:, : x.shape[1]]
+    assert out.dtype == np.float32
+    assert np.allclose(out, ref, atol=1e-4)
+
+
+def test_ir_spectra_are_cached_per_rate():
+    ir_spectra.cache_clear()
+    ConvolutionReverb(8000, ir="plate")
+    ConvolutionReverb(8000, ir="plate")
+    ConvolutionReverb(16000, ir="plate")
+    info = ir_spectra.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_feedback_delay_matches_recurrence():
+    sr = 1000
+    x = np.random.default_rng(3).standard_normal((2, 500)).astype(np.float32)
+    delay = FeedbackDelay(sr, delay_sec=0.03, feedback=0.5, wet=1.0)
+    out = np.concatenate([delay.process(x[:, i : i + 17].copy()) for i in range(0, 500, 17)], axis=-1)
+    d = np.zeros_like(x)
+    for n in range(30, 500):
+        d[:, n] = x[:, n - 30] + 0.5 * d[:, n - 30]
+    assert np.allclose(out, x + d, atol=1e-5)
+
+
+def test_reverb_blocks_join_with_whole_render(tmp_path):
+    sr = 8000
+    path = tmp_path / "a.wav"
+    sf.write(path, np.random.default_rng(4).uniform(-0.5, 0.5, 3 * sr), sr)
+    layer = {"songId": "a", "effects": ["reverb", "delay"]}
+    whole = render_layer(layer, str(path), 2 * sr, sr)
+    # The section's chain carries the tails from block to block
+    fx = section_chains([layer], sr)[0]
+    blocks = [
+        render_layer(layer, str(path), 2 * sr, sr, offset=o, length=sr // 2, fx=fx) for o in range(0, 2 * sr, sr // 2)
+    ]
+    assert np.allclose(np.concatenate(blocks, axis=-1), whole, atol=1e-4)
@@ -1,5 +1,8 @@
+import numpy as np
+import pytest
+
 from schemas.models import KeyInfo
-from core.harmony import suggest_key_strategy
+from core.harmony import _PITCHES, key_index, key_indices, key_matrix, suggest_key_strategy
 
 
 def test_known_compatible_pair():
@@ -15,3 +18,57 @@ def test_incompatible_penalty():
     b = KeyInfo(pitch_class="F#", mode="minor")
     _, confidence = suggest_key_strategy(a, b)
     assert confidence < 0.5
+
+
+# Camelot codes and the original shift search, kept as an independent reference
+# for the precomputed tables
+_CAMELOT = {
+    "major": ["8B", "3B", "10B", "5B", "12B", "7B", "2B", "9B", "4B", "11B", "6B", "1B"],
+    "minor": ["5A", "12A", "7A", "2A", "9A", "4A", "11A", "6A", "1A", "8A", "3A", "10A"],
+}
+
+
+def _reference_strategy(pc_a, mode_a, pc_b, mode_b):
+    num_a, letter_a = int(_CAMELOT[mode_a][pc_a][:-1]), _CAMELOT[mode_a][pc_a][-1]
+    best_shift, best_penalty = 0, float("inf")
+    for shift in range(-3, 4):
+        code = _CAMELOT[mode_b][(pc_b + shift) % 12]
+        num_b, letter_b = int(code[:-1]), code[-1]
+        wheel = min(abs(num_a - num_b), 12 - abs(num_a - num_b))
+        if letter_a == letter_b:
+            mode_pen = 0.0
+        else:
+            mode_pen = 0.5 if num_a == num_b else 1.0
+        penalty = wheel + mode_pen + abs(shift)
+        if penalty < best_penalty:
+            best_shift, best_penalty = shift, penalty
+    return best_shift, max(0.0, 1.0 - best_penalty / 6.0)
+
+
+def test_key_tables_match_reference_loop():
+    pcs = np.tile(np.arange(12), 2)
+    modes = np.repeat(["major", "minor"], 12)
+    shift, confidence = key_matrix(pcs, modes)
+    assert shift.shape == confidence.shape == (24, 24)
+    for i in range(24):
+        for j in range(24):
+            ref_shift, ref_conf = _reference_strategy(pcs[i], modes[i], pcs[j], modes[j])
+            assert shift[i, j] == ref_shift
+            assert confidence[i, j] == pytest.approx(ref_conf, abs=1e-6)
+            a = KeyInfo(pitch_class=_PITCHES[pcs[i]], mode=modes[i])
+            b = KeyInfo(pitch_class=_PITCHES[pcs[j]], mode=modes[j])
+            strategy, conf = suggest_key_strategy(a, b)
+            assert (strategy.pitch_shift_semitones, conf) == (ref_shift, pytest.approx(ref_conf, abs=1e-6))
+
+
+def test_key_matrix_against_catalog():
+    rng = np.random.default_rng(0)
+    catalog_pcs = rng.integers(0, 12, 100_000)
+    catalog_modes = rng.integers(0, 2, 100_000)
+    # A minor against the catalog, modes given as 0/1
+    shift, confidence = key_matrix(np.array([9]), np.array([1]), catalog_pcs, catalog_modes)
+    assert shift.shape == (1, 100_000)
+    j = int(np.flatnonzero((catalog_pcs == 4) & (catalog_modes == 1))[0])  # E minor
+    assert shift[0, j] == 0
+    assert confidence[0, j] > 0.6
+    assert key_index("E", "minor") == key_indices(catalog_pcs[j:j + 1], catalog_modes[j:j + 1])[0]
@@ -0,0 +1,110 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from core.pair_cache import PairScoreCache
+from infra.metrics import pair_score_cache_requests
+
+ROOT = Path(__file__).resolve().parents[1]
+_spec = importlib.util.spec_from_file_location("mashability_main", ROOT / "mashability_scoring_service" / "main.py")
+scoring = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(scoring)
+
+client = TestClient(scoring.app)
+
+
+def _analysis(rng):
+    return {
+        "harmonic": {"key": str(rng.choice(["C major", "A minor", "G major"])), "chord_complexity": float(rng.uniform())},
+        "rhythmic": {
+            "bpm": float(rng.uniform(80, 160)),
+            "groove_stability": float(rng.uniform()),
+            "swing_factor": float(rng.uniform()),
+            "beat_confidence": float(rng.uniform()),
+        },
+        "spectral": {
+            "mfccs": rng.normal(size=(13, 5)).tolist(),
+            "brightness": float(rng.uniform(0, 5000)),
+            "dynamic_range": float(rng.uniform(0, 30)),
+        },
+        "vocal": {"vocal_presence": float(rng.uniform())},
+    }
+
+
+def test_batch_matches_pairwise_and_ranks(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    query = _analysis(rng)
+    inline = [{"id": f"c{i}", "analysis": _analysis(rng)} for i in range(30)]
+    stored = _analysis(rng)
+    (tmp_path / "s1.json").write_text(json.dumps(stored))
+    monkeypatch.setattr(scoring, "ANALYSIS_STORE_DIR", str(tmp_path))
+
+    response = client.post(
+        "/calculate-mashability/batch",
+        json={"query_analysis": query, "candidates": inline, "candidate_ids": ["s1"], "top_k": 10},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 10
+    assert [r["overall_score"] for r in results] == sorted((r["overall_score"] for r in results), reverse=True)
+
+    weights = scoring._normalized_weights(None)
+    analyses = {c["id"]: c["analysis"] for c in inline} | {"s1": stored}
+    expected = {cid: scoring.calculate_mashability(query, a, weights) for cid, a in analyses.items()}
+    best = max(expected, key=lambda cid: expected[cid]["overall_score"])
+    assert results[0]["id"] == best
+    for r in results:
+        pairwise = expected[r["id"]]
+        assert r["overall_score"] == pytest.approx(pairwise["overall_score"])
+        assert r["dimension_scores"] == pytest.approx(pairwise["dimension_scores"])
+
+
+def test_unknown_candidate_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring, "ANALYSIS_STORE_DIR", str(tmp_path))
+    query = _analysis(np.random.default_rng(1))
+    response = client.post("/calculate-mashability/batch", json={"query_analysis": query, "candidate_ids": ["missing"]})
+    assert response.status_code == 404
+    response = client.post("/calculate-mashability/batch", json={"query_analysis": query, "candidate_ids": ["../x"]})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("top_k", [0, -1])
+def test_top_k_must_be_positive(top_k):
+    rng = np.random.default_rng(3)
+    response = client.post(
+        "/calculate-mashability/batch",
+        json={"query_analysis": _analysis(rng), "candidates": [{"id": "c", "analysis": _analysis(rng)}], "top_k": top_k},
+    )
+    assert response.status_code == 422
+
+
+def _lookups(result):
+    return pair_score_cache_requests.labels(result=result)._value.get()
+
+
+def test_pair_scores_are_cached_for_both_orders(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring, "pair_cache", PairScoreCache(maxsize=8, path=str(tmp_path / "pairs.db")))
+    rng = np.random.default_rng(2)
+    a, b = _analysis(rng), _analysis(rng)
+    hits, misses = _lookups("hit"), _lookups("miss")
+    ab = client.post("/calculate-mashability", json={"song1_analysis": a, "song2_analysis": b}).json()
+    ba = client.post("/calculate-mashability", json={"song1_analysis": b, "song2_analysis": a}).json()
+    assert _lookups("hit") - hits == 1
+    assert ba["overall_score"] == pytest.approx(ab["overall_score"])
+    assert ba["compatibility_breakdown"]["vocal"]["vocal_presence_1"] == b["vocal"]["vocal_presence"]
+    assert ab["compatibility_breakdown"]["vocal"]["vocal_presence_1"] == a["vocal"]["vocal_presence"]
+    # Different weights are a different entry
+    client.post("/calculate-mashability", json={"song1_analysis": a, "song2_analysis": b, "user_weights": {"vocal": 1.0}})
+    assert _lookups("miss") - misses == 2
+    # The SQLite tier outlives the in-memory LRU
+    monkeypatch.setattr(scoring, "pair_cache", PairScoreCache(maxsize=8, path=str(tmp_path / "pairs.db")))
+    again = client.post("/calculate-mashability", json={"song1_analysis": b, "song2_analysis": a}).json()
+    assert again == ba
+    assert _lookups("hit") - hits == 2
+    metrics = client.get("/metrics/").text
+    assert 'pair_score_cache_requests_total{result="hit"}' in metrics
+    assert "pair_score_cache_hit_ratio" in metrics
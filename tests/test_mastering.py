@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy.signal import butter, sosfilt
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+from audio_ops import apply_replay_gain
+from core.mastering import LoudnessMeter, StreamingMaster, TruePeakLimiter, integrated_loudness, master
+
+SR = 44100
+
+
+def _music_like(seconds, scale=1.0, seed=0):
+    noise = np.random.default_rng(seed).standard_normal((2, int(seconds * SR)))
+    return (sosfilt(butter(4, 10000, fs=SR, output="sos"), noise) * scale).astype(np.float32)
+
+
+def test_sine_reads_its_level_in_blocks():
+    t = np.arange(5 * SR) / SR
+    y = np.stack([0.1 * np.sin(2 * np.pi * 997 * t)] * 2)
+    meter = LoudnessMeter(SR)
+    for i in range(0, y.shape[1], 1234):
+        meter.process(y[:, i : i + 1234])
+    assert meter.integrated() == pytest.approx(-20.0, abs=0.05)
+    assert meter.integrated() == pytest.approx(integrated_loudness(y, SR))
+
+
+def test_loudness_agrees_with_pyloudnorm():
+    pyln = pytest.importorskip("pyloudnorm")
+    y = _music_like(6, 0.2)
+    y[:, : 2 * SR] *= 0.01  # quiet intro exercises the relative gate
+    expected = pyln.Meter(SR).integrated_loudness(y.T.astype(np.float64))
+    assert integrated_loudness(y, SR) == pytest.approx(expected, abs=0.2)
+
+
+def test_limiter_holds_ceiling_and_passes_quiet_audio():
+    y = _music_like(3, 2.0)
+    limiter = TruePeakLimiter(SR, ceiling_db=-1.0)
+    blocks = [limiter.process(y[:, i : i + 4410]) for i in range(0, y.shape[1], 4410)]
+    out = np.concatenate(blocks + [limiter.flush()], axis=-1)[:, limiter.latency :]
+    assert out.shape == y.shape
+    assert np.abs(out).max() <= 10 ** (-1 / 20) + 1e-4
+
+    quiet = y * 0.01
+    limiter = TruePeakLimiter(SR)
+    out = np.concatenate([limiter.process(quiet), limiter.flush()], axis=-1)[:, limiter.latency :]
+    assert np.allclose(out, quiet, atol=1e-6)
+
+
+def test_streaming_master_converges_to_target():
+    y = _music_like(12, 0.1)
+    master = StreamingMaster(SR, target_lufs=-14.0)
+    out = np.concatenate([master.process(y[:, i : i + SR]) for i in range(0, y.shape[1], SR)] + [master.flush()], axis=-1)
+    assert out.shape[-1] == y.shape[-1] + master.limiter.latency
+    assert integrated_loudness(out[:, 4 * SR :], SR) == pytest.approx(-14.0, abs=0.5)
+
+
+def test_replay_gain_normalizes_whole_mix():
+    y = _music_like(5, 0.05)
+    out = apply_replay_gain(y, SR)
+    assert out.shape == y.shape
+    assert integrated_loudness(out, SR) == pytest.approx(-14.0, abs=0.5)
+    assert np.abs(out).max() < 1.0
+
+
+def test_master_keeps_shape_and_meets_targets():
+    y = _music_like(5, 0.05)
+    mono = master(y[0], SR)
+    assert mono.shape == y[0].shape
+    assert integrated_loudness(mono, SR) == pytest.approx(-14.0, abs=0.5)
+    # Too short to gate: only the limiter applies
+    burst = np.full((2, SR // 10), 1.5, dtype=np.float32)
+    assert np.abs(master(burst, SR)).max() <= 10 ** (-1 / 20) + 1e-6
@@ -1,7 +1,8 @@
 import jsonschema
+import pytest
 from hypothesis import given, strategies as st
 
-from orchestrator.masterplan import generate_masterplan, PLAN_SCHEMA
+from orchestrator.masterplan import PLAN_SCHEMA, _validate, generate_masterplan
 from schemas.models import Analysis, KeyInfo, Section
 
 
@@ -33,3 +34,19 @@ def test_plan_within_bounds(dur_a, dur_b):
         assert sec["top_stem"] in {"a", "b"}
         for stem in sec["gain_db"].keys():
             assert stem in {"a", "b"}
+
+
+def test_plan_for_four_tracks():
+    plan = generate_masterplan(*[_analysis(d) for d in (4000, 3000, 5000, 6000)])
+    jsonschema.validate(plan, PLAN_SCHEMA)
+    assert plan["sources"] == ["a", "b", "c", "d"]
+    section = plan["sections"][0]
+    assert section["end_ms"] == 3000
+    assert set(section["gain_db"]) == {"a", "b", "c", "d"}
+
+
+def test_undefined_source_is_rejected():
+    plan = generate_masterplan(_analysis(4000), _analysis(4000))
+    plan["sections"][0]["gain_db"]["c"] = 0.0
+    with pytest.raises(ValueError):
+        _validate(plan, {"a": 4000, "b": 4000})
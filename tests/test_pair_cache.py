@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY, generate_latest
+
+from core.pair_cache import PairScoreCache, pair_key
+from core.score import pair_score
+from infra.metrics import pair_score_cache_requests
+from schemas.models import Analysis, KeyInfo, Section
+
+_PITCHES = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+
+
+def _analysis(rng):
+    start = int(rng.integers(0, 10000))
+    return Analysis(
+        bpm=float(rng.uniform(80, 160)), tempo_conf=1.0,
+        key=KeyInfo(pitch_class=_PITCHES[rng.integers(12)], mode=str(rng.choice(["major", "minor"]))), key_conf=1.0,
+        beatgrid=[], sections=[Section(label="A", start_ms=start, end_ms=start + 60000)],
+        energy=0.1, danceability=0.5, vocals_presence=float(rng.uniform()), chord_segments=[],
+    )
+
+
+def test_pair_key_is_order_independent():
+    key_ab, swapped_ab = pair_key("aaa", "bbb", {"key": 1.0})
+    key_ba, swapped_ba = pair_key("bbb", "aaa", {"key": 1.0})
+    assert key_ab == key_ba and not swapped_ab and swapped_ba
+    assert pair_key("aaa", "bbb", {"key": 0.5})[0] != key_ab
+
+
+def test_lru_eviction_and_sqlite_tier(tmp_path):
+    cache = PairScoreCache(maxsize=2, path=tmp_path / "pairs.db")
+    for key in ("a", "b", "c"):
+        cache.put(key, [float(len(key)), {}])
+    assert len(cache) == 2 and "a" not in cache._memory
+    # Evicted from memory but still on disk, and promoted again
+    assert cache.get("a") == [1.0, {}]
+    assert "a" in cache._memory and "b" not in cache._memory
+    reopened = PairScoreCache(maxsize=2, path=tmp_path / "pairs.db")
+    assert reopened.get("c") == [1.0, {}]
+    assert reopened.get("missing") is None
+    assert reopened.hit_ratio == 0.5
+    assert b"pair_score_cache_hit_ratio" in generate_latest(REGISTRY)
+
+
+def test_hit_ratio_gauge_covers_every_cache():
+    def lookups(result):
+        return pair_score_cache_requests.labels(result=result)._value.get()
+
+    warm, cold = PairScoreCache(), PairScoreCache()
+    warm.put("a", 1.0)
+    for _ in range(3):
+        warm.get("a")
+    # The last lookup is a miss on another cache; the gauge still covers both
+    cold.get("a")
+    hits, misses = lookups("hit"), lookups("miss")
+    assert REGISTRY.get_sample_value("pair_score_cache_hit_ratio") == pytest.approx(hits / (hits + misses))
+    assert warm.hit_ratio == 1.0 and cold.hit_ratio == 0.0
+
+
+def test_pair_score_serves_both_orders_from_cache():
+    rng = np.random.default_rng(0)
+    cache = PairScoreCache()
+    for _ in range(20):
+        a, b = _analysis(rng), _analysis(rng)
+        energy_a, energy_b = rng.uniform(size=50), rng.uniform(size=40)
+        score, factors = pair_score(a, b, energy_a, energy_b)
+        for result in (
+            pair_score(b, a, energy_b, energy_a),
+            pair_score(a, b, energy_a, energy_b, cache),
+            pair_score(b, a, energy_b, energy_a, cache),
+        ):
+            assert result[0] == pytest.approx(score)
+            assert result[1] == pytest.approx(factors)
+    assert cache.hits == cache.misses == 20
+
+
+def test_pair_score_weights_change_score_and_key():
+    rng = np.random.default_rng(1)
+    a, b = _analysis(rng), _analysis(rng)
+    cache = PairScoreCache()
+    score, factors = pair_score(a, b, cache=cache)
+    key_only, _ = pair_score(a, b, cache=cache, weights={"key": 1.0})
+    assert cache.hits == 0
+    assert key_only == pytest.approx(factors["key"])
+    assert score == pytest.approx(np.mean(list(factors.values())))
+    with pytest.raises(ValueError):
+        pair_score(a, b, weights={"key": 0.0})
@@ -0,0 +1,31 @@
+import numpy as np
+
+from core.peaks import build_peaks, read_peaks, write_peaks
+
+
+def test_pyramid_matches_brute_force():
+    rng = np.random.default_rng(1)
+    y = rng.uniform(-0.9, 0.9, size=(2, 10000)).astype(np.float32)
+    levels = build_peaks(y, bins=(256, 1024))
+    coarse = levels[1024].astype(np.float32) / 32767
+    assert coarse.shape == (10, 2, 3)
+    block = y[1, 2048:3072]
+    assert np.isclose(coarse[2, 1, 0], block.min(), atol=1e-4)
+    assert np.isclose(coarse[2, 1, 1], block.max(), atol=1e-4)
+    assert np.isclose(coarse[2, 1, 2], np.sqrt(np.mean(block**2)), atol=1e-3)
+
+
+def test_range_query_picks_level_and_window(tmp_path):
+    sr = 8000
+    y = np.sin(2 * np.pi * 5 * np.arange(sr * 4) / sr).astype(np.float32)
+    path = write_peaks(tmp_path / "draft.peaks", y, sr)
+
+    wide = read_peaks(path, 0, None, max_bins=16)
+    assert wide["samples_per_bin"] == 4096
+    assert wide["channels"] == 1
+
+    zoomed = read_peaks(path, 8000, 12000, max_bins=64)
+    assert zoomed["samples_per_bin"] == 256
+    assert zoomed["start_sample"] == 7936
+    assert len(zoomed["max"][0]) == 16
+    assert max(zoomed["max"][0]) <= 1.0
@@ -10,3 +10,69 @@ def test_retry_and_completion():
     worker.stop()
     assert status['job1'] == 'completed'
     assert broker.dead_letters == []
+
+
+def test_render_job_resumes_after_preemption(tmp_path, monkeypatch):
+    import numpy as np
+    import soundfile as sf
+
+    import renderer.jobs as jobs
+    from renderer.checkpoint import RenderCheckpoint
+
+    monkeypatch.setattr(jobs, "CHECKPOINT_ROOT", tmp_path / "checkpoints")
+    # The worker is preempted right after its first checkpoint
+    saved = []
+    save_section = RenderCheckpoint.save_section
+
+    def preempted_after_first_save(self, render_key, section, *args):
+        save_section(self, render_key, section, *args)
+        saved.append(section)
+        if len(saved) == 1:
+            raise RuntimeError("simulated preemption")
+
+    monkeypatch.setattr(RenderCheckpoint, "save_section", preempted_after_first_save)
+    sr = 44100
+    t = np.arange(2 * sr) / sr
+    paths = {}
+    for sid, freq in (("a", 440), ("b", 550), ("c", 660)):
+        paths[sid] = str(tmp_path / f"{sid}.wav")
+        sf.write(paths[sid], 0.3 * np.sin(2 * np.pi * freq * t), sr)
+    section = {"top_stem": "a", "gain_db": {"a": 0.0, "b": -6.0, "c": -6.0}, "x_fade": {}, "pitch_shift": {}, "stretch_ratio": {}}
+    plan = {"sources": ["a", "b", "c"], "sections": [dict(section, start_ms=0, end_ms=1000), dict(section, start_ms=1000, end_ms=2000)]}
+
+    jobs.render_job.send("render1", plan, paths, "mega", root=str(tmp_path))
+    worker = dramatiq.Worker(broker, worker_threads=1, worker_timeout=100)
+    worker.start()
+    broker.join(jobs.render_job.queue_name)
+    worker.stop()
+    assert jobs.status["render1"] == "completed"
+    assert broker.dead_letters == []
+    assert saved == [0, 1]  # the retry resumed after the checkpointed section
+    assert sf.info(tmp_path / "renders" / "mega" / "draft.wav").frames == 2 * sr
+    assert not list((tmp_path / "checkpoints").rglob("*.npy"))
+
+
+def test_checkpoints_follow_the_configured_bucket(tmp_path, monkeypatch):
+    import boto3
+    import numpy as np
+    from moto import mock_aws
+
+    import renderer.jobs as jobs
+    from infra.storage import LocalObjectStore, S3ObjectStore
+    from renderer.checkpoint import RenderCheckpoint
+
+    monkeypatch.setattr(jobs, "CHECKPOINT_BUCKET", None)
+    monkeypatch.setattr(jobs, "CHECKPOINT_ROOT", tmp_path / "host-a")
+    assert isinstance(jobs.checkpoint_store(), LocalObjectStore)
+
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        boto3.client("s3").create_bucket(Bucket="checkpoints")
+        monkeypatch.setattr(jobs, "CHECKPOINT_BUCKET", "checkpoints")
+        assert isinstance(jobs.checkpoint_store(), S3ObjectStore)
+        audio = np.ones((2, 100), dtype=np.float32)
+        RenderCheckpoint(jobs.checkpoint_store()).save_section("key", 0, 0, audio)
+        # A retry on another host, with its own empty disk, still finds the section
+        monkeypatch.setattr(jobs, "CHECKPOINT_ROOT", tmp_path / "host-b")
+        start, loaded = RenderCheckpoint(jobs.checkpoint_store()).load("key")[0]
+        assert start == 0 and np.array_equal(loaded, audio)
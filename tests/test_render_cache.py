@@ -0,0 +1,82 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+import core.hashing
+import render_cache
+from audio_ops import to_pcm16, wav_stream_header
+from core.stretch import rubberband_version
+from infra.metrics import render_cache_requests
+from renderer.cache import render_key
+from renderer.quality import FINAL
+
+
+def _count(result):
+    return render_cache_requests.labels(result=result)._value.get()
+
+
+def _tracks(tmp_path, data=b"stem-a"):
+    path = tmp_path / "a.wav"
+    path.write_bytes(data)
+    return {"a": {"stems": {"mix": str(path)}, "analysis": {}}}
+
+
+def test_key_is_canonical_and_tracks_inputs(tmp_path):
+    plan = {"timeline": [{"duration_sec": 4, "layers": [{"songId": "a", "volume_db": -3}]}]}
+    reordered = {"timeline": [{"layers": [{"volume_db": -3, "songId": "a"}], "duration_sec": 4}]}
+    key = render_cache.render_key(plan, _tracks(tmp_path), "file")
+    assert key == render_cache.render_key(reordered, _tracks(tmp_path), "file")
+    assert key != render_cache.render_key(plan, _tracks(tmp_path), "stream")
+    assert key != render_cache.render_key(plan, _tracks(tmp_path, b"stem-b"), "file")
+
+
+def test_keys_track_the_stretch_engine_version(tmp_path, monkeypatch):
+    plan = {"timeline": [{"duration_sec": 4, "layers": [{"songId": "a", "stretch_ratio": 1.1}]}]}
+    service_key = render_cache.render_key(plan, _tracks(tmp_path), "file")
+    renderer_key = render_key(plan, ["a:0"], 44100, FINAL)
+    monkeypatch.setattr(core.hashing, "rubberband_version", lambda: f"{rubberband_version()}+upgrade")
+    assert render_cache.render_key(plan, _tracks(tmp_path), "file") != service_key
+    assert render_key(plan, ["a:0"], 44100, FINAL) != renderer_key
+
+
+def test_streamed_entry_is_published_on_commit(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    hits, misses = _count("hit"), _count("miss")
+    block = np.random.default_rng(0).uniform(-0.5, 0.5, (2, 1000)).astype(np.float32)
+
+    assert render_cache.lookup("k") is None
+    with render_cache.CacheWriter("k") as writer:
+        writer.write(wav_stream_header(8000))
+        writer.write(to_pcm16(block))
+    assert render_cache.lookup("k") is None
+
+    with render_cache.CacheWriter("k") as writer:
+        writer.write(wav_stream_header(8000))
+        writer.write(to_pcm16(block))
+        writer.commit()
+    cached = render_cache.lookup("k")
+    audio, sr = sf.read(cached)
+    assert sr == 8000 and audio.shape == (1000, 2)
+    assert np.allclose(audio.T, block, atol=1e-4)
+    assert list((tmp_path / "cache").iterdir()) == [Path(cached)]
+    assert (_count("hit") - hits, _count("miss") - misses) == (1, 2)
+
+
+def test_cache_evicts_least_recently_served_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(render_cache, "MAX_BYTES", 2500)
+    for i, key in enumerate("abc"):
+        with render_cache.CacheWriter(key) as writer:
+            writer.write(b"x" * 1000)
+            writer.commit(patch_wav_sizes=False)
+        # Distinct mtimes, oldest first
+        os.utime(render_cache.cache_path(key), ns=(i * 10**9, i * 10**9))
+        if key == "b":
+            assert render_cache.lookup("a") is not None  # "a" is now the most recent
+    assert sorted(p.stem for p in (tmp_path / "cache").iterdir()) == ["a", "c"]
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+import render_pool
+from render_pool import get_executor, render_layer, mix_section
+
+
+def _tone(path: Path, freq: float, sr: int, duration: float = 1.0) -> Path:
+    t = np.arange(int(sr * duration)) / sr
+    sf.write(path, 0.5 * np.sin(2 * np.pi * freq * t), sr)
+    return path
+
+
+def test_render_layer_gain_and_padding(tmp_path):
+    sr = 8000
+    path = str(_tone(tmp_path / "a.wav", 440, sr))
+    block = render_layer({"songId": "a", "volume_db": -6.0, "start_sec": 0.5}, path, sr, sr)
+    assert block.shape == (2, sr)
+    assert block.dtype == np.float32
+    # Only half a second of source remains after start_sec; the rest is silence
+    assert np.all(block[:, sr // 2 + 1 :] == 0)
+    assert np.isclose(np.max(np.abs(block)), 0.5 * 10 ** (-6 / 20), rtol=1e-2)
+
+
+def test_pool_renders_sections_in_timeline_order(tmp_path):
+    sr = 8000
+    paths = [str(_tone(tmp_path / f"{f}.wav", f, sr)) for f in (220, 330)]
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(get_executor(), render_layer, {"songId": str(i)}, p, sr // 2, sr)
+            for i, p in enumerate(paths)
+        ]
+        return await asyncio.gather(*futures)
+
+    blocks = asyncio.run(_run())
+    for block, path in zip(blocks, paths):
+        expected, _ = sf.read(path)
+        assert np.allclose(block[0], expected[: sr // 2], atol=1e-4)
+    section = mix_section(blocks, sr // 2)
+    assert np.allclose(section, blocks[0] + blocks[1])
+
+
+def test_blocks_concatenate_to_full_layer(tmp_path):
+    sr = 8000
+    path = str(_tone(tmp_path / "a.wav", 440, sr))
+    layer = {"songId": "a", "volume_db": -3.0, "start_sec": 0.25}
+    full = render_layer(layer, path, sr // 2, sr)
+    blocks = [render_layer(layer, path, sr // 2, sr, offset, 1000) for offset in range(0, sr // 2, 1000)]
+    assert np.array_equal(np.concatenate(blocks, axis=-1), full)
+
+
+def test_layers_render_from_canonical_copy(tmp_path):
+    sr = 8000
+    t = np.arange(sr) / sr
+    path = tmp_path / "mono.wav"
+    sf.write(path, 0.5 * np.sin(2 * np.pi * 440 * t), sr)
+    block = render_layer({"songId": "m"}, str(path), sr, sr)
+    canonical = np.load(tmp_path / "mono.8000.npy", mmap_mode="r")
+    assert canonical.dtype == np.float32 and canonical.shape == (2, sr)
+    assert np.array_equal(block, canonical)
+
+
+def test_rebuilt_canonical_copy_replaces_cached_track(tmp_path):
+    sr = 8000
+    path = _tone(tmp_path / "a.wav", 440, sr)
+    before = render_layer({"songId": "a"}, str(path), sr, sr)
+    _tone(path, 660, sr)
+    later = os.path.getmtime(tmp_path / "a.8000.npy") + 10
+    os.utime(path, (later, later))
+    after = render_layer({"songId": "a"}, str(path), sr, sr)
+    expected, _ = sf.read(path)
+    assert not np.allclose(after, before)
+    assert np.allclose(after[0], expected, atol=1e-4)
+
+
+def test_track_cache_is_bounded(tmp_path, monkeypatch):
+    sr = 8000
+    monkeypatch.setattr(render_pool, "TRACK_CACHE_SIZE", 2)
+    monkeypatch.setattr(render_pool, "_track_cache", OrderedDict())
+    paths = [str(_tone(tmp_path / f"{f}.wav", f, sr)) for f in (220, 330, 440)]
+    for p in paths + paths[:1]:
+        render_layer({"songId": "a"}, p, sr // 4, sr)
+    assert [Path(p).name for p in render_pool._track_cache] == ["440.8000.npy", "220.8000.npy"]
@@ -0,0 +1,77 @@
+import asyncio
+import importlib.util
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+_spec = importlib.util.spec_from_file_location("audio_processing_main", ROOT / "audio_processing_service" / "main.py")
+service = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(service)
+
+from core.mastering import StreamingMaster
+from render_pool import render_layer
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def _tracks(tmp_path, sr):
+    t = np.arange(3 * sr) / sr
+    path = tmp_path / "a.wav"
+    sf.write(path, 0.3 * np.sin(2 * np.pi * 330 * t) * (1 + 0.5 * np.sin(2 * np.pi * 2 * t)), sr)
+    return {"a": {"stems": {"mix": str(path)}, "analysis": {}}}
+
+
+def test_warped_layer_with_effects_streams_without_block_seams(tmp_path, monkeypatch):
+    sr = 8000
+    monkeypatch.setattr(service, "STREAM_BLOCK_SEC", 0.25)
+    tracks = _tracks(tmp_path, sr)
+    layer = {"songId": "a", "stretch_ratio": 1.25, "pitch_shift": 2, "volume_db": -3.0, "effects": ["reverb", "delay"]}
+    plan = {"timeline": [{"duration_sec": 2, "layers": [layer]}]}
+
+    chunks = asyncio.run(_collect(service.render_mashup_pcm_streamer(plan, tracks, "job", sr=sr)))
+    streamed = np.frombuffer(b"".join(chunks[1:]), dtype="<i2").reshape(-1, 2).T
+
+    # The same section rendered whole, then mastered in the same blocks
+    whole = render_layer(layer, tracks["a"]["stems"]["mix"], 2 * sr, sr)
+    master = StreamingMaster(sr)
+    blocks = [master.process(whole[:, o : o + sr // 4]) for o in range(0, 2 * sr, sr // 4)]
+    expected = service.to_pcm16(np.concatenate(blocks + [master.flush()], axis=-1))
+    expected = np.frombuffer(expected, dtype="<i2").reshape(-1, 2).T
+    assert streamed.shape == expected.shape
+    assert np.abs(streamed.astype(int) - expected).max() <= 2
+
+
+def test_disconnect_cancels_queued_blocks(tmp_path, monkeypatch):
+    sr = 8000
+    monkeypatch.setattr(service, "STREAM_BLOCK_SEC", 0.25)
+    release = threading.Event()
+    calls = []
+
+    def _render(*args):
+        calls.append(args)
+        release.wait(5)
+        return np.zeros((2, args[-1]), dtype=np.float32)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(service, "get_executor", lambda: executor)
+    monkeypatch.setattr(service, "render_source", _render)
+    plan = {"timeline": [{"duration_sec": 2, "layers": [{"songId": "a"}]}]}
+
+    async def _disconnect():
+        stream = service.render_mashup_pcm_streamer(plan, _tracks(tmp_path, sr), "job", sr=sr)
+        await stream.__anext__()  # WAV header
+        await stream.aclose()
+
+    asyncio.run(_disconnect())
+    release.set()
+    executor.shutdown(wait=True)
+    # Only the block already running when the client left was rendered
+    assert len(calls) == 1
@@ -1,8 +1,12 @@
+import json
+
 import numpy as np
+import pytest
 import soundfile as sf
 
+from core.mastering import TARGET_LUFS, integrated_loudness, master
 from orchestrator.masterplan import generate_masterplan
-from renderer.engine import render_draft
+from renderer.engine import render_draft, render_mix
 from schemas.models import Analysis, KeyInfo, Section
 
 
@@ -36,7 +40,136 @@ def test_render_outputs(tmp_path):
     draft, sr_read = sf.read(out_dir / "draft.wav")
     assert sr_read == sr
     assert len(draft) == samples
-    assert np.max(np.abs(draft)) <= 1.0
+    assert np.max(np.abs(draft)) <= 10 ** (-1 / 20)
+    assert integrated_loudness(draft.T, sr) == pytest.approx(TARGET_LUFS, abs=0.5)
     bus, _ = sf.read(out_dir / "stems_bus.wav")
     assert np.array_equal(draft, bus)
     assert np.allclose(draft, mix, atol=1e-4)
+
+
+def test_preview_tier_is_separate_and_reports_speedup(tmp_path):
+    sr = 44100
+    dur_ms = 1000
+    t = np.arange(int(sr * dur_ms / 1000)) / sr
+    stereo_a = np.stack([np.sin(2 * np.pi * 440 * t)] * 2).astype(np.float32)
+    stereo_b = np.stack([np.sin(2 * np.pi * 660 * t)] * 2).astype(np.float32)
+    plan = generate_masterplan(_analysis(dur_ms), _analysis(dur_ms))
+    plan["sections"][0]["stretch_ratio"]["b"] = 1.1
+
+    render_draft(plan, stereo_a, stereo_b, sr, "pair7", root=tmp_path)
+    preview = render_draft(plan, stereo_a, stereo_b, sr, "pair7", root=tmp_path, quality="preview")
+
+    out_dir = tmp_path / "renders" / "pair7"
+    final, final_sr = sf.read(out_dir / "draft.wav")
+    draft, draft_sr = sf.read(out_dir / "preview" / "draft.wav")
+    assert final.shape == (sr, 2) and final_sr == sr
+    assert draft.ndim == 1 and draft_sr == 22050
+    assert np.allclose(draft, preview, atol=1e-4)
+    report = json.loads((out_dir / "preview" / "render.json").read_text())
+    assert report["quality"] == "preview"
+    assert report["speedup"] > 0
+
+
+def test_render_cache_hit_restores_outputs(tmp_path):
+    from infra.metrics import render_cache_requests
+    from infra.storage import LocalObjectStore
+    from renderer.cache import RenderCache
+
+    sr = 22050
+    dur_ms = 1000
+    t = np.arange(int(sr * dur_ms / 1000)) / sr
+    tone_a = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    tone_b = np.sin(2 * np.pi * 660 * t).astype(np.float32)
+    plan = generate_masterplan(_analysis(dur_ms), _analysis(dur_ms))
+    cache = RenderCache(LocalObjectStore(tmp_path / "store"))
+
+    def _count(result):
+        return render_cache_requests.labels(result=result)._value.get()
+
+    hits, misses = _count("hit"), _count("miss")
+    first = render_draft(plan, tone_a, tone_b, sr, "p1", root=tmp_path / "one", cache=cache)
+    second = render_draft(plan, tone_a, tone_b, sr, "p2", root=tmp_path / "two", cache=cache)
+    assert (_count("hit") - hits, _count("miss") - misses) == (1, 1)
+    assert np.allclose(first, second, atol=1e-4)
+    out_dir = tmp_path / "two" / "renders" / "p2"
+    for name in ("draft.wav", "draft.peaks", "render.json", "draft.spec/meta.json"):
+        assert (out_dir / name).is_file()
+
+    plan["sections"][0]["gain_db"]["a"] = -3.0
+    render_draft(plan, tone_a, tone_b, sr, "p3", root=tmp_path / "three", cache=cache)
+    assert _count("miss") - misses == 2
+
+
+def test_render_mix_sums_any_number_of_sources(tmp_path):
+    sr = 22050
+    dur_ms = 1000
+    t = np.arange(int(sr * dur_ms / 1000)) / sr
+    tones = {sid: (0.2 * np.sin(2 * np.pi * f * t)).astype(np.float32) for sid, f in zip("abc", (220, 330, 440))}
+    tones["d"] = np.stack([tones["a"], -tones["a"]])  # stereo source joins the mono ones
+    plan = generate_masterplan(*[_analysis(dur_ms)] * 4)
+    plan["sections"][0]["gain_db"] = {"a": 0.0, "b": -6.0, "c": -12.0, "d": 0.0}
+
+    mix = render_mix(plan, tones, sr, "mega", root=tmp_path)
+
+    g = [10 ** (db / 20) for db in (0.0, -6.0, -12.0)]
+    expected = g[0] * tones["a"] + g[1] * tones["b"] + g[2] * tones["c"]
+    assert mix.shape == (2, t.size)
+    assert np.allclose(mix, master(np.stack([expected + tones["a"], expected - tones["a"]]), sr), atol=1e-5)
+    assert json.loads((tmp_path / "renders" / "mega" / "render.json").read_text())["sources"] == 4
+
+
+def test_render_queues_compressed_exports(tmp_path):
+    from infra.storage import LocalObjectStore
+    from renderer.export import Exporter
+
+    sr = 22050
+    t = np.arange(sr) / sr
+    tone = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    plan = generate_masterplan(_analysis(1000), _analysis(1000))
+    store = LocalObjectStore(tmp_path / "store")
+    exporter = Exporter(store, formats=["flac", "mp3"])
+
+    render_draft(plan, tone, tone, sr, "p9", root=tmp_path, quality="preview", exporter=exporter)
+    status = exporter.jobs["renders/p9/preview"].wait(timeout=60)
+    assert {s["state"] for s in status.values()} == {"done"}
+    flac, flac_sr = sf.read(tmp_path / "store" / "renders" / "p9" / "preview" / "draft.flac")
+    draft, _ = sf.read(tmp_path / "renders" / "p9" / "preview" / "draft.wav")
+    assert flac_sr == sr and np.allclose(flac, draft, atol=1e-3)
+
+
+def test_crashed_render_resumes_from_checkpoint(tmp_path, monkeypatch):
+    import renderer.engine as engine
+    from infra.storage import LocalObjectStore
+    from renderer.checkpoint import RenderCheckpoint
+
+    sr = 22050
+    t = np.arange(3 * sr) / sr
+    tone_a = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    tone_b = np.sin(2 * np.pi * 660 * t).astype(np.float32)
+    plan = generate_masterplan(_analysis(3000), _analysis(3000))
+    plan["sections"] = [dict(plan["sections"][0], start_ms=i * 1000, end_ms=(i + 1) * 1000) for i in range(3)]
+    expected = render_draft(plan, tone_a, tone_b, sr, "ref", root=tmp_path)
+
+    calls = []
+    crash = True
+    original = engine._section_audio
+
+    def crash_in_last_section(audio, start, *args):
+        calls.append(start)
+        if crash and start == 2 * sr:
+            raise RuntimeError("preempted")
+        return original(audio, start, *args)
+
+    monkeypatch.setattr(engine, "_section_audio", crash_in_last_section)
+    store = LocalObjectStore(tmp_path / "store")
+    checkpoint = RenderCheckpoint(store)
+    with pytest.raises(RuntimeError):
+        render_draft(plan, tone_a, tone_b, sr, "job", root=tmp_path, checkpoint=checkpoint)
+    assert len(list((tmp_path / "store" / "checkpoints").glob("*/section-*.npy"))) == 2
+
+    calls.clear()
+    crash = False
+    mix = render_draft(plan, tone_a, tone_b, sr, "job", root=tmp_path, checkpoint=checkpoint)
+    assert calls == [2 * sr, 2 * sr]  # only the last section is rendered again
+    assert np.allclose(mix, expected, atol=1e-6)
+    assert not list((tmp_path / "store" / "checkpoints").rglob("*.*"))
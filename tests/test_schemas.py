@@ -43,6 +43,7 @@ analysis_data = {
     "danceability": 0.7,
     "vocals_presence": 0.6,
     "chord_segments": [{"start_ms": 0, "chord": "C", "conf": 0.9}],
+    "energy_envelopes": [{"rate_hz": None, "data": "ADgANAA6"}, {"rate_hz": 1.0, "data": "ADgANAA6"}],
 }
 
 mash_plan_data = {
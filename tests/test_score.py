@@ -1,6 +1,8 @@
 import numpy as np
 import pytest
-from core.score import mashability_score
+from core.harmony import suggest_key_strategy
+from core.score import ENVELOPE_POINTS, TrackFeatures, mashability_score, section_overlap, top_partners
+from schemas.models import KeyInfo, Section
 
 
 def test_monotonic_behavior():
@@ -15,5 +17,63 @@ def test_regression_snapshot():
     energy_a = np.array([0.2, 0.8, 0.1, 0.9])
     energy_b = np.array([0.1, 0.7, 0.3, 0.8])
     score, factors = mashability_score(0.7, 1.05, 0.6, 0.3, 0.35, energy_a, energy_b)
-    assert score == pytest.approx(0.834, rel=1e-3)
+    assert score == pytest.approx(0.828, rel=1e-3)
     assert factors["key"] == 0.7
+
+
+def _random_tracks(rng, n, lengths=None):
+    pitches = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+    keys = [KeyInfo(pitch_class=pitches[p], mode=m) for p, m in zip(rng.integers(0, 12, n), rng.choice(["major", "minor"], n))]
+    sections = []
+    for _ in range(n):
+        bounds = np.sort(rng.integers(0, 200_000, 2 * rng.integers(0, 6)))
+        sections.append([Section(label="x", start_ms=int(s), end_ms=int(e)) for s, e in bounds.reshape(-1, 2)])
+    return dict(
+        ids=[f"t{i}" for i in range(n)],
+        bpm=rng.uniform(80, 160, n),
+        keys=keys,
+        vocals=rng.uniform(0, 1, n),
+        energy=[rng.uniform(0, 1, length) for length in (lengths if lengths is not None else [ENVELOPE_POINTS] * n)],
+        sections=sections,
+    )
+
+
+def test_section_overlap_matches_pairwise_sum():
+    a = [Section(label="a", start_ms=0, end_ms=1000), Section(label="a", start_ms=500, end_ms=2000)]
+    b = [Section(label="b", start_ms=800, end_ms=1200), Section(label="b", start_ms=1900, end_ms=3000)]
+    # 200 + 400 + 100, counting the doubly covered span of a twice
+    assert section_overlap(a, b) == pytest.approx(700 / 1500)
+    assert section_overlap(a, []) == 0.0
+
+
+@pytest.mark.parametrize("varied_lengths", [False, True])
+def test_top_partners_match_pairwise_scores(varied_lengths):
+    rng = np.random.default_rng(3)
+    # Envelopes shorter and longer than ENVELOPE_POINTS, as stored for tracks of different durations
+    lengths = rng.integers(2, 300, 40) if varied_lengths else None
+    tracks = _random_tracks(rng, 40, lengths)
+    candidates = TrackFeatures.from_tracks(**tracks)
+    query = TrackFeatures.from_tracks(**{k: v[:1] for k, v in tracks.items()})
+    results = top_partners(query, candidates, k=5)
+    assert len(results) == 5
+    assert [r[1] for r in results] == sorted((r[1] for r in results), reverse=True)
+    assert results[0][0] == "t0"  # a track is its own best partner
+    expected = []
+    for j in range(40):
+        _, key_conf = suggest_key_strategy(tracks["keys"][0], tracks["keys"][j])
+        bpm_a, bpm_b = tracks["bpm"][0], tracks["bpm"][j]
+        score, factors = mashability_score(
+            key_conf,
+            min(bpm_a, bpm_b) / max(bpm_a, bpm_b),
+            section_overlap(tracks["sections"][0], tracks["sections"][j]),
+            tracks["vocals"][0],
+            tracks["vocals"][j],
+            tracks["energy"][0],
+            tracks["energy"][j],
+        )
+        expected.append((f"t{j}", score, factors))
+    expected.sort(key=lambda r: -r[1])
+    for (cid, score, factors), (eid, escore, efactors) in zip(results, expected):
+        assert cid == eid
+        assert score == pytest.approx(escore, abs=1e-5)
+        assert factors == pytest.approx(efactors, abs=1e-5)
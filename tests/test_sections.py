@@ -0,0 +1,66 @@
+import numpy as np
+
+from core.sections import BeatFeatures, beat_features, load_beat_features, save_beat_features, section_pairs
+from schemas.models import Analysis, KeyInfo, Section
+
+
+def _analysis(section_beats, beat_ms=500):
+    bounds = np.cumsum([0] + list(section_beats))
+    return Analysis(
+        bpm=120.0, tempo_conf=1.0, key=KeyInfo(pitch_class="C", mode="major"), key_conf=1.0,
+        beatgrid=[int(b * beat_ms) for b in range(bounds[-1])],
+        sections=[Section(label="S", start_ms=int(lo * beat_ms), end_ms=int(hi * beat_ms)) for lo, hi in zip(bounds[:-1], bounds[1:])],
+        energy=1.0, danceability=0.5, vocals_presence=0.5, chord_segments=[],
+    )
+
+
+def _features(chroma, energy=None, vocals=None):
+    n = chroma.shape[1]
+    return BeatFeatures(
+        chroma.astype(np.float32),
+        np.ones(n, np.float32) if energy is None else energy,
+        np.zeros(n, np.float32) if vocals is None else vocals,
+    )
+
+
+def test_finds_transposed_section_and_offset():
+    rng = np.random.default_rng(0)
+    chroma_a = rng.uniform(size=(12, 48)) ** 4
+    # B's second section replays A's beats 20..36, two semitones higher, after 8 beats of noise
+    chroma_b = rng.uniform(size=(12, 48)) ** 4
+    chroma_b[:, 24:40] = np.roll(chroma_a[:, 20:36], 2, axis=0)
+    analysis_a = _analysis([16, 32])
+    analysis_b = _analysis([16, 32])
+    pairs = section_pairs(analysis_a, _features(chroma_a), analysis_b, _features(chroma_b), top_k=3)
+    best = pairs[0]
+    assert (best.section_a, best.section_b) == (1, 1)
+    assert best.pitch_shift == -2
+    # B's section beat 8 (beat 24) lines up with A's section beat 4 (beat 20)
+    assert best.offset_beats == -4
+    # The overlap starts at A's section start and B's section beat 4
+    assert best.start_ms_a == 16 * 500 and best.start_ms_b == 20 * 500
+    assert best.beats == 28
+    assert [p.score for p in pairs] == sorted((p.score for p in pairs), reverse=True)
+
+
+def test_vocal_clash_and_energy_lower_the_score():
+    rng = np.random.default_rng(1)
+    chroma = rng.uniform(size=(12, 32))
+    analysis = _analysis([16, 16])
+    vocals = np.r_[np.zeros(16), np.ones(16)].astype(np.float32)
+    energy = np.r_[np.full(16, 0.2), np.ones(16)].astype(np.float32)
+    pairs = section_pairs(analysis, _features(chroma, energy, vocals), analysis, _features(chroma, energy, vocals), top_k=4)
+    by_pair = {(p.section_a, p.section_b): p for p in pairs}
+    assert by_pair[(1, 1)].factors["vocals"] == 0.0
+    assert by_pair[(0, 1)].factors["energy"] < by_pair[(0, 0)].factors["energy"]
+    assert pairs[0].section_a == pairs[0].section_b == 0
+
+
+def test_beat_features_round_trip(tmp_path):
+    power = np.abs(np.random.default_rng(2).normal(size=(1025, 100))) ** 2
+    features = beat_features(power, 0.5 * power, np.ones(100), 22050, np.array([10, 30, 50, 70]))
+    assert features.chroma.shape == (12, 4)
+    assert np.allclose(features.vocals, np.sqrt(0.5), atol=1e-3)
+    save_beat_features(tmp_path / "beats.npz", features)
+    loaded = load_beat_features(tmp_path / "beats.npz")
+    assert np.array_equal(loaded.chroma, features.chroma)
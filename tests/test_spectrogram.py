@@ -0,0 +1,23 @@
+import numpy as np
+
+from core.spectrogram import TILE_BINS, TILE_FRAMES, read_meta, read_tile, write_spectrogram
+
+
+def test_tiles_cover_spectrogram_at_each_level(tmp_path):
+    sr = 22050
+    t = np.arange(sr * 8) / sr
+    y = np.sin(2 * np.pi * 1000 * t).astype(np.float32)
+    meta = write_spectrogram(tmp_path / "draft.spec", y, sr)
+    assert meta == read_meta(tmp_path / "draft.spec")
+    assert meta["n_bins"] == 1025
+    # 345 frames -> 2 tiles, then 1 tile at level 1
+    assert meta["levels"] == 2
+
+    tile = np.frombuffer(read_tile(tmp_path / "draft.spec", 0, 0, 0), dtype=np.uint8)
+    tile = tile.reshape(TILE_BINS, TILE_FRAMES)
+    peak_bin = int(round(1000 * 2048 / sr))
+    column = tile[:, 100]
+    assert int(np.argmax(column)) == peak_bin
+    assert column[peak_bin] > 240  # near 0 dBFS
+    coarse = np.frombuffer(read_tile(tmp_path / "draft.spec", 1, 0, 0), dtype=np.uint8)
+    assert coarse.size == TILE_BINS * TILE_FRAMES
@@ -14,21 +14,29 @@ def test_object_store_put_get_url(tmp_path, backend):
 
     if backend == "local":
         store = LocalObjectStore(tmp_path / "store")
+        assert not store.exists(key)
         store.put(key, src)
+        assert store.exists(key)
         out = tmp_path / "out.bin"
         store.get(key, out)
         assert out.read_bytes() == data
         url = store.url(key)
         assert url.startswith("file://")
+        store.delete(key)
+        assert not store.exists(key)
     else:
         with mock_aws():
             client = boto3.client("s3", region_name="us-east-1")
             bucket = "test-bucket"
             client.create_bucket(Bucket=bucket)
             store = S3ObjectStore(bucket, client=client)
+            assert not store.exists(key)
             store.put(key, src)
+            assert store.exists(key)
             out = tmp_path / "out.bin"
             store.get(key, out)
             assert out.read_bytes() == data
             url = store.url(key)
             assert url.startswith("http")
+            store.delete(key)
+            assert not store.exists(key)
@@ -1,5 +1,6 @@
+import librosa
 import numpy as np
-from core.tempo import align_tempo
+from core.tempo import OnsetEnvelope, align_tempo, beat_time_map, estimate_offset, stretch_to_grid
 from schemas.models import Analysis, KeyInfo
 
 
@@ -42,3 +43,72 @@ def test_alignment_accuracy():
         assert abs(b1 - b2) <= 20
     corr = np.corrcoef(aligned_a[:1000], aligned_b[:1000])[0, 1]
     assert corr > 0.9
+
+
+def test_stretch_to_grid_corrects_drift():
+    sr = 22050
+    # Source beats drift: intervals grow from 500 ms to 560 ms
+    beats_src = np.cumsum([0] + [500 + 15 * i for i in range(5)]).tolist()
+    beats_tgt = [500 * i for i in range(len(beats_src))]
+    n = np.arange(1000)
+    burst = np.sin(2 * np.pi * 1000 * n / sr) * np.exp(-n / 200)
+    y = np.zeros(int(sr * 3.2), dtype=np.float32)
+    for ms in beats_src:
+        start = int(ms * sr / 1000)
+        y[start : start + len(burst)] += burst
+    warped = stretch_to_grid(y, sr, beats_src, beats_tgt, engine="phase_vocoder")
+    env = np.convolve(warped**2, np.ones(64) / 64, mode="same")
+    for ms in beats_tgt:
+        lo = max(int((ms - 200) * sr / 1000), 0)
+        seg = env[lo : int((ms + 200) * sr / 1000)]
+        onset_ms = (lo + int(np.argmax(seg > 0.3 * seg.max()))) * 1000 / sr
+        # Uncorrected drift reaches 150 ms by the last beat
+        assert abs(onset_ms - ms) <= 50
+
+
+def test_time_map_drops_every_out_of_order_anchor():
+    # 2000 ms follows 3000 ms; 2500 ms is still behind it once 2000 is dropped
+    time_map = beat_time_map([1000, 3000, 2000, 2500, 4000], [1000, 2000, 3000, 4000, 5000], 44100 * 5, 44100)
+    src, tgt = np.array(time_map).T
+    assert np.all(np.diff(src) > 0) and np.all(np.diff(tgt) > 0)
+    assert src.tolist()[1:-1] == [44100, 132300, 176400]
+
+
+def _onsets(times, duration, sr=22050):
+    n = np.arange(400)
+    burst = np.sin(2 * np.pi * 1500 * n / sr) * np.exp(-n / 60)
+    y = np.zeros(int(duration * sr))
+    for t in times:
+        start = int(t * sr)
+        y[start : start + len(burst)] += burst[: len(y) - start]
+    return OnsetEnvelope(librosa.onset.onset_strength(y=y, sr=sr), sr / 512)
+
+
+def test_estimate_offset_recovers_downbeat_after_tempo_change():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0, 8, 24))
+    onset_a = _onsets(times, 9)
+    # b plays the same pattern 1.2x slower and starts 0.37 s later
+    onset_b = _onsets(times * 1.2 + 0.37, 11)
+    estimate = estimate_offset(onset_a, onset_b, stretch_ratio=1.2)
+    assert abs(estimate.offset_sec + 0.37 / 1.2) < 0.01
+    assert estimate.confidence > 0.7
+    assert estimate.offset_samples(1000) == int(round(estimate.offset_sec * 1000))
+
+    unrelated = _onsets(np.sort(rng.uniform(0, 8, 24)), 9)
+    assert estimate_offset(onset_a, unrelated).confidence < estimate.confidence
+
+
+def test_align_tempo_reports_offset():
+    sr = 22050
+    y_a, beats_a = _click_track(120, 4, sr)
+    y_b, beats_b = _click_track(100, 4.8, sr)
+    rng = np.random.default_rng(1)
+    times = np.sort(rng.uniform(0, 3, 10))
+    onset_a = _onsets(times, 4)
+    onset_b = _onsets(times * 1.2 + 0.2, 4.8)
+    _, _, alignment = align_tempo(
+        _analysis(120, beats_a), _analysis(100, beats_b), y_a, y_b, sr, engine="phase_vocoder",
+        onset_a=onset_a, onset_b=onset_b,
+    )
+    assert abs(alignment.offset_ms + 200 / 1.2) <= 10
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "audio_processing_service"))
+
+from transitions import StreamingXfade, s_curve_xfade
+
+
+@pytest.mark.parametrize("lens", [[1000, 500, 1200], [50, 2000, 30, 900], [300]])
+def test_streaming_xfade_matches_whole_buffer(lens):
+    sr = 100
+    rng = np.random.default_rng(0)
+    sections = [rng.standard_normal((2, n)).astype(np.float32) for n in lens]
+    master = sections[0]
+    for section in sections[1:]:
+        master = s_curve_xfade(master, section, sr, bars=2, bpm=120)
+
+    xfade = StreamingXfade(lens, sr, bars=2, bpm=120)
+    out = []
+    for section in sections:
+        xfade.start_section()
+        for i in range(0, section.shape[1], 70):
+            block = xfade.push(section[:, i : i + 70])
+            if block is not None:
+                out.append(block)
+    out.append(xfade.finish())
+    assert np.allclose(np.concatenate(out, axis=-1), master, atol=1e-6)